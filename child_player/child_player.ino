@@ -49,7 +49,7 @@ struct BinFileHeader
 {
     uint32_t width;
     uint32_t height;
-    uint32_t fps;
+    float fps; // float32 (정보용, 재생 속도는 Parent SYNC 주기로 결정)
     uint32_t frameCount;
 };
 
@@ -232,7 +232,7 @@ void startPlayback(uint8_t fileNum)
     memcpy(&fileHeader.frameCount, headerBuffer + 12, 4);
 
     Serial.printf("  Resolution: %dx%d\n", fileHeader.width, fileHeader.height);
-    Serial.printf("  FPS: %d\n", fileHeader.fps);
+    Serial.printf("  FPS: %.2f\n", fileHeader.fps);
     Serial.printf("  Frames: %d\n", fileHeader.frameCount);
 
     currentFileNum = fileNum;
@@ -19,16 +19,17 @@ const int SYNC_PIN = 0; // 모든 Child GPIO 0에 연결
 HardwareSerial SerialUART(1); // Serial1 사용
 
 // === 재생 설정 ===
-const unsigned long FRAME_DELAY_MS = 44; // 약 22 FPS (1000ms / 22 = 45ms)
-                                         // ※ 매 프레임마다 SYNC 신호 전송
-                                         // → Child들이 동시에 FastLED.show() 호출
+const unsigned long FRAME_PERIOD_US = 44000; // 약 22.7 FPS (44ms)
+                                             // ※ 매 프레임마다 SYNC 신호 전송
+                                             // → Child들이 동시에 FastLED.show() 호출
+                                             // ※ vid2pix 내보내기의 --frame-period-us 값과 일치해야 함
 const unsigned long DEBOUNCE_DELAY = 200;
 
 // === 전역 변수 ===
 uint8_t currentFile = 0; // 0: 정지, 1-4: 파일 번호
 bool isPlaying = false;
 unsigned long lastButtonTime = 0;
-unsigned long lastFrameTime = 0;
+unsigned long nextFrameTime = 0; // 다음 SYNC 예정 시각 (micros)
 
 void setup()
 {
@@ -72,11 +73,11 @@ void loop()
 
     if (isPlaying)
     {
-        unsigned long now = millis();
-        if (now - lastFrameTime >= FRAME_DELAY_MS)
+        // 절대 시각 기준 스케줄: 전송 지연이 누적되지 않음
+        if ((long)(micros() - nextFrameTime) >= 0)
         {
             sendSyncSignal();
-            lastFrameTime = now;
+            nextFrameTime += FRAME_PERIOD_US;
         }
     }
     else
@@ -133,14 +134,14 @@ void startPlayback(uint8_t fileNum)
 
     currentFile = fileNum;
     isPlaying = true;
-    lastFrameTime = millis();
+    nextFrameTime = micros() + FRAME_PERIOD_US;
 
     // UART로 Child들에게 명령 전송
     SerialUART.write(fileNum);
 
     Serial.printf("\n[START] Playing file %d\n", fileNum);
     Serial.println("  Command sent to all Children via UART");
-    Serial.println("  SYNC signals will be sent every 44ms (22 FPS)");
+    Serial.printf("  SYNC signals will be sent every %lu us\n", FRAME_PERIOD_US);
 }
 
 void stopPlayback()
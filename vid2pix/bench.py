@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the vid2pix processing stages on synthetic clips.
+
+Each case generates a clip locally (moving gradient + noise, MJPG), runs the
+real export pipeline on it with per-stage timing enabled and then times the
+stages the tile export does not exercise (RGB565 packing, SHA-256 hashing and
+raw disk writes) on the processed frames. Every case runs in a fresh process so
+its peak RSS is measured independently.
+
+The JSON report is meant to be diffed between commits:
+
+    python bench.py --output before.json
+    git checkout other-branch
+    python bench.py --output after.json
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from binfile import iter_bin_frames
+from profiling import StageTimer, enable_profiling, disable_profiling, stage
+from vidpix import export_tiles, pack_rgb565
+
+DEFAULT_CASES = ['640x360x120', '1280x720x120', '1920x1080x60']
+
+
+def parse_case(case):
+    """Parse 'WIDTHxHEIGHTxFRAMES' into a tuple of ints."""
+    try:
+        width, height, frames = (int(part) for part in case.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHTxFRAMES, got '{case}'")
+    return width, height, frames
+
+
+def make_synthetic_clip(path, width, height, frame_count, fps=30.0, seed=0):
+    """
+    Write a synthetic test clip: a scrolling colour gradient with a moving block and noise.
+
+    Returns:
+        True if the clip was written
+    """
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not out.isOpened():
+        return False
+
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    block = max(8, min(width, height) // 6)
+
+    for frame_idx in range(frame_count):
+        shift = frame_idx * 4
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:, :, 0] = (x + shift) % 256
+        frame[:, :, 1] = (y + shift // 2) % 256
+        frame[:, :, 2] = (x + y + shift) % 256
+        frame += rng.integers(0, 8, size=frame.shape, dtype=np.uint8)
+
+        left = (frame_idx * 7) % max(1, width - block)
+        top = (frame_idx * 3) % max(1, height - block)
+        frame[top:top + block, left:left + block] = 255
+        out.write(frame)
+
+    out.release()
+    return True
+
+
+def read_back_frames(bin_paths):
+    """Reassemble full processed frames from the tile .bin files, one frame at a time."""
+    tile_iters = [iter_bin_frames(path) for path in bin_paths]
+    for tiles in zip(*tile_iters):
+        yield np.concatenate(tiles, axis=0)
+
+
+def run_case(width, height, frame_count, workers, write_videos):
+    """
+    Benchmark one synthetic clip size (runs inside a fresh worker process).
+
+    Returns:
+        dict with the case parameters, end-to-end FPS, per-stage timings and peak RSS
+    """
+    with tempfile.TemporaryDirectory(prefix='vid2pix-bench-') as work_dir:
+        clip_path = os.path.join(work_dir, 'clip.avi')
+        if not make_synthetic_clip(clip_path, width, height, frame_count):
+            raise RuntimeError("Cannot write synthetic clip (no MJPG encoder)")
+
+        timer = enable_profiling(StageTimer())
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = export_tiles(clip_path, os.path.join(work_dir, 'out'),
+                                  workers=workers, write_videos=write_videos)
+        elapsed = time.perf_counter() - start
+
+        # Stages the tile export does not run, timed on the processed frames
+        with open(os.path.join(work_dir, 'raw.bin'), 'wb') as raw:
+            for frame in read_back_frames(result['bin_paths']):
+                pack_rgb565(frame)
+                frame_bytes = frame.tobytes()
+                with stage('sha256'):
+                    hashlib.sha256(frame_bytes).digest()
+                with stage('disk_write'):
+                    raw.write(frame_bytes)
+            with stage('disk_write'):
+                raw.flush()
+                os.fsync(raw.fileno())
+        disable_profiling()
+
+    return {
+        'name': f"{width}x{height}x{frame_count}",
+        'source_width': width,
+        'source_height': height,
+        'frames': result['frame_count'],
+        'target_width': result['width'],
+        'target_height': result['height'],
+        'workers': workers,
+        'elapsed_s': round(elapsed, 4),
+        'fps': round(result['frame_count'] / elapsed, 2) if elapsed > 0 else None,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        'stages': timer.summary(),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vid2pix processing stages on synthetic clips.")
+    parser.add_argument('--cases', nargs='+', type=parse_case, default=[parse_case(c) for c in DEFAULT_CASES],
+                        metavar='WxHxN', help=f"Clip sizes to benchmark (default: {' '.join(DEFAULT_CASES)})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Frame processing workers (default: 1, for stable per-stage numbers)")
+    parser.add_argument('--videos', action='store_true', help="Also encode the .mp4 outputs")
+    parser.add_argument('--output', default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'cpu_count': os.cpu_count(),
+        'cases': [],
+    }
+
+    # A fresh process per case keeps peak RSS measurements independent
+    context = multiprocessing.get_context('spawn')
+    for width, height, frame_count in args.cases:
+        print(f"Benchmarking {width}x{height}, {frame_count} frames...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            case = pool.apply(run_case, (width, height, frame_count, args.workers, args.videos))
+        print(f"  {case['fps']} fps, peak RSS {case['peak_rss_mb']} MB", file=sys.stderr)
+        report['cases'].append(case)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
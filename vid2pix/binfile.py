@@ -0,0 +1,1343 @@
+# -*- coding: utf-8 -*-
+"""
+Writers and readers for the LED .bin video files played by child_player.ino.
+
+v1 layout (what the children read today):
+- Header (16 bytes): width, height (uint32), fps (float32), frame count (uint32)
+- Frame data: frameCount * width * height * bytesPerPixel raw bytes
+- Trailer (32 bytes): SHA-256 of all frame data
+
+v2 layout (delta/RLE compressed, all fields little-endian):
+- Header (40 bytes):
+  * Magic 'VPX2' (4 bytes)
+  * Version (uint16) = 2, header size (uint16) = 40
+  * Width, height (uint32 each)
+  * FPS (float32)
+  * Frame count (uint32)
+  * Bytes per pixel (uint8), wiring layout (uint8, see wiring.py), keyframe interval (uint16)
+    Bytes per pixel doubles as the pixel format: 3 = 8 bits per channel in the layout's
+    channel order, 2 = RGB565 stored as little-endian uint16
+  * Index offset (uint32): file offset of the frame index table
+  * Frame period (uint32): exact microseconds per frame (one SYNC tick)
+  * Timestamp table offset (uint32): file offset of the timestamp table, 0 if there is none
+- Frame records, one per frame:
+  * Type (uint8): FRAME_RAW, FRAME_RLE, FRAME_DELTA, FRAME_REPEAT or FRAME_HOLD
+  * Payload size (uint32)
+  * Payload
+- Frame index: frameCount * uint32 record offsets (every frame of a hold points at its hold record)
+- Timestamp table (optional): frameCount * uint32 presentation times in microseconds
+  from the first frame (the source timing when the export was not resampled)
+- Trailer (32 bytes): SHA-256 of the *decoded* frame data, identical to the v1 checksum
+
+Record payloads:
+- FRAME_RAW: width * height * bytesPerPixel raw bytes
+- FRAME_RLE: runs of (count uint16, pixel) covering the whole frame
+- FRAME_DELTA: spans of (skip uint16, copy uint16, copy * pixel) against the previous frame
+- FRAME_REPEAT: empty, the previous frame is shown again
+- FRAME_HOLD: hold count (uint32), the previous frame is shown for that many more frames
+
+Hold records double as the frame duration table: after drawing a frame a player
+can read the following record and, if it is a hold, keep the LEDs as they are for
+that many SYNC ticks without touching the SD card. Frames within the writer's
+hold threshold of the frame on screen are held too, so the decoded data (and the
+trailer checksum) is what the player shows, not necessarily what was written.
+
+Keyframes (FRAME_RAW / FRAME_RLE) are forced every keyframe interval so a player
+can seek through the index to the nearest keyframe and decode forward from there.
+
+Chunked layout (v2 container, version 3, header size 52): the v2 header followed by
+frames per chunk, chunk count and chunk table offset (uint32 each). Frame records
+are grouped into chunks of that many frames (the last one may be shorter):
+- Chunk header (20 bytes): magic 'VPXC', first frame, frame count, data size and
+  CRC32 (zlib/IEEE, as esp_rom_crc32_le) of the chunk's records (uint32 each)
+- The chunk's frame records; the first is always a keyframe and holds never cross
+  a chunk boundary, so every chunk decodes on its own
+After the frame index (and timestamp table) comes the chunk table: chunkCount * uint32
+chunk offsets. A player can jump to frame K through chunk K // framesPerChunk and
+check just that chunk's CRC; a damaged chunk only costs its own frames. Chunks are
+written whole, so an interrupted export leaves a prefix of intact chunks that a
+later export can resume after. While a chunked file is being written, <path>.resume
+(JSON) holds a fingerprint of the source and settings its frames were made from;
+a resume needs the same fingerprint, so other content is never appended to the old
+frames. The sidecar is deleted once the file is complete.
+
+The FPS field is informational; players should pace frames with the integer
+frame period rather than float maths. Early v2 files have a 32-byte header without
+the timing fields; readers honour the header size and derive the period from the FPS.
+
+A non-zero wiring layout byte means pixels are stored in physical LED order and
+channel order rather than row-major BGR; a player must refuse files whose layout
+does not match its own wiring.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+import sys
+import zlib
+
+import cv2
+import numpy as np
+
+from timing import period_from_fps
+from wiring import decode_layout, undo_wiring
+
+BIN_HEADER_SIZE = 16
+BIN_TRAILER_SIZE = 32
+
+V2_MAGIC = b'VPX2'
+V2_VERSION = 2
+V2_HEADER_SIZE = 40
+V2_HEADER_FORMAT = '<4sHHIIfIBBHIII'
+# Early v2 files end the header after the index offset
+V2_BASE_HEADER_SIZE = 32
+V2_BASE_HEADER_FORMAT = '<4sHHIIfIBBHI'
+CHUNKED_VERSION = 3
+CHUNKED_HEADER_SIZE = 52
+CHUNKED_HEADER_FORMAT = '<4sHHIIfIBBHIIIIII'
+CHUNK_MAGIC = b'VPXC'
+CHUNK_HEADER_FORMAT = '<4sIIII'
+CHUNK_HEADER_SIZE = 20
+RECORD_HEADER_FORMAT = '<BI'
+RECORD_HEADER_SIZE = 5
+
+FRAME_RAW = 0
+FRAME_RLE = 1
+FRAME_DELTA = 2
+FRAME_REPEAT = 3
+FRAME_HOLD = 4
+HOLD_PAYLOAD_FORMAT = '<I'
+
+MAX_RUN = 0xFFFF
+SPAN_HEADER_SIZE = 4
+
+# Fingerprint sidecar of a chunked file being written, see the module docstring
+RESUME_SUFFIX = '.resume'
+
+# SD card file names, see FILE_NAMING_CONVENTION.md
+MEDIA_FILE_PATTERN = re.compile(r'^(\d+)_(\d+)\.bin$')
+
+
+class BinVideoWriter:
+    """
+    Incremental writer for the v1 .bin format (16-byte header + frames + SHA-256 trailer).
+
+    Frames are appended to disk as they arrive and the checksum is updated per frame,
+    so only the current frame is ever held in memory. The frame count in the header
+    is patched when the writer is closed.
+
+    Args:
+        path: Output binary file path
+        width: Frame width in pixels
+        height: Frame height in pixels
+        fps: Frames per second stored in the header
+    """
+
+    def __init__(self, path, width, height, fps):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = 0
+        self.data_size = 0
+        self.checksum = None
+        self._sha = hashlib.sha256()
+        self._file = open(path, 'wb')
+        self._file.write(self._pack_header())
+
+    def _pack_header(self):
+        # Header (16 bytes) - little-endian format compatible with Arduino
+        return (struct.pack('<I', self.width) +          # 4 bytes: width (uint32_t)
+                struct.pack('<I', self.height) +         # 4 bytes: height (uint32_t)
+                struct.pack('<f', self.fps) +            # 4 bytes: fps (float)
+                struct.pack('<I', self.frame_count))     # 4 bytes: frame count (uint32_t)
+
+    def write(self, frame_bytes):
+        """Append one frame's raw bytes."""
+        self._sha.update(frame_bytes)
+        self._file.write(frame_bytes)
+        self.frame_count += 1
+        self.data_size += len(frame_bytes)
+
+    def close(self):
+        """Write the SHA-256 trailer, patch the header and return the checksum."""
+        if self._file.closed:
+            return self.checksum
+        self.checksum = self._sha.digest()
+        # Trailer (32 bytes): SHA-256 checksum for integrity verification
+        self._file.write(self.checksum)
+        self._file.seek(0)
+        self._file.write(self._pack_header())
+        self._file.close()
+        return self.checksum
+
+    def abort(self):
+        """Give up on an unfinished file (export failed part-way): close and delete it."""
+        if not self._file.closed:
+            self._file.close()
+            os.remove(self.path)
+
+    @property
+    def file_size(self):
+        return BIN_HEADER_SIZE + self.data_size + BIN_TRAILER_SIZE
+
+
+def _pixel_keys(pixels):
+    """View each pixel of a (num_pixels, bytes_per_pixel) array as one void scalar, so pixels compare whole."""
+    return np.ascontiguousarray(pixels).view(np.dtype((np.void, pixels.shape[1]))).ravel()
+
+
+def _split_long_runs(starts, lengths):
+    """Split runs longer than MAX_RUN so every count fits in a uint16."""
+    if len(lengths) == 0 or lengths.max() <= MAX_RUN:
+        return starts, lengths
+    new_starts, new_lengths = [], []
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        while length > MAX_RUN:
+            new_starts.append(start)
+            new_lengths.append(MAX_RUN)
+            start += MAX_RUN
+            length -= MAX_RUN
+        new_starts.append(start)
+        new_lengths.append(length)
+    return np.array(new_starts), np.array(new_lengths)
+
+
+def encode_rle(pixels, limit=None):
+    """
+    Run-length encode a frame.
+
+    Args:
+        pixels: uint8 array of shape (num_pixels, bytes_per_pixel)
+        limit: Give up once the payload would be at least this many bytes (None = never)
+
+    Returns:
+        Payload bytes of (count uint16, pixel) runs, or None if the limit was reached
+    """
+    bytes_per_pixel = pixels.shape[1]
+    keys = _pixel_keys(pixels)
+    boundaries = keys[1:] != keys[:-1]
+    # Splitting long runs only adds runs, so the unsplit count already bounds the size
+    if limit is not None and (1 + int(np.count_nonzero(boundaries))) * (2 + bytes_per_pixel) >= limit:
+        return None
+    starts = np.concatenate(([0], np.flatnonzero(boundaries) + 1))
+    starts, lengths = _split_long_runs(starts, np.diff(np.append(starts, len(keys))))
+    if limit is not None and len(starts) * (2 + bytes_per_pixel) >= limit:
+        return None
+
+    runs = np.empty(len(starts), dtype=[('count', '<u2'), ('pixel', 'u1', (bytes_per_pixel,))])
+    runs['count'] = lengths
+    runs['pixel'] = pixels[starts]
+    return runs.tobytes()
+
+
+def encode_delta(pixels, previous, limit=None):
+    """
+    Encode a frame as changed-pixel spans against the previous frame.
+
+    Unchanged gaps too short to pay for a new span header are copied instead,
+    so the payload is never larger than necessary for the chosen spans. Spans
+    are found and laid out with array operations rather than per span.
+
+    Args:
+        pixels: uint8 array of shape (num_pixels, bytes_per_pixel)
+        previous: The previous decoded frame, same shape
+        limit: Give up once the payload would be at least this many bytes (None = never)
+
+    Returns:
+        Payload bytes of (skip uint16, copy uint16, copy * pixel) spans, or None if
+        the limit was reached
+    """
+    bytes_per_pixel = pixels.shape[1]
+    changed = _pixel_keys(pixels) != _pixel_keys(previous)
+    changed_count = int(np.count_nonzero(changed))
+    if not changed_count:
+        return b''
+    if limit is not None and SPAN_HEADER_SIZE + changed_count * bytes_per_pixel >= limit:
+        return None
+
+    # Runs of changed pixels start and end where the mask flips
+    edges = np.flatnonzero(np.diff(changed, prepend=False, append=False))
+    starts, ends = edges[0::2], edges[1::2]
+    # Absorb short unchanged gaps between changes into the surrounding spans
+    keep = starts[1:] - ends[:-1] >= SPAN_HEADER_SIZE // bytes_per_pixel + 1
+    starts = starts[np.concatenate(([True], keep))]
+    ends = ends[np.concatenate((keep, [True]))]
+    starts, lengths = _split_long_runs(starts, ends - starts)
+
+    # Unchanged pixels before each span; skips too long for a uint16 get empty spans of their own
+    skips = starts - np.concatenate(([0], starts[:-1] + lengths[:-1]))
+    padding = np.maximum(skips - 1, 0) // MAX_RUN
+    skips -= padding * MAX_RUN
+    header_count = len(starts) + int(padding.sum())
+    copy_count = int(lengths.sum())
+    if limit is not None and header_count * SPAN_HEADER_SIZE + copy_count * bytes_per_pixel >= limit:
+        return None
+
+    headers = np.zeros((header_count, 2), dtype='<u2')
+    headers[:, 0] = MAX_RUN
+    span_headers = np.arange(len(starts)) + np.cumsum(padding)
+    headers[span_headers, 0] = skips
+    headers[span_headers, 1] = lengths
+
+    # Header blocks and pixel data alternate: padding + span header, then the span's pixels
+    block_sizes = np.empty(2 * len(starts), dtype=np.int64)
+    block_sizes[0::2] = SPAN_HEADER_SIZE * (padding + 1)
+    block_sizes[1::2] = lengths * bytes_per_pixel
+    is_pixel = np.repeat(np.tile([False, True], len(starts)), block_sizes)
+    copied = np.arange(copy_count) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    payload = np.empty(len(is_pixel), dtype=np.uint8)
+    payload[~is_pixel] = headers.view(np.uint8).ravel()
+    payload[is_pixel] = pixels[copied].ravel()
+    return payload.tobytes()
+
+
+class BinVideoWriterV2:
+    """
+    Incremental writer for the v2 delta/RLE .bin format (see module docstring).
+
+    Each frame is stored as whichever of raw, RLE or delta is smallest. Runs of
+    frames that match the frame on screen collapse into a single repeat/hold record;
+    with a hold_threshold, "match" means no channel differs by more than that many
+    levels (24-bit frames only, 16-bit frames are only held when identical).
+    Keyframes are forced every keyframe_interval records so the index can be used
+    for seeking; holds do not count towards the interval since they cost nothing to
+    decode.
+
+    Args:
+        path: Output binary file path
+        width: Frame width in pixels
+        height: Frame height in pixels
+        fps: Frames per second stored in the header
+        bytes_per_pixel: 3 for 24-bit BGR, 2 for 16-bit RGB565
+        keyframe_interval: Maximum frames between keyframes (default: 30)
+        layout: Wiring layout byte the frames were written with (0 = row-major BGR)
+        hold_threshold: Maximum per-channel difference for a frame to be held (0 = exact)
+        frame_period_us: Exact frame period in microseconds (default: derived from fps)
+    """
+
+    def __init__(self, path, width, height, fps, bytes_per_pixel=3, keyframe_interval=30, layout=0,
+                 hold_threshold=0, frame_period_us=None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_period_us = frame_period_us if frame_period_us is not None else period_from_fps(fps)
+        self.bytes_per_pixel = bytes_per_pixel
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.layout = layout
+        self.hold_threshold = hold_threshold if bytes_per_pixel == 3 else 0
+        self.frame_count = 0
+        self.held_frames = 0
+        self.data_size = 0
+        self.raw_size = 0
+        self.checksum = None
+        self.record_counts = {FRAME_RAW: 0, FRAME_RLE: 0, FRAME_DELTA: 0, FRAME_REPEAT: 0, FRAME_HOLD: 0}
+        self._sha = hashlib.sha256()
+        self._offsets = []
+        self._previous = None
+        self._hold_count = 0
+        self._since_keyframe = 0
+        self._index_offset = 0
+        self._timestamps_offset = 0
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, 'wb')
+        self._file.write(self._pack_header())
+        self._records = self._file
+
+    def _position(self):
+        # File offset the next record will be written at
+        return self._file.tell()
+
+    def _pack_header(self):
+        return struct.pack(V2_HEADER_FORMAT, V2_MAGIC, V2_VERSION, V2_HEADER_SIZE,
+                           self.width, self.height, self.fps, self.frame_count,
+                           self.bytes_per_pixel, self.layout, self.keyframe_interval, self._index_offset,
+                           self.frame_period_us, self._timestamps_offset)
+
+    def _matches_previous(self, pixels):
+        if self._previous is None:
+            return False
+        if self.hold_threshold:
+            return int(cv2.absdiff(pixels, self._previous).max()) <= self.hold_threshold
+        return np.array_equal(pixels, self._previous)
+
+    def _write_record(self, record_type, payload):
+        self._records.write(struct.pack(RECORD_HEADER_FORMAT, record_type, len(payload)))
+        self._records.write(payload)
+        self.record_counts[record_type] += 1
+        self.data_size += RECORD_HEADER_SIZE + len(payload)
+
+    def _flush_hold(self):
+        if self._hold_count == 1:
+            self._write_record(FRAME_REPEAT, b'')
+        elif self._hold_count:
+            self._write_record(FRAME_HOLD, struct.pack(HOLD_PAYLOAD_FORMAT, self._hold_count))
+        self._hold_count = 0
+
+    def _encode(self, pixels):
+        keyframe_due = self._previous is None or self._since_keyframe >= self.keyframe_interval
+
+        # Each candidate only has to beat the smallest so far (ties keep the earlier type)
+        best = (FRAME_RAW, pixels.tobytes())
+        payload = encode_rle(pixels, limit=len(best[1]))
+        if payload is not None:
+            best = (FRAME_RLE, payload)
+        if not keyframe_due:
+            payload = encode_delta(pixels, self._previous, limit=len(best[1]))
+            if payload is not None:
+                best = (FRAME_DELTA, payload)
+        return best
+
+    def write(self, frame_bytes):
+        """Append one frame's raw bytes (same interface as BinVideoWriter)."""
+        pixels = np.frombuffer(frame_bytes, dtype=np.uint8).reshape(-1, self.bytes_per_pixel)
+        self.frame_count += 1
+        self.raw_size += len(frame_bytes)
+
+        if self._matches_previous(pixels):
+            # The hold record is written once the run ends, at the current file position
+            self._offsets.append(self._position())
+            self._hold_count += 1
+            self.held_frames += 1
+            self._sha.update(self._previous)
+            return
+
+        self._flush_hold()
+        record_type, payload = self._encode(pixels)
+        if record_type in (FRAME_RAW, FRAME_RLE):
+            self._since_keyframe = 1
+        else:
+            self._since_keyframe += 1
+
+        self._offsets.append(self._position())
+        self._write_record(record_type, payload)
+        self._sha.update(frame_bytes)
+        self._previous = pixels
+
+    def close(self, timestamps=None):
+        """
+        Write the index table, optional timestamp table and SHA-256 trailer, patch the
+        header and return the checksum.
+
+        Args:
+            timestamps: Presentation time of every frame in microseconds from the first
+                frame, stored as the timestamp table (None = no table)
+
+        Raises:
+            ValueError: If timestamps does not have one non-decreasing uint32 entry per frame
+        """
+        if self._file.closed:
+            return self.checksum
+        self._end_records()
+        table = None
+        if timestamps is not None:
+            table = np.asarray(timestamps, dtype=np.int64)
+            if len(table) != self.frame_count:
+                raise ValueError(f"Got {len(table)} timestamps for {self.frame_count} frames")
+            if len(table) and (table.min() < 0 or table.max() > 0xFFFFFFFF or np.any(np.diff(table) < 0)):
+                raise ValueError("Timestamps must be non-decreasing and fit in uint32 microseconds")
+        self.checksum = self._sha.digest()
+        self._index_offset = self._file.tell()
+        self._file.write(np.asarray(self._offsets, dtype='<u4').tobytes())
+        if table is not None:
+            self._timestamps_offset = self._file.tell()
+            self._file.write(table.astype('<u4').tobytes())
+        self._write_tables()
+        self._file.write(self.checksum)
+        self._file.seek(0)
+        self._file.write(self._pack_header())
+        self._file.close()
+        return self.checksum
+
+    def abort(self):
+        """Give up on an unfinished file (export failed part-way): close and delete it."""
+        if not self._file.closed:
+            self._file.close()
+            os.remove(self.path)
+
+    def _end_records(self):
+        self._flush_hold()
+
+    def _write_tables(self):
+        pass
+
+    @property
+    def file_size(self):
+        tables = 2 if self._timestamps_offset else 1
+        return V2_HEADER_SIZE + self.data_size + tables * 4 * self.frame_count + BIN_TRAILER_SIZE
+
+
+def scan_chunks(f, start, chunk_frames, file_size):
+    """
+    Walk the chunks of a chunked .bin file, complete or interrupted, from the first one.
+
+    Args:
+        f: Binary file opened for reading
+        start: Offset of the first chunk (the header size)
+        chunk_frames: Frames per chunk from the header
+        file_size: Size of the file
+
+    Yields:
+        (offset, first_frame, frame_count, data) for each chunk, stopping at the first
+        one that is truncated, out of sequence or fails its CRC32
+    """
+    offset = start
+    first_frame = 0
+    while offset + CHUNK_HEADER_SIZE <= file_size:
+        f.seek(offset)
+        magic, chunk_first, frame_count, size, crc = struct.unpack(CHUNK_HEADER_FORMAT, f.read(CHUNK_HEADER_SIZE))
+        if (magic != CHUNK_MAGIC or chunk_first != first_frame or not 0 < frame_count <= chunk_frames
+                or offset + CHUNK_HEADER_SIZE + size > file_size):
+            return
+        data = f.read(size)
+        if zlib.crc32(data) != crc:
+            return
+        yield offset, first_frame, frame_count, data
+        offset += CHUNK_HEADER_SIZE + size
+        first_frame += frame_count
+
+
+def _chunked_settings(width, height, fps, bytes_per_pixel, keyframe_interval, layout, frame_period_us, chunk_frames):
+    # Header fields that must match for an existing file to be resumed (fps as stored, float32)
+    return {'version': CHUNKED_VERSION, 'width': width, 'height': height,
+            'fps': struct.unpack('<f', struct.pack('<f', fps))[0],
+            'frame_period_us': frame_period_us if frame_period_us is not None else period_from_fps(fps),
+            'bytes_per_pixel': bytes_per_pixel, 'keyframe_interval': max(1, keyframe_interval), 'layout': layout,
+            'chunk_frames': chunk_frames}
+
+
+def resume_sidecar_path(path):
+    """Path of the fingerprint sidecar kept next to a chunked .bin file while it is written."""
+    return path + RESUME_SUFFIX
+
+
+def _read_fingerprint(path):
+    # Fingerprint an interrupted chunked export was started with (None if there is none)
+    try:
+        with open(resume_sidecar_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f).get('fingerprint')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def resumable_frames(path, width, height, fps, bytes_per_pixel=3, keyframe_interval=30, layout=0,
+                     frame_period_us=None, chunk_frames=30, fingerprint=None):
+    """
+    Number of leading frames of an earlier chunked export that a new export can keep.
+
+    Only whole chunks with a valid CRC32 count. Files that are missing, not chunked or
+    written with other settings (size, pixel format, timing, chunking) give 0, and so
+    do files whose resume sidecar does not hold fingerprint (when one is given):
+    complete files, or interrupted exports of another source or other settings.
+    """
+    settings = _chunked_settings(width, height, fps, bytes_per_pixel, keyframe_interval, layout, frame_period_us,
+                                 chunk_frames)
+    if fingerprint is not None and _read_fingerprint(path) != fingerprint:
+        return 0
+    try:
+        with open(path, 'rb') as f:
+            header = read_bin_header(f)
+            if any(header.get(key) != value for key, value in settings.items()):
+                return 0
+            frames = 0
+            for _, _, frame_count, _ in scan_chunks(f, header['header_size'], chunk_frames,
+                                                     os.fstat(f.fileno()).st_size):
+                if frame_count != chunk_frames:
+                    break
+                frames += frame_count
+            return frames
+    except (OSError, struct.error):
+        return 0
+
+
+class ChunkedBinVideoWriter(BinVideoWriterV2):
+    """
+    Writer for the chunked v2 layout (version 3, see module docstring).
+
+    Records are collected in memory and written together with their chunk header
+    once chunk_frames frames have arrived, so the file on disk is always a run of
+    complete chunks plus at most one torn one. Each chunk starts with a keyframe.
+
+    Args:
+        path, width, height, fps, bytes_per_pixel, keyframe_interval, layout,
+        hold_threshold, frame_period_us: As for BinVideoWriterV2
+        chunk_frames: Frames per chunk
+        resume_frames: Keep the first resume_frames frames of an interrupted export at
+            path (whole chunks, see resumable_frames) and append after them
+        fingerprint: String identifying the source and settings of the frames, kept in
+            the resume sidecar until the file is complete; resuming needs the same one
+            (None = no sidecar, resumes only check the header)
+
+    Raises:
+        ValueError: If the existing file cannot be resumed at resume_frames
+    """
+
+    def __init__(self, path, width, height, fps, bytes_per_pixel=3, keyframe_interval=30, layout=0,
+                 hold_threshold=0, frame_period_us=None, chunk_frames=30, resume_frames=0, fingerprint=None):
+        if chunk_frames <= 0:
+            raise ValueError(f"Frames per chunk must be positive, got {chunk_frames}")
+        if resume_frames % chunk_frames:
+            raise ValueError(f"Can only resume after whole chunks of {chunk_frames} frames, got {resume_frames}")
+        self.chunk_frames = chunk_frames
+        self.resume_frames = resume_frames
+        self.fingerprint = fingerprint
+        self._chunk_offsets = []
+        self._chunk_first = 0
+        self._chunk_table_offset = 0
+        super().__init__(path, width, height, fps, bytes_per_pixel, keyframe_interval, layout, hold_threshold,
+                         frame_period_us)
+
+    def _pack_header(self):
+        return struct.pack(CHUNKED_HEADER_FORMAT, V2_MAGIC, CHUNKED_VERSION, CHUNKED_HEADER_SIZE,
+                           self.width, self.height, self.fps, self.frame_count,
+                           self.bytes_per_pixel, self.layout, self.keyframe_interval, self._index_offset,
+                           self.frame_period_us, self._timestamps_offset,
+                           self.chunk_frames, len(self._chunk_offsets), self._chunk_table_offset)
+
+    def _open(self):
+        self._records = io.BytesIO()
+        if not self.resume_frames:
+            self._file = open(self.path, 'wb')
+            self._file.write(self._pack_header())
+            self._write_sidecar()
+            return
+        self._file = open(self.path, 'r+b')
+        try:
+            self._resume()
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _resume(self):
+        header = read_bin_header(self._file)
+        settings = _chunked_settings(self.width, self.height, self.fps, self.bytes_per_pixel, self.keyframe_interval,
+                                     self.layout, self.frame_period_us, self.chunk_frames)
+        if any(header.get(key) != value for key, value in settings.items()):
+            raise ValueError(f"{self.path} was written with different settings, cannot resume it")
+        if self.fingerprint is not None and _read_fingerprint(self.path) != self.fingerprint:
+            raise ValueError(f"{self.path} was written from a different source or settings, cannot resume it")
+
+        end = header['header_size']
+        for offset, first_frame, frame_count, data in scan_chunks(self._file, end, self.chunk_frames,
+                                                                  os.fstat(self._file.fileno()).st_size):
+            if first_frame >= self.resume_frames:
+                break
+            self._replay_chunk(offset, frame_count, data)
+            end = offset + CHUNK_HEADER_SIZE + len(data)
+        if self.frame_count != self.resume_frames:
+            raise ValueError(f"{self.path} has {self.frame_count} intact frames, cannot resume after "
+                             f"{self.resume_frames}")
+        # Drop the torn chunk or old tables after the kept chunks
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._chunk_first = self.frame_count
+
+    def _replay_chunk(self, offset, frame_count, data):
+        # Rebuild the index, statistics and running checksum from a kept chunk
+        num_pixels = self.width * self.height
+        previous = None
+        position = 0
+        frames = 0
+        while position < len(data):
+            record_type, payload_size = struct.unpack_from(RECORD_HEADER_FORMAT, data, position)
+            payload = data[position + RECORD_HEADER_SIZE:position + RECORD_HEADER_SIZE + payload_size]
+            previous = decode_record(record_type, payload, previous, num_pixels, self.bytes_per_pixel)
+            repeat = struct.unpack(HOLD_PAYLOAD_FORMAT, payload)[0] if record_type == FRAME_HOLD else 1
+            for _ in range(repeat):
+                self._sha.update(previous)
+                self._offsets.append(offset + CHUNK_HEADER_SIZE + position)
+            self.record_counts[record_type] += 1
+            if record_type in (FRAME_REPEAT, FRAME_HOLD):
+                self.held_frames += repeat
+            frames += repeat
+            position += RECORD_HEADER_SIZE + payload_size
+        if frames != frame_count:
+            raise ValueError(f"Chunk at {offset} in {self.path} holds {frames} frames, its header says {frame_count}")
+        self.frame_count += frames
+        self.raw_size += frames * num_pixels * self.bytes_per_pixel
+        self.data_size += CHUNK_HEADER_SIZE + len(data)
+        self._chunk_offsets.append(offset)
+
+    def _position(self):
+        # Records are buffered until the chunk is complete; the chunk starts at the file position
+        return self._file.tell() + CHUNK_HEADER_SIZE + self._records.tell()
+
+    def _finish_chunk(self):
+        self._flush_hold()
+        if self.frame_count == self._chunk_first:
+            return
+        data = self._records.getvalue()
+        self._chunk_offsets.append(self._file.tell())
+        self._file.write(struct.pack(CHUNK_HEADER_FORMAT, CHUNK_MAGIC, self._chunk_first,
+                                     self.frame_count - self._chunk_first, len(data), zlib.crc32(data)))
+        self._file.write(data)
+        # Complete chunks reach the disk even if the export is killed later
+        self._file.flush()
+        self.data_size += CHUNK_HEADER_SIZE
+        self._records = io.BytesIO()
+        self._chunk_first = self.frame_count
+        # The next chunk starts with a keyframe
+        self._previous = None
+
+    def write(self, frame_bytes):
+        """Append one frame's raw bytes, writing out the current chunk first if it is full."""
+        if self.frame_count - self._chunk_first == self.chunk_frames:
+            self._finish_chunk()
+        super().write(frame_bytes)
+
+    def _write_sidecar(self):
+        sidecar = resume_sidecar_path(self.path)
+        if self.fingerprint is None:
+            # A sidecar left by an earlier export describes frames that are gone now
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+            return
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint}, f)
+
+    def close(self, timestamps=None):
+        """As BinVideoWriterV2.close; a complete file drops its resume sidecar."""
+        checksum = super().close(timestamps)
+        sidecar = resume_sidecar_path(self.path)
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        return checksum
+
+    def abort(self):
+        """Close an unfinished file, keeping its complete chunks (and sidecar) for a resumed export."""
+        self._file.close()
+
+    def _end_records(self):
+        self._finish_chunk()
+
+    def _write_tables(self):
+        self._chunk_table_offset = self._file.tell()
+        self._file.write(np.asarray(self._chunk_offsets, dtype='<u4').tobytes())
+
+    @property
+    def file_size(self):
+        return super().file_size - V2_HEADER_SIZE + CHUNKED_HEADER_SIZE + 4 * len(self._chunk_offsets)
+
+
+def open_bin_writer(path, width, height, fps, bin_format='v1', bytes_per_pixel=3, layout=0, hold_threshold=0,
+                    frame_period_us=None, chunk_frames=0, resume_frames=0, fingerprint=None):
+    """
+    Open a .bin writer for the requested container format.
+
+    Args:
+        path: Output binary file path
+        width: Frame width in pixels
+        height: Frame height in pixels
+        fps: Frames per second stored in the header
+        bin_format: 'v1' (raw, read by the current children) or 'v2' (delta/RLE)
+        bytes_per_pixel: 3 for 24-bit BGR, 2 for 16-bit RGB565 (v2 only records it)
+        layout: Wiring layout byte (v2 only; v1 files must be row-major BGR)
+        hold_threshold: Per-channel difference below which frames are held (v2 only)
+        frame_period_us: Exact frame period in microseconds (v2 only; v1 files only store the FPS)
+        chunk_frames: Frames per CRC-checked chunk (v2 only, 0 = not chunked)
+        resume_frames: Keep this many frames of an interrupted chunked export (see resumable_frames)
+        fingerprint: Source and settings fingerprint guarding chunked resumes (see ChunkedBinVideoWriter)
+    """
+    if chunk_frames and bin_format != 'v2':
+        raise ValueError("Chunked files need the v2 .bin format")
+    if resume_frames and not chunk_frames:
+        raise ValueError("Only chunked files can be resumed")
+    if chunk_frames:
+        return ChunkedBinVideoWriter(path, width, height, fps, bytes_per_pixel, layout=layout,
+                                     hold_threshold=hold_threshold, frame_period_us=frame_period_us,
+                                     chunk_frames=chunk_frames, resume_frames=resume_frames, fingerprint=fingerprint)
+    if bin_format == 'v2':
+        return BinVideoWriterV2(path, width, height, fps, bytes_per_pixel, layout=layout,
+                                hold_threshold=hold_threshold, frame_period_us=frame_period_us)
+    if layout:
+        raise ValueError("The v1 .bin format cannot record a wiring layout; use v2")
+    if hold_threshold:
+        raise ValueError("The v1 .bin format stores every frame in full; holds need v2")
+    return BinVideoWriter(path, width, height, fps)
+
+
+def read_bin_header(f):
+    """
+    Read a .bin header of either version from an open binary file.
+
+    Returns:
+        dict with version, width, height, fps, frame_period_us, frame_count, bytes_per_pixel,
+        header_size, layout, (v2 only) keyframe_interval, index_offset and
+        timestamps_offset (0 = no timestamp table), and (chunked only) chunk_frames,
+        chunk_count and chunk_table_offset
+    """
+    start = f.read(4)
+    f.seek(0)
+    if start == V2_MAGIC:
+        (_, version, header_size, width, height, fps, frame_count,
+         bytes_per_pixel, layout, keyframe_interval, index_offset) = struct.unpack(
+            V2_BASE_HEADER_FORMAT, f.read(V2_BASE_HEADER_SIZE))
+        frame_period_us, timestamps_offset = period_from_fps(fps), 0
+        if header_size >= V2_HEADER_SIZE:
+            frame_period_us, timestamps_offset = struct.unpack('<II', f.read(8))
+        header = {'version': version, 'header_size': header_size, 'width': width, 'height': height,
+                  'fps': fps, 'frame_period_us': frame_period_us, 'frame_count': frame_count,
+                  'bytes_per_pixel': bytes_per_pixel, 'layout': layout, 'keyframe_interval': keyframe_interval,
+                  'index_offset': index_offset, 'timestamps_offset': timestamps_offset}
+        if version >= CHUNKED_VERSION:
+            header['chunk_frames'], header['chunk_count'], header['chunk_table_offset'] = struct.unpack(
+                '<III', f.read(12))
+        f.seek(header_size)
+        return header
+
+    width, height, fps, frame_count = struct.unpack('<IIfI', f.read(BIN_HEADER_SIZE))
+
+    # v1 does not record the pixel format; infer it from the file size (24-bit unless it fits 16-bit)
+    bytes_per_pixel = 3
+    frame_data_size = os.fstat(f.fileno()).st_size - BIN_HEADER_SIZE - BIN_TRAILER_SIZE
+    if width * height * frame_count and frame_data_size == width * height * frame_count * 2:
+        bytes_per_pixel = 2
+    return {'version': 1, 'header_size': BIN_HEADER_SIZE, 'width': width, 'height': height,
+            'fps': fps, 'frame_period_us': period_from_fps(fps), 'frame_count': frame_count,
+            'bytes_per_pixel': bytes_per_pixel, 'layout': 0}
+
+
+def decode_record(record_type, payload, previous, num_pixels, bytes_per_pixel):
+    """
+    Decode one v2 frame record into a (num_pixels, bytes_per_pixel) uint8 array.
+
+    Args:
+        record_type: FRAME_RAW, FRAME_RLE, FRAME_DELTA, FRAME_REPEAT or FRAME_HOLD
+        payload: Record payload bytes
+        previous: Previously decoded frame (required for delta/repeat records)
+        num_pixels: Pixels per frame
+        bytes_per_pixel: Bytes per pixel
+    """
+    if record_type == FRAME_RAW:
+        return np.frombuffer(payload, dtype=np.uint8).reshape(num_pixels, bytes_per_pixel).copy()
+
+    if record_type == FRAME_RLE:
+        runs = np.frombuffer(payload, dtype=[('count', '<u2'), ('pixel', 'u1', (bytes_per_pixel,))])
+        return np.repeat(runs['pixel'], runs['count'].astype(np.intp), axis=0)
+
+    if previous is None:
+        raise ValueError("Delta/repeat/hold record without a preceding keyframe")
+
+    if record_type in (FRAME_REPEAT, FRAME_HOLD):
+        return previous
+
+    if record_type == FRAME_DELTA:
+        frame = previous.copy()
+        position = 0
+        offset = 0
+        while offset < len(payload):
+            skip, copy = struct.unpack_from('<HH', payload, offset)
+            offset += SPAN_HEADER_SIZE
+            position += skip
+            span_bytes = copy * bytes_per_pixel
+            frame[position:position + copy] = np.frombuffer(
+                payload, dtype=np.uint8, count=span_bytes, offset=offset).reshape(copy, bytes_per_pixel)
+            offset += span_bytes
+            position += copy
+        return frame
+
+    raise ValueError(f"Unknown frame record type: {record_type}")
+
+
+def iter_bin_frames(path):
+    """
+    Stream decoded frames from a v1 or v2 .bin file one at a time.
+
+    Frames are returned as stored: for files with a wiring layout the pixels are
+    in LED order (see wiring.undo_wiring to get row-major BGR back).
+
+    Yields:
+        uint8 arrays of shape (height, width, bytes_per_pixel)
+    """
+    with open(path, 'rb') as f:
+        header = read_bin_header(f)
+        f.seek(header['header_size'])
+        width, height = header['width'], header['height']
+        bytes_per_pixel = header['bytes_per_pixel']
+        num_pixels = width * height
+
+        if header['version'] == 1:
+            frame_size = num_pixels * bytes_per_pixel
+            for _ in range(header['frame_count']):
+                data = f.read(frame_size)
+                if len(data) != frame_size:
+                    raise ValueError(f"Truncated frame data in {path}")
+                yield np.frombuffer(data, dtype=np.uint8).reshape(height, width, bytes_per_pixel)
+            return
+
+        chunk_frames = header.get('chunk_frames', 0)
+        previous = None
+        frame_idx = 0
+        while frame_idx < header['frame_count']:
+            if chunk_frames and frame_idx % chunk_frames == 0:
+                # Holds never cross a chunk boundary, so chunk headers sit between records
+                f.seek(CHUNK_HEADER_SIZE, os.SEEK_CUR)
+            record_type, payload_size = struct.unpack(RECORD_HEADER_FORMAT, f.read(RECORD_HEADER_SIZE))
+            payload = f.read(payload_size)
+            if len(payload) != payload_size:
+                raise ValueError(f"Truncated frame record in {path}")
+            previous = decode_record(record_type, payload, previous, num_pixels, bytes_per_pixel)
+            repeat = struct.unpack(HOLD_PAYLOAD_FORMAT, payload)[0] if record_type == FRAME_HOLD else 1
+            for _ in range(min(repeat, header['frame_count'] - frame_idx)):
+                yield previous.reshape(height, width, bytes_per_pixel)
+            frame_idx += repeat
+
+
+def compare_bin_files(path_a, path_b):
+    """
+    Check that two .bin files (any versions) decode to exactly the same frames.
+
+    Returns:
+        (True, message) if headers and all frames match, (False, message) otherwise
+    """
+    with open(path_a, 'rb') as f:
+        header_a = read_bin_header(f)
+    with open(path_b, 'rb') as f:
+        header_b = read_bin_header(f)
+
+    for key in ('width', 'height', 'frame_count', 'bytes_per_pixel', 'layout'):
+        if header_a[key] != header_b[key]:
+            return False, f"{key} differs: {header_a[key]} != {header_b[key]}"
+
+    for frame_idx, (frame_a, frame_b) in enumerate(zip(iter_bin_frames(path_a), iter_bin_frames(path_b))):
+        if not np.array_equal(frame_a, frame_b):
+            return False, f"frame {frame_idx} differs"
+    return True, f"{header_a['frame_count']} frames identical"
+
+
+def unpack_rgb565(pixels):
+    """
+    Expand little-endian RGB565 pixels back to 24-bit BGR.
+
+    Args:
+        pixels: uint8 array of shape (..., 2)
+
+    Returns:
+        uint8 array of shape (..., 3)
+    """
+    value = np.ascontiguousarray(pixels).view('<u2')[..., 0]
+    bgr = np.empty(value.shape + (3,), dtype=np.uint8)
+    bgr[..., 0] = (value & 0x1F) << 3
+    bgr[..., 1] = ((value >> 5) & 0x3F) << 2
+    bgr[..., 2] = (value >> 11) << 3
+    return bgr
+
+
+class BinReader:
+    """
+    Random-access reader for v1 and v2 .bin files backed by a read-only memory map.
+
+    reader[i] on a v1 file is a zero-copy view into the map; v2 frames are decoded
+    from the nearest preceding keyframe found through the frame index (the last
+    decoded frame is kept, so sequential access decodes each record once). Frames
+    are returned as stored, shape (height, width, bytes_per_pixel).
+
+    Args:
+        path: .bin file path
+
+    Raises:
+        ValueError: If the file is too short or its structure is inconsistent
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file_size = os.path.getsize(path)
+        if self.file_size < BIN_HEADER_SIZE + BIN_TRAILER_SIZE:
+            raise ValueError(f"File too short for a .bin header and trailer ({self.file_size} bytes)")
+        with open(path, 'rb') as f:
+            self.header = read_bin_header(f)
+
+        self.version = self.header['version']
+        self.width = self.header['width']
+        self.height = self.header['height']
+        self.fps = self.header['fps']
+        self.frame_period_us = self.header['frame_period_us']
+        self.frame_count = self.header['frame_count']
+        self.bytes_per_pixel = self.header['bytes_per_pixel']
+        self.layout = self.header['layout']
+        self.frame_size = self.width * self.height * self.bytes_per_pixel
+
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.checksum = bytes(self._data[-BIN_TRAILER_SIZE:])
+        self._frames = None
+        self.timestamps = None
+        self.chunk_frames = self.header.get('chunk_frames', 0)
+        self._checked_chunks = set()
+        self._cached_index = None
+        self._cached_frame = None
+
+        header_size = self.header['header_size']
+        if self.version == 1:
+            data_end = header_size + self.frame_count * self.frame_size
+            if data_end + BIN_TRAILER_SIZE != self.file_size:
+                raise ValueError(f"File size {self.file_size} does not match {self.frame_count} frames "
+                                 f"of {self.frame_size} bytes")
+            self._frames = self._data[header_size:data_end].reshape(
+                self.frame_count, self.height, self.width, self.bytes_per_pixel)
+        else:
+            index_offset = self.header['index_offset']
+            index_end = index_offset + 4 * self.frame_count
+            tables_end = index_end
+            timestamps_offset = self.header['timestamps_offset']
+            if timestamps_offset:
+                if timestamps_offset != index_end:
+                    raise ValueError(f"Timestamp table at {timestamps_offset} does not follow the frame index")
+                tables_end += 4 * self.frame_count
+            chunk_table = tables_end
+            if self.chunk_frames:
+                if self.header['chunk_table_offset'] != chunk_table:
+                    raise ValueError(f"Chunk table at {self.header['chunk_table_offset']} does not follow the "
+                                     f"frame tables")
+                if self.header['chunk_count'] != -(-self.frame_count // self.chunk_frames):
+                    raise ValueError(f"{self.header['chunk_count']} chunks cannot hold {self.frame_count} frames "
+                                     f"of {self.chunk_frames} per chunk")
+                tables_end += 4 * self.header['chunk_count']
+            if index_offset < header_size or tables_end + BIN_TRAILER_SIZE != self.file_size:
+                raise ValueError(f"Frame index at {index_offset} does not fit a {self.file_size} byte file")
+            # The tables are small: copy them out so they do not keep the map open after close()
+            self.offsets = np.array(self._data[index_offset:index_end].view('<u4'))
+            if timestamps_offset:
+                self.timestamps = np.array(self._data[index_end:index_end + 4 * self.frame_count].view('<u4'))
+            if self.chunk_frames:
+                self.chunk_offsets = np.array(self._data[chunk_table:tables_end].view('<u4'))
+            if self.frame_count and (self.offsets.min() < header_size or self.offsets.max() >= index_offset):
+                raise ValueError("Frame index points outside the record area")
+            self.record_types = self._data[self.offsets.astype(np.intp)]
+            self._records_end = index_offset
+
+    def __len__(self):
+        return self.frame_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Releases the map once frames handed out as views (v1) are gone too; the frame tables are copies
+        self._data = self._frames = self._cached_frame = None
+
+    def __iter__(self):
+        for frame_idx in range(self.frame_count):
+            yield self[frame_idx]
+
+    def __getitem__(self, frame_idx):
+        if frame_idx < 0:
+            frame_idx += self.frame_count
+        if not 0 <= frame_idx < self.frame_count:
+            raise IndexError(f"Frame {frame_idx} out of range (0..{self.frame_count - 1})")
+        if self.version == 1:
+            return self._frames[frame_idx]
+        return self._decode(frame_idx).reshape(self.height, self.width, self.bytes_per_pixel)
+
+    def _record(self, frame_idx):
+        offset = int(self.offsets[frame_idx])
+        record_type, payload_size = struct.unpack_from(RECORD_HEADER_FORMAT, self._data, offset)
+        start = offset + RECORD_HEADER_SIZE
+        if start + payload_size > self._records_end:
+            raise ValueError(f"Frame record {frame_idx} runs past the record area")
+        return record_type, self._data[start:start + payload_size]
+
+    def _decode(self, frame_idx):
+        if self._cached_index is not None and self._cached_index <= frame_idx:
+            start, previous = self._cached_index + 1, self._cached_frame
+        else:
+            # Walk back to the nearest keyframe
+            start = frame_idx
+            while start > 0 and self.record_types[start] not in (FRAME_RAW, FRAME_RLE):
+                start -= 1
+            previous = None
+
+        num_pixels = self.width * self.height
+        for idx in range(start, frame_idx + 1):
+            record_type, payload = self._record(idx)
+            previous = decode_record(record_type, payload, previous, num_pixels, self.bytes_per_pixel)
+        self._cached_index, self._cached_frame = frame_idx, previous
+        return previous
+
+    def check_chunk(self, chunk_idx):
+        """
+        Check one chunk of a chunked file against its header and CRC32.
+
+        Returns:
+            (True, message) if the chunk is intact, (False, message) otherwise
+        """
+        first_frame = chunk_idx * self.chunk_frames
+        frames = f"frames {first_frame}-{min(first_frame + self.chunk_frames, self.frame_count) - 1}"
+        offset = int(self.chunk_offsets[chunk_idx])
+        if offset + CHUNK_HEADER_SIZE > self._records_end:
+            return False, f"chunk {chunk_idx} ({frames}) starts outside the record area"
+        magic, chunk_first, frame_count, size, crc = struct.unpack_from(CHUNK_HEADER_FORMAT, self._data, offset)
+        start = offset + CHUNK_HEADER_SIZE
+        if magic != CHUNK_MAGIC or chunk_first != first_frame or start + size > self._records_end:
+            return False, f"chunk {chunk_idx} ({frames}) has a damaged header"
+        if zlib.crc32(self._data[start:start + size]) != crc:
+            return False, f"chunk {chunk_idx} ({frames}) fails its CRC32"
+        return True, f"chunk {chunk_idx} ({frames}) OK"
+
+    def checked_frame(self, frame_idx):
+        """
+        reader[frame_idx], after checking the CRC32 of every chunk it is decoded from.
+
+        Only chunked files can be checked piecewise; other files are returned unchecked.
+
+        Raises:
+            ValueError: If one of those chunks is damaged
+        """
+        if self.chunk_frames:
+            if frame_idx < 0:
+                frame_idx += self.frame_count
+            # Every chunk starts with a keyframe, so decoding never reaches into an earlier chunk
+            chunk_idx = frame_idx // self.chunk_frames
+            if chunk_idx not in self._checked_chunks:
+                ok, message = self.check_chunk(chunk_idx)
+                if not ok:
+                    raise ValueError(message)
+                self._checked_chunks.add(chunk_idx)
+        return self[frame_idx]
+
+    def frame_durations(self):
+        """
+        Display duration of every distinct frame, with repeat/hold records folded in.
+
+        Returns:
+            (first_frames, durations) int arrays; v1 files show every frame for one period
+        """
+        if self.version == 1:
+            return np.arange(self.frame_count), np.ones(self.frame_count, dtype=np.intp)
+        shown = ~np.isin(self.record_types, (FRAME_REPEAT, FRAME_HOLD))
+        first_frames = np.flatnonzero(shown)
+        return first_frames, np.diff(np.append(first_frames, self.frame_count))
+
+    def verify(self, chunk_size=4 << 20, quick=False):
+        """
+        Check the SHA-256 trailer against the frame data.
+
+        v1 data is hashed straight from the map in chunk_size pieces; v2 files are
+        decoded record by record and hashed as decoded frames. Chunked files have
+        every chunk's CRC32 checked first, naming the damaged frames.
+
+        Args:
+            chunk_size: Bytes hashed at a time (v1)
+            quick: Chunked files: only check the chunk CRCs, skip decoding for the SHA-256
+
+        Returns:
+            (True, message) if the checksum matches, (False, message) otherwise
+        """
+        if self.chunk_frames:
+            damaged = [message for ok, message in map(self.check_chunk, range(len(self.chunk_offsets))) if not ok]
+            if damaged:
+                return False, f"{len(damaged)} of {len(self.chunk_offsets)} chunks damaged: {'; '.join(damaged)}"
+            if quick:
+                return True, f"{self.frame_count} frames, {len(self.chunk_offsets)} chunk CRCs OK"
+
+        sha = hashlib.sha256()
+        try:
+            if self.version == 1:
+                start = self.header['header_size']
+                end = start + self.frame_count * self.frame_size
+                for chunk_start in range(start, end, chunk_size):
+                    sha.update(self._data[chunk_start:min(chunk_start + chunk_size, end)])
+            else:
+                previous = None
+                num_pixels = self.width * self.height
+                for frame_idx in range(self.frame_count):
+                    record_type, payload = self._record(frame_idx)
+                    previous = decode_record(record_type, payload, previous, num_pixels, self.bytes_per_pixel)
+                    sha.update(previous)
+        except ValueError as e:
+            return False, str(e)
+
+        if sha.digest() != self.checksum:
+            return False, f"checksum mismatch (stored {self.checksum.hex()[:16]}..., data {sha.hexdigest()[:16]}...)"
+        return True, f"{self.frame_count} frames, checksum OK"
+
+    def describe(self):
+        """Multi-line summary of the header and records, used by the inspect command."""
+        duration = self.frame_count / self.fps if self.fps else 0.0
+        chunked = f" (v2 in {self.chunk_frames}-frame chunks)" if self.chunk_frames else ""
+        lines = [f"  Format: v{self.version}{chunked}",
+                 f"  Size: {self.width}x{self.height}, {self.bytes_per_pixel * 8}-bit",
+                 f"  FPS: {self.fps:.3f} (frame period {self.frame_period_us} us)",
+                 f"  Frames: {self.frame_count} ({duration:.1f} s)",
+                 f"  File size: {self.file_size:,} bytes",
+                 f"  Checksum: {self.checksum.hex()}"]
+        if self.version != 1:
+            # Frames in a hold share one record, so count distinct offsets
+            _, first_frames = np.unique(self.offsets, return_index=True)
+            counts = np.bincount(self.record_types[first_frames], minlength=FRAME_HOLD + 1)
+            displayed = len(first_frames) - counts[FRAME_REPEAT] - counts[FRAME_HOLD]
+            lines.append(f"  Layout byte: 0x{self.layout:02x}, keyframe interval: {self.header['keyframe_interval']}")
+            if self.chunk_frames:
+                lines.append(f"  Chunks: {len(self.chunk_offsets)} of {self.chunk_frames} frames (CRC32)")
+            if self.timestamps is not None and self.frame_count:
+                steps = np.diff(self.timestamps.astype(np.int64))
+                spread = f", steps {steps.min()}-{steps.max()} us" if len(steps) else ""
+                lines.append(f"  Timestamps: 0-{int(self.timestamps[-1])} us{spread}")
+            lines.append(f"  Records: raw {counts[FRAME_RAW]}, rle {counts[FRAME_RLE]}, delta {counts[FRAME_DELTA]}, "
+                         f"repeat {counts[FRAME_REPEAT]}, hold {counts[FRAME_HOLD]}")
+            if self.frame_count:
+                _, durations = self.frame_durations()
+                lines.append(f"  Distinct frames: {displayed} of {self.frame_count} (longest shown for {durations.max()} frames)")
+            raw_size = self.frame_count * self.frame_size
+            if raw_size:
+                lines.append(f"  Compression: {self.file_size / raw_size * 100:.1f}% of raw")
+        return '\n'.join(lines)
+
+
+def find_bin_files(paths):
+    """Expand files and directories (searched recursively) into a sorted list of .bin paths."""
+    bin_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                bin_files.extend(os.path.join(root, name) for name in names if name.endswith('.bin'))
+        else:
+            bin_files.append(path)
+    return sorted(bin_files)
+
+
+def group_media_files(bin_files):
+    """
+    Group {media}_{strip}.bin files (see FILE_NAMING_CONVENTION.md) by media number.
+
+    Returns:
+        dict of media number -> {strip number: path}
+    """
+    media_sets = {}
+    for path in bin_files:
+        match = MEDIA_FILE_PATTERN.match(os.path.basename(path))
+        if match:
+            media_sets.setdefault(int(match.group(1)), {})[int(match.group(2))] = path
+    return media_sets
+
+
+def check_media_set(strip_paths, num_strips=10):
+    """
+    Check that the tiles of one media can play in sync.
+
+    Args:
+        strip_paths: {strip number: path} from group_media_files
+        num_strips: Expected number of strips
+
+    Returns:
+        List of problems (empty if the set is consistent)
+    """
+    problems = []
+    missing = sorted(set(range(1, num_strips + 1)) - set(strip_paths))
+    if missing:
+        problems.append(f"missing strip(s) {', '.join(map(str, missing))}")
+
+    headers = {}
+    for strip, path in sorted(strip_paths.items()):
+        with open(path, 'rb') as f:
+            headers[strip] = read_bin_header(f)
+
+    for key in ('frame_count', 'fps', 'frame_period_us', 'width'):
+        values = {strip: header[key] for strip, header in headers.items()}
+        if len(set(values.values())) > 1:
+            detail = ', '.join(f"{strip}: {value:g}" for strip, value in values.items())
+            problems.append(f"{key} differs between strips ({detail})")
+    return problems
+
+
+def parse_frame_selection(selection, frame_count):
+    """Parse a '0,10,20-29' style frame selection (ranges inclusive); None selects every frame."""
+    if selection is None:
+        return list(range(frame_count))
+    frames = []
+    for part in selection.split(','):
+        first, _, last = part.partition('-')
+        frames.extend(range(int(first), int(last or first) + 1))
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tools for LED .bin video files.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compare_parser = subparsers.add_parser('compare', help="Check two .bin files decode to identical frames")
+    compare_parser.add_argument('file_a')
+    compare_parser.add_argument('file_b')
+
+    inspect_parser = subparsers.add_parser('inspect', help="Show header and record statistics")
+    inspect_parser.add_argument('files', nargs='+')
+
+    verify_parser = subparsers.add_parser(
+        'verify', help="Verify checksums, and that every media has all strips with equal frame count and FPS")
+    verify_parser.add_argument('paths', nargs='+', help=".bin files or directories (e.g. the SD card set root)")
+    verify_parser.add_argument('--strips', type=int, default=10, help="Strips per media (default: 10)")
+    verify_parser.add_argument('--quick', action='store_true',
+                               help="Chunked files: only check the per-chunk CRC32s instead of decoding everything")
+
+    extract_parser = subparsers.add_parser('extract', help="Write frames out as PNG images")
+    extract_parser.add_argument('file')
+    extract_parser.add_argument('output_dir')
+    extract_parser.add_argument('--frames', default=None, help="Frames to extract, e.g. '0,10,20-29' (default: all)")
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        same, message = compare_bin_files(args.file_a, args.file_b)
+        print(f"{'✓' if same else '✗'} {message}")
+        sys.exit(0 if same else 1)
+
+    if args.command == 'inspect':
+        failures = 0
+        for path in args.files:
+            print(path)
+            try:
+                with BinReader(path) as reader:
+                    print(reader.describe())
+            except (OSError, ValueError) as e:
+                failures += 1
+                print(f"  ✗ {e}")
+        sys.exit(1 if failures else 0)
+
+    if args.command == 'verify':
+        bin_files = find_bin_files(args.paths)
+        failures = 0
+        for path in bin_files:
+            try:
+                with BinReader(path) as reader:
+                    ok, message = reader.verify(quick=args.quick)
+            except (OSError, ValueError) as e:
+                ok, message = False, str(e)
+            failures += not ok
+            print(f"  {'✓' if ok else '✗'} {path}: {message}")
+
+        media_sets = group_media_files(bin_files)
+        if media_sets:
+            print()
+        for media, strip_paths in sorted(media_sets.items()):
+            problems = check_media_set(strip_paths, args.strips)
+            if problems:
+                failures += 1
+                print(f"  ✗ Media {media}: {'; '.join(problems)}")
+            else:
+                print(f"  ✓ Media {media}: {len(strip_paths)} strips consistent")
+
+        print(f"\n{len(bin_files)} files checked, {failures} problem(s)")
+        sys.exit(1 if failures else 0)
+
+    if args.command == 'extract':
+        os.makedirs(args.output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(args.file))[0]
+        with BinReader(args.file) as reader:
+            layout = decode_layout(reader.layout)
+            frame_indices = parse_frame_selection(args.frames, len(reader))
+            for frame_idx in frame_indices:
+                frame = reader[frame_idx]
+                if reader.layout:
+                    frame = undo_wiring(frame.reshape(-1, reader.bytes_per_pixel), reader.width, reader.height, layout)
+                if reader.bytes_per_pixel == 2:
+                    frame = unpack_rgb565(frame)
+                cv2.imwrite(os.path.join(args.output_dir, f"{stem}_{frame_idx:05d}.png"), frame)
+        print(f"✓ Extracted {len(frame_indices)} frames from {args.file} to {args.output_dir}")
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+Build the full SD card set ({media}_{strip}.bin for every media and strip) from a manifest.
+
+Manifest (JSON, paths relative to the manifest file):
+
+    {
+      "output_dir": "sd_cards",
+      "cache_dir": ".vid2pix_cache",
+      "defaults": {"gamma": 1.2, "bin_format": "v1"},
+      "media": [
+        {"media": 1, "source": "F1.mp4"},
+        {"media": 2, "source": "logo.jpg", "gamma": 1.0}
+      ]
+    }
+
+Per-media entries may override any key of "defaults": gamma, white_balance,
+brightness_cap, bin_format, color_depth, dither, wiring, channel_order, wiring_config,
+hold_threshold (a number, or a list with one value per strip), decode, smooth_stats,
+denoise, power_budget (amps per strip, null = no limit), power_limit_mode, layout (a
+wall layout file, see wall.py; tiles are numbered 1..N on the SD cards in layout order),
+frame_period_us (resample onto the SYNC period, e.g. 44000; null = keep the source
+frames), resample (nearest or blend), timestamps (v2 timestamp table) and chunk_frames
+(v2 .bin files in CRC32-checked chunks of this many frames, 0 = not chunked).
+
+Output, one directory per child's SD card (see FILE_NAMING_CONVENTION.md):
+
+    sd_cards/SD_01/1_1.bin  2_1.bin  3_1.bin  4_1.bin
+    ...
+    sd_cards/SD_10/1_10.bin ...      4_10.bin
+
+Builds are incremental: a media is skipped when its source content and options
+(including the content of its wiring config and layout files) are unchanged and all
+of its outputs are still exactly as they were written. Strip files a media no longer
+produces (after switching to a layout with fewer tiles) are deleted.
+Source content hashes are reused while the file size and mtime are unchanged, so
+an unchanged library is checked without reading any video data. Media that do
+need rebuilding run in parallel. A media with chunk_frames whose build was
+interrupted resumes after the last intact chunk of its outputs on the next build
+(unless the source or options changed in the meantime, or with --force).
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from binfile import resume_sidecar_path
+from cache import FrameCache, hash_file
+from decode import DECODE_BACKENDS
+from power import LIMIT_MODES
+from temporal import TemporalSmoother
+from timing import RESAMPLE_MODES
+from vidpix import build_color_lut, export_tiles
+from wall import DEFAULT_WALL_LAYOUT, load_wall_layout
+from wiring import NATIVE_LAYOUT, resolve_wiring_layout
+
+# Bump whenever the export output changes for identical sources and options
+BUILD_VERSION = 4
+
+STATE_FILE = '.build_state.json'
+
+# Options naming a file: the output depends on the file's content, not just its path
+FILE_OPTIONS = ('wiring_config', 'layout')
+
+DEFAULT_OPTIONS = {
+    'gamma': 1.2,
+    'white_balance': [1.0, 1.0, 1.0],
+    'brightness_cap': 255,
+    'bin_format': 'v1',
+    'color_depth': 24,
+    'dither': False,
+    'wiring': None,
+    'channel_order': None,
+    'wiring_config': None,
+    'hold_threshold': 0,
+    'decode': 'opencv',
+    'smooth_stats': None,
+    'denoise': 0.0,
+    'power_budget': None,
+    'power_limit_mode': 'wall',
+    'layout': None,
+    'frame_period_us': None,
+    'resample': 'nearest',
+    'timestamps': False,
+    'chunk_frames': 0,
+}
+
+
+def sd_card_dir(output_dir, strip):
+    return os.path.join(output_dir, f"SD_{strip:02d}")
+
+
+def media_output_paths(output_dir, media, num_strips):
+    """Tile .bin paths for one media, in strip order 1..num_strips."""
+    return [os.path.join(sd_card_dir(output_dir, strip), f"{media}_{strip}.bin")
+            for strip in range(1, num_strips + 1)]
+
+
+def job_wall_layout(options):
+    """WallLayout for a job's options (raises OSError/ValueError if the layout file is invalid)."""
+    return load_wall_layout(options['layout']) if options['layout'] else DEFAULT_WALL_LAYOUT
+
+
+def load_manifest(path):
+    """
+    Read a build manifest and resolve it into a list of build jobs.
+
+    Raises:
+        ValueError: If the manifest is malformed
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    resolve = lambda p: p if p is None or os.path.isabs(p) else os.path.join(base_dir, p)
+
+    output_dir = resolve(manifest.get('output_dir', 'sd_cards'))
+    cache_dir = resolve(manifest.get('cache_dir'))
+    unknown = set(manifest.get('defaults', {})) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown option(s) in defaults: {', '.join(sorted(unknown))}")
+    defaults = dict(DEFAULT_OPTIONS, **manifest.get('defaults', {}))
+
+    jobs = []
+    seen = set()
+    for entry in manifest.get('media', []):
+        if 'media' not in entry or 'source' not in entry:
+            raise ValueError(f"Media entry needs 'media' and 'source': {entry}")
+        media = int(entry['media'])
+        if media in seen:
+            raise ValueError(f"Media {media} is listed more than once")
+        seen.add(media)
+
+        options = {key: entry.get(key, value) for key, value in defaults.items()}
+        unknown = set(entry) - set(DEFAULT_OPTIONS) - {'media', 'source'}
+        if unknown:
+            raise ValueError(f"Unknown option(s) for media {media}: {', '.join(sorted(unknown))}")
+        options['wiring_config'] = resolve(options['wiring_config'])
+        options['layout'] = resolve(options['layout'])
+        try:
+            num_strips = len(job_wall_layout(options).tiles)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Media {media}: invalid layout: {e}")
+        wiring_layout = resolve_wiring_layout(options['wiring'], options['channel_order'], options['wiring_config'])
+        if wiring_layout != NATIVE_LAYOUT and options['bin_format'] != 'v2':
+            raise ValueError(f"Media {media}: a wiring layout needs bin_format v2")
+        if options['decode'] not in DECODE_BACKENDS:
+            raise ValueError(f"Media {media}: decode must be one of {', '.join(DECODE_BACKENDS)}")
+        try:
+            make_smoother(options)
+        except ValueError as e:
+            raise ValueError(f"Media {media}: {e}")
+        if options['power_limit_mode'] not in LIMIT_MODES:
+            raise ValueError(f"Media {media}: power_limit_mode must be one of {', '.join(LIMIT_MODES)}")
+        if options['frame_period_us'] is not None:
+            options['frame_period_us'] = int(options['frame_period_us'])
+            if options['frame_period_us'] <= 0:
+                raise ValueError(f"Media {media}: frame_period_us must be positive")
+        if options['resample'] not in RESAMPLE_MODES:
+            raise ValueError(f"Media {media}: resample must be one of {', '.join(RESAMPLE_MODES)}")
+        if options['timestamps'] and options['bin_format'] != 'v2':
+            raise ValueError(f"Media {media}: timestamps need bin_format v2")
+        if not isinstance(options['chunk_frames'], int) or options['chunk_frames'] < 0:
+            raise ValueError(f"Media {media}: chunk_frames must be a non-negative integer")
+        if options['chunk_frames'] and options['bin_format'] != 'v2':
+            raise ValueError(f"Media {media}: chunk_frames needs bin_format v2")
+        if options['color_depth'] not in (24, 16):
+            raise ValueError(f"Media {media}: color_depth must be 24 or 16")
+        if options['color_depth'] == 16 and options['bin_format'] != 'v2':
+            raise ValueError(f"Media {media}: color_depth 16 needs bin_format v2")
+        hold_threshold = options['hold_threshold']
+        if isinstance(hold_threshold, list) and len(hold_threshold) != num_strips:
+            raise ValueError(f"Media {media}: hold_threshold needs one value or {num_strips} (one per strip)")
+        if any(hold_threshold if isinstance(hold_threshold, list) else [hold_threshold]) and options['bin_format'] != 'v2':
+            raise ValueError(f"Media {media}: hold_threshold needs bin_format v2")
+
+        jobs.append({'media': media, 'source': resolve(entry['source']), 'options': options,
+                     'output_dir': output_dir, 'cache_dir': cache_dir})
+    return jobs
+
+
+def make_smoother(options):
+    """TemporalSmoother for a job's options, or None if temporal smoothing is off (raises ValueError if invalid)."""
+    if options['smooth_stats'] is None and not options['denoise']:
+        return None
+    return TemporalSmoother(options['smooth_stats'] or 1.0, options['denoise'])
+
+
+def make_power_options(options):
+    """export_tiles power options for a job, or None if no power budget is set."""
+    if options['power_budget'] is None:
+        return None
+    return {'budget_amps': options['power_budget'], 'mode': options['power_limit_mode']}
+
+
+def load_state(output_dir):
+    try:
+        with open(os.path.join(output_dir, STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(output_dir, state):
+    temp_path = os.path.join(output_dir, STATE_FILE + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_path, os.path.join(output_dir, STATE_FILE))
+
+
+def source_hash(source, previous):
+    """Content hash of a source, reusing the recorded one while size and mtime are unchanged."""
+    stat = os.stat(source)
+    if (previous and previous.get('source_size') == stat.st_size
+            and previous.get('source_mtime_ns') == stat.st_mtime_ns):
+        return previous['source_hash']
+    return hash_file(source)
+
+
+def job_fingerprint(source_digest, options):
+    files = {key: hash_file(options[key]) for key in FILE_OPTIONS if options[key]}
+    description = {'version': BUILD_VERSION, 'source': source_digest, 'options': options, 'files': files}
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def outputs_unchanged(recorded):
+    """True if every recorded output still exists with the same size and mtime."""
+    for path, (size, mtime_ns) in recorded.items():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return False
+    return bool(recorded)
+
+
+def remove_stale_outputs(previous_outputs, outputs):
+    """Delete earlier outputs of a media that its latest build did not write (and SD directories left empty)."""
+    for path in previous_outputs:
+        if path in outputs or not os.path.exists(path):
+            continue
+        os.remove(path)
+        with contextlib.suppress(OSError):
+            os.remove(resume_sidecar_path(path))
+        print(f"    Removed stale {path}")
+        with contextlib.suppress(OSError):
+            os.rmdir(os.path.dirname(path))
+
+
+def run_job(job, workers, log_path=None):
+    """
+    Export one media to one SD card path per strip.
+
+    Returns:
+        State entry for the media (source stat/hash, fingerprint, outputs), or None on failure
+    """
+    options = job['options']
+    wiring_layout = resolve_wiring_layout(options['wiring'], options['channel_order'], options['wiring_config'])
+    wall_layout = job_wall_layout(options)
+
+    output_paths = media_output_paths(job['output_dir'], job['media'], len(wall_layout.tiles))
+    for path in output_paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    cache = FrameCache(job['cache_dir']) if job['cache_dir'] else None
+
+    log = open(log_path, 'w', encoding='utf-8') if log_path else None
+    try:
+        with contextlib.redirect_stdout(log) if log else contextlib.nullcontext():
+            result = export_tiles(job['source'], os.path.join(job['output_dir'], f"media_{job['media']}"),
+                                  workers=workers,
+                                  color_lut=build_color_lut(options['gamma'], options['white_balance'],
+                                                            options['brightness_cap']),
+                                  bin_format=options['bin_format'],
+                                  wiring_layout=wiring_layout,
+                                  cache=cache,
+                                  tile_bin_paths=output_paths,
+                                  write_videos=False,
+                                  hold_threshold=options['hold_threshold'],
+                                  color_depth=options['color_depth'],
+                                  dither=options['dither'],
+                                  decode_backend=options['decode'],
+                                  smoother=make_smoother(options),
+                                  power=make_power_options(options),
+                                  wall_layout=wall_layout,
+                                  writer_threads=workers,
+                                  frame_period_us=options['frame_period_us'],
+                                  resample=options['resample'],
+                                  timestamp_table=options['timestamps'],
+                                  chunk_frames=options['chunk_frames'],
+                                  resume=job.get('resume', False))
+    finally:
+        if log:
+            log.close()
+
+    if result is None:
+        return None
+
+    stat = os.stat(job['source'])
+    outputs = {}
+    for path in output_paths:
+        output_stat = os.stat(path)
+        outputs[path] = [output_stat.st_size, output_stat.st_mtime_ns]
+    return {'source': job['source'], 'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns,
+            'source_hash': job['source_hash'], 'fingerprint': job['fingerprint'],
+            'frame_count': result['frame_count'], 'outputs': outputs,
+            'power': result['power'].report() if result['power'] else None}
+
+
+def build(jobs, parallel=1, force=False):
+    """
+    Build every media whose outputs are out of date.
+
+    Args:
+        jobs: Jobs from load_manifest
+        parallel: Number of media to export at the same time
+        force: Rebuild everything regardless of the recorded state
+
+    Returns:
+        True if every media is up to date or was built successfully
+    """
+    if not jobs:
+        print("Nothing to build: manifest lists no media")
+        return True
+
+    output_dir = jobs[0]['output_dir']
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir)
+
+    pending = []
+    for job in jobs:
+        if not os.path.exists(job['source']):
+            print(f"  ✗ Media {job['media']}: source not found: {job['source']}")
+            return False
+        previous = state.get(str(job['media']))
+        job['source_hash'] = source_hash(job['source'], previous)
+        job['fingerprint'] = job_fingerprint(job['source_hash'], job['options'])
+
+        if (not force and previous and previous.get('fingerprint') == job['fingerprint']
+                and outputs_unchanged(previous.get('outputs', {}))):
+            # Remember the current stat so a touched-but-unchanged source is not rehashed next time
+            stat = os.stat(job['source'])
+            previous['source_size'] = stat.st_size
+            previous['source_mtime_ns'] = stat.st_mtime_ns
+            print(f"  ✓ Media {job['media']}: up to date ({os.path.basename(job['source'])})")
+            continue
+        # An interrupted chunked build of the same source and options keeps its intact chunks
+        job['resume'] = bool(not force and job['options']['chunk_frames'] and previous
+                             and previous.get('in_progress') and previous.get('fingerprint') == job['fingerprint'])
+        pending.append(job)
+
+    if not pending:
+        save_state(output_dir, state)
+        print("\nAll media up to date.")
+        return True
+
+    parallel = max(1, min(parallel, len(pending)))
+    workers = max(1, (os.cpu_count() or 1) // parallel)
+    print(f"\nBuilding {len(pending)} media ({parallel} in parallel, {workers} workers each)...")
+
+    # Record the builds as in progress, so an interrupted one can be resumed next time; the
+    # outputs of earlier builds are remembered so any the new build does not replace get removed
+    for job in pending:
+        previous = state.get(str(job['media'])) or {}
+        job['previous_outputs'] = sorted(set(previous.get('outputs', {})) | set(previous.get('previous_outputs', [])))
+        stat = os.stat(job['source'])
+        state[str(job['media'])] = {'source': job['source'], 'source_size': stat.st_size,
+                                    'source_mtime_ns': stat.st_mtime_ns, 'source_hash': job['source_hash'],
+                                    'fingerprint': job['fingerprint'], 'in_progress': True,
+                                    'previous_outputs': job['previous_outputs']}
+    save_state(output_dir, state)
+
+    results = []
+    if parallel == 1:
+        for job in pending:
+            try:
+                results.append((job, run_job(job, workers)))
+            except Exception as e:
+                print(f"  ✗ Media {job['media']}: {e}")
+                results.append((job, None))
+    else:
+        # Each media logs to its own file so parallel progress output does not interleave
+        log_dir = os.path.join(output_dir, '.logs')
+        os.makedirs(log_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=parallel) as executor:
+            futures = [(job, executor.submit(run_job, job, workers,
+                                             os.path.join(log_dir, f"media_{job['media']}.log")))
+                       for job in pending]
+            for job, future in futures:
+                try:
+                    results.append((job, future.result()))
+                except Exception as e:
+                    print(f"  ✗ Media {job['media']}: {e}")
+                    results.append((job, None))
+
+    success = True
+    for job, entry in results:
+        if entry is None:
+            # The in-progress entry stays, so chunked outputs can resume on the next build
+            success = False
+            print(f"  ✗ Media {job['media']}: build failed ({job['source']})")
+        else:
+            state[str(job['media'])] = entry
+            print(f"  ✓ Media {job['media']}: {entry['frame_count']} frames -> {len(entry['outputs'])} strips")
+            remove_stale_outputs(job['previous_outputs'], entry['outputs'])
+
+    save_state(output_dir, state)
+    return success
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the {media}_{strip}.bin SD card set for all media listed in a manifest.")
+    parser.add_argument('manifest', help="JSON build manifest")
+    parser.add_argument('--jobs', type=int, default=2,
+                        help="Number of media to export in parallel (default: 2)")
+    parser.add_argument('--force', action='store_true', help="Rebuild all media even if up to date")
+    args = parser.parse_args()
+
+    print("=== SD Card Set Build ===")
+    print(f"Manifest: {args.manifest}")
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot load manifest: {e}")
+        sys.exit(1)
+
+    sys.exit(0 if build(jobs, args.jobs, args.force) else 1)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed on-disk cache of processed frame stacks.
+
+Decoding and filtering (blur, resize, renormalise, sharpen) is by far the most
+expensive part of an export, yet changing the tile count, colour depth, gamma or
+container format does not affect it. Each cache entry stores the frames as they
+leave that stage (before the colour LUT) for one source file and one set of
+processing parameters:
+
+    <cache_dir>/<key>/frames.u8   raw uint8 frames, frame_count x height x width x 3
+    <cache_dir>/<key>/meta.json   shape, fps and the parameters the key was built from
+
+The key is a SHA-256 over the source file's content hash and the parameters, so
+renamed or copied sources still hit and any parameter change misses. Entries are
+memory-mapped on read and evicted least-recently-used once the cache grows past
+its size limit.
+
+Several processes may share one cache directory (build.py runs jobs in a process
+pool), so entries are never deleted in place: an entry being evicted or replaced
+is first renamed to a '.<key>-<random>.trash' tombstone, which is atomic, and then
+removed. A reader that already mapped the entry keeps its frames (POSIX keeps the
+unlinked data alive; on Windows a mapped entry cannot be renamed and is left
+alone), and one that looks it up afterwards simply misses. Eviction also skips
+entries used since the FrameCache was opened, which other jobs of the same run may
+still be reading.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+# Bump whenever the cached processing stage changes its output
+CACHE_VERSION = 1
+
+FRAMES_FILE = 'frames.u8'
+META_FILE = 'meta.json'
+TRASH_SUFFIX = '.trash'
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's content, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class FrameCache:
+    """
+    LRU-evicted cache of processed frame stacks keyed on source content + parameters.
+
+    Args:
+        cache_dir: Directory holding the cache entries (created if missing)
+        max_bytes: Total size limit; least-recently-used entries are evicted beyond it
+            (entries used since the cache was opened are kept)
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.opened_at = time.time()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, source_path, **params):
+        """Build the cache key for a source file and processing parameters."""
+        description = {'version': CACHE_VERSION, 'source': hash_file(source_path), 'params': params}
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Look up an entry.
+
+        Returns:
+            (frames, meta) where frames is a read-only memmap of shape
+            (frame_count, height, width, 3), or None on a miss
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        shape = (meta['frame_count'], meta['height'], meta['width'], 3)
+        try:
+            # Mark as recently used for LRU eviction (before mapping, so eviction skips it)
+            now = time.time()
+            os.utime(entry_dir, (now, now))
+            if meta['frame_count'] == 0:
+                frames = np.empty(shape, dtype=np.uint8)
+            else:
+                frames = np.memmap(os.path.join(entry_dir, FRAMES_FILE), dtype=np.uint8, mode='r', shape=shape)
+        except OSError:
+            # Evicted or replaced by another process since the metadata was read
+            return None
+        return frames, meta
+
+    def record(self, key, frames, width, height, fps, **meta):
+        """
+        Pass frames through while writing them to a new cache entry.
+
+        The entry is only published (atomically renamed into place) once the
+        stream has been fully consumed, so interrupted runs never leave a
+        truncated entry behind. An existing entry under the same key is retired
+        first (see the module docstring); if another process publishes the key
+        in the meantime, its entry is kept and this one dropped.
+
+        Args:
+            key: Key from make_key
+            frames: Iterable of uint8 (height, width, 3) frames
+            width: Frame width
+            height: Frame height
+            fps: Source FPS, stored in the metadata
+            **meta: Extra metadata to store alongside
+
+        Yields:
+            The input frames, unchanged
+        """
+        temp_dir = tempfile.mkdtemp(prefix=f'.{key[:16]}-', dir=self.cache_dir)
+        frame_count = 0
+        try:
+            with open(os.path.join(temp_dir, FRAMES_FILE), 'wb') as f:
+                for frame in frames:
+                    f.write(np.ascontiguousarray(frame).data)
+                    frame_count += 1
+                    yield frame
+
+            with open(os.path.join(temp_dir, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump(dict(meta, width=width, height=height, fps=fps, frame_count=frame_count), f)
+
+            entry_dir = os.path.join(self.cache_dir, key)
+            if os.path.isdir(entry_dir):
+                self._retire(key)
+            try:
+                os.rename(temp_dir, entry_dir)
+            except OSError:
+                if not os.path.isdir(entry_dir):
+                    raise
+        finally:
+            if os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self.evict(keep=key)
+
+    def entries(self):
+        """List (key, size_bytes, last_used) for all complete entries."""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+                result.append((name, size, os.stat(entry_dir).st_mtime))
+            except OSError:
+                # Retired by another process while listing
+                continue
+        return result
+
+    def _retire(self, key):
+        # Rename the entry out of the way (atomic, so no process sees half of it), then delete it
+        trash = os.path.join(self.cache_dir, f'.{key[:16]}-{uuid.uuid4().hex}{TRASH_SUFFIX}')
+        try:
+            os.rename(os.path.join(self.cache_dir, key), trash)
+        except OSError:
+            # Already gone, or mapped by a reader on Windows
+            return False
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def evict(self, keep=None):
+        """
+        Remove least-recently-used entries until the cache fits in max_bytes.
+
+        keep, entries used since the cache was opened and entries that cannot be
+        retired (in use on Windows) stay. Tombstones left by interrupted runs are
+        removed too.
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(TRASH_SUFFIX):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, last_used in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep or last_used >= self.opened_at:
+                continue
+            if self._retire(key):
+                total -= size
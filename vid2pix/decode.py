@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Video decode backends with background prefetch.
+
+Backends:
+- opencv: cv2.VideoCapture through FFmpeg with multithreaded decoding (default;
+  output identical to a plain cv2.VideoCapture)
+- opencv-hw: as opencv, plus hardware-accelerated decoding where OpenCV/FFmpeg
+  find a usable device (falls back to software silently)
+- ffmpeg: an `ffmpeg` subprocess piping raw BGR frames. Sources much larger than
+  the LED target are scaled down inside ffmpeg (area filter) to DECODE_OVERSAMPLE
+  times the target size, so full-resolution frames never reach Python. The
+  pipeline still blurs and resizes the smaller frames to the exact target, but
+  results differ slightly from the opencv backends.
+
+Whatever the backend, frames are decoded on a background thread into a bounded
+queue (prefetch), so decoding overlaps with processing instead of blocking it.
+The 'decode' profiling stage is timed on that thread, so it measures decoding
+itself rather than the wait for the next queued frame.
+
+With timestamps=True frames come as (timestamp_us, frame) pairs for resampling
+(see timing.py). The opencv backends report each frame's presentation time, so
+variable-frame-rate sources keep their real timing; the ffmpeg backend outputs
+frames at the nominal rate and timestamps them accordingly.
+"""
+import queue
+import shutil
+import subprocess
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+from profiling import timed_iter
+from timing import period_from_fps
+
+DECODE_BACKENDS = ['opencv', 'opencv-hw', 'ffmpeg']
+PREFETCH_FRAMES = 8
+
+# ffmpeg backend: decode at most this multiple of the target size
+DECODE_OVERSAMPLE = 4
+# ffmpeg backend: stderr lines kept for the error message
+FFMPEG_ERROR_LINES = 20
+
+_END = object()
+
+
+class _DecodeError:
+    def __init__(self, error):
+        self.error = error
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+def scaled_decode_size(width, height, target_width, target_height, oversample=DECODE_OVERSAMPLE):
+    """
+    Frame size for the ffmpeg backend: the source size, or a downscale keeping the
+    aspect ratio when the source exceeds oversample x the target in either dimension.
+    """
+    scale = min(target_width * oversample / width, target_height * oversample / height)
+    if scale >= 1.0:
+        return width, height
+    # Even dimensions keep every ffmpeg pixel format happy
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def open_capture(path, backend='opencv', threads=0):
+    """
+    Open a cv2.VideoCapture for the opencv backends.
+
+    Args:
+        path: Video file path
+        backend: 'opencv' or 'opencv-hw'
+        threads: Decoder threads (0 = let FFmpeg choose, usually one per core)
+
+    Returns:
+        Opened capture, or None
+    """
+    params = [cv2.CAP_PROP_N_THREADS, threads]
+    if backend == 'opencv-hw':
+        params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, params)
+    if not cap.isOpened():
+        # Not an FFmpeg source (or an OpenCV build without these parameters)
+        cap = cv2.VideoCapture(path)
+    return cap if cap.isOpened() else None
+
+
+def iter_ffmpeg_frames(path, width, height, decode_width, decode_height, threads=0):
+    """
+    Yield BGR frames decoded by an ffmpeg subprocess, scaled to decode_width x decode_height.
+
+    Raises:
+        RuntimeError: If ffmpeg exits with an error
+    """
+    command = ['ffmpeg', '-v', 'error', '-nostdin', '-threads', str(threads), '-i', path]
+    if (decode_width, decode_height) != (width, height):
+        command += ['-vf', f'scale={decode_width}:{decode_height}:flags=area']
+    command += ['-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drain stderr while frames are read, so a chatty ffmpeg cannot fill the pipe and stall
+    errors = deque(maxlen=FFMPEG_ERROR_LINES)
+    drain = threading.Thread(target=errors.extend, args=(process.stderr,), name='vid2pix-ffmpeg-stderr',
+                             daemon=True)
+    drain.start()
+    frame_size = decode_width * decode_height * 3
+    finished = False
+    try:
+        while True:
+            frame = np.empty((decode_height, decode_width, 3), dtype=np.uint8)
+            view = memoryview(frame).cast('B')
+            filled = 0
+            while filled < frame_size:
+                count = process.stdout.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+            if filled < frame_size:
+                break
+            yield frame
+        finished = True
+    finally:
+        process.stdout.close()
+        if not finished:
+            process.kill()
+        returncode = process.wait()
+        drain.join()
+        process.stderr.close()
+    error = b''.join(errors).decode('utf-8', 'replace').strip()
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed on {path}: {error or f'exit code {returncode}'}")
+
+
+def prefetch(frames, depth=PREFETCH_FRAMES):
+    """
+    Iterate frames while a background thread decodes up to depth frames ahead.
+
+    Decoder exceptions are re-raised in the consuming thread. Closing the
+    returned generator stops the decoder thread and closes frames.
+    """
+    buffer = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def decode():
+        try:
+            for frame in frames:
+                if not put(frame):
+                    break
+        except Exception as e:
+            put(_DecodeError(e))
+        finally:
+            if hasattr(frames, 'close'):
+                frames.close()
+            put(_END)
+
+    thread = threading.Thread(target=decode, name='vid2pix-decode', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, _DecodeError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def open_video(path, backend='opencv', target_size=None, threads=0, prefetch_depth=PREFETCH_FRAMES,
+               timestamps=False):
+    """
+    Open a video with the requested decode backend.
+
+    Args:
+        path: Video file path
+        backend: One of DECODE_BACKENDS
+        target_size: (width, height) the frames end up at; lets the ffmpeg backend downscale early
+        threads: Decoder threads (0 = automatic)
+        prefetch_depth: Frames decoded ahead on a background thread (0 = decode inline)
+        timestamps: Yield (timestamp_us, frame) pairs instead of bare frames
+
+    Returns:
+        (frames, width, height, fps, total_frames) with the *source* dimensions,
+        or None if the file cannot be opened as a video
+
+    Raises:
+        RuntimeError: If the ffmpeg backend is requested but ffmpeg is not installed
+    """
+    if backend not in DECODE_BACKENDS:
+        raise ValueError(f"Unknown decode backend '{backend}' (expected one of {', '.join(DECODE_BACKENDS)})")
+
+    cap = open_capture(path, 'opencv' if backend == 'ffmpeg' else backend, threads)
+    if cap is None:
+        return None
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if backend == 'ffmpeg':
+        # The capture was only needed for the stream metadata
+        cap.release()
+        if not ffmpeg_available():
+            raise RuntimeError("The ffmpeg decode backend needs the ffmpeg executable on PATH")
+        decode_width, decode_height = width, height
+        if target_size is not None:
+            decode_width, decode_height = scaled_decode_size(width, height, *target_size)
+        frames = iter_ffmpeg_frames(path, width, height, decode_width, decode_height, threads)
+        if timestamps:
+            period = period_from_fps(fps) or period_from_fps(30.0)
+            frames = ((index * period, frame) for index, frame in enumerate(frames))
+    else:
+        frames = iter_capture_frames(cap, timestamps)
+
+    frames = timed_iter('decode', frames)
+    if prefetch_depth:
+        frames = prefetch(frames, prefetch_depth)
+    return frames, width, height, fps, total_frames
+
+
+def iter_capture_frames(cap, timestamps=False):
+    """
+    Yield frames from an opened cv2.VideoCapture one at a time, releasing it at the end.
+
+    With timestamps, yields (timestamp_us, frame) pairs using the capture's position
+    after each read; a timestamp that does not advance (containers without timing)
+    is replaced by the previous one plus the nominal frame period.
+    """
+    period = period_from_fps(cap.get(cv2.CAP_PROP_FPS)) or period_from_fps(30.0)
+    previous = None
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if not timestamps:
+                yield frame
+                continue
+            timestamp = int(round(cap.get(cv2.CAP_PROP_POS_MSEC) * 1000))
+            if previous is not None and timestamp <= previous:
+                timestamp = previous + period
+            previous = timestamp
+            yield timestamp, frame
+    finally:
+        cap.release()
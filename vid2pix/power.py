@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+LED power estimation and limiting for the exported tiles.
+
+Each child drives its own 1440-LED strip from its own supply. A WS2812 draws
+roughly 20 mA per colour channel at full duty, so a full-white strip pulls about
+1440 x 60 mA = 86 A (README.md). The estimate for one strip and frame is
+
+    current_mA = num_leds * idle_ma + sum(channel values) / 255 * ma_per_channel * brightness / 255
+
+where brightness is the runtime FastLED.setBrightness() value on the child (255
+if the limiting is baked in here and the child plays frames unscaled).
+
+PowerLimiter scales frames down to fit a per-strip amp budget before they are
+written, either uniformly across the wall (no visible seams between strips) or
+per strip (each supply gets exactly its budget), and collects a per-strip report
+(peak, mean, frames over budget) that can be written out as JSON.
+"""
+import json
+
+import cv2
+import numpy as np
+
+DEFAULT_MA_PER_CHANNEL = 20.0
+DEFAULT_IDLE_MA = 0.0
+LIMIT_MODES = ['wall', 'strip']
+
+
+class PowerLimiter:
+    """
+    Per-strip current estimator with an optional budget limiter and running report.
+
+    Args:
+        wall_layout: WallLayout; each tile is one strip on its own supply (see wall.py)
+        budget_amps: Current budget per strip in A, or None to only measure
+        mode: 'wall' scales the whole frame by the worst strip's factor, 'strip' scales each strip on its own
+        ma_per_channel: Current per colour channel at value 255, in mA
+        idle_ma: Quiescent current per LED, in mA
+        brightness: Runtime brightness the child applies on top (0-255)
+    """
+
+    def __init__(self, wall_layout, budget_amps=None, mode='wall', ma_per_channel=DEFAULT_MA_PER_CHANNEL,
+                 idle_ma=DEFAULT_IDLE_MA, brightness=255):
+        if mode not in LIMIT_MODES:
+            raise ValueError(f"Unknown limit mode '{mode}' (expected one of {', '.join(LIMIT_MODES)})")
+        self.tiles = wall_layout.tiles
+        self.budget_amps = budget_amps
+        self.mode = mode
+        self.ma_per_channel = ma_per_channel
+        self.idle_ma = idle_ma
+        self.brightness = brightness
+
+        # Tile corners in the summed-area table
+        self._x0 = np.array([tile.x for tile in self.tiles])
+        self._y0 = np.array([tile.y for tile in self.tiles])
+        self._x1 = self._x0 + [tile.width for tile in self.tiles]
+        self._y1 = self._y0 + [tile.height for tile in self.tiles]
+        leds = np.array([tile.width * tile.height for tile in self.tiles])
+        self._idle = leds * idle_ma
+        # mA per unit of channel value sum
+        self._ma_per_level = ma_per_channel / 255.0 * brightness / 255.0
+        self.leds_per_strip = int(leds.max())
+
+        num_strips = len(self.tiles)
+        self.frame_count = 0
+        self.frames_over_budget = np.zeros(num_strips, dtype=np.int64)
+        self.frames_limited = 0
+        self.peak_ma = np.zeros(num_strips)
+        self.peak_frame = np.zeros(num_strips, dtype=np.int64)
+        self.limited_peak_ma = np.zeros(num_strips)
+        self._total_ma = np.zeros(num_strips)
+
+    def estimate(self, frame):
+        """
+        Current per strip for one frame.
+
+        Every tile is summed from one summed-area table, so the cost does not
+        depend on the number or shape of the tiles.
+
+        Args:
+            frame: uint8 (height, width, channels) canvas frame
+
+        Returns:
+            float array of mA, one per strip
+        """
+        table = cv2.integral(frame).sum(axis=2, dtype=np.int64)
+        level_sums = (table[self._y1, self._x1] - table[self._y0, self._x1]
+                      - table[self._y1, self._x0] + table[self._y0, self._x0])
+        return self._idle + level_sums * self._ma_per_level
+
+    def _scale_factors(self, current_ma):
+        """Per-strip brightness factors (<= 1) that bring current_ma within the budget."""
+        budget_ma = self.budget_amps * 1000.0
+        active = current_ma - self._idle
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factors = np.where(current_ma > budget_ma, np.maximum(budget_ma - self._idle, 0.0) / active, 1.0)
+        if self.mode == 'wall':
+            factors[:] = factors.min()
+        return factors
+
+    def process(self, frame):
+        """
+        Measure one frame and, with a budget, return it scaled to fit.
+
+        Frames within budget are returned unchanged (the same array).
+        """
+        current_ma = self.estimate(frame)
+        frame_idx = self.frame_count
+        self.frame_count += 1
+
+        new_peak = current_ma > self.peak_ma
+        self.peak_ma[new_peak] = current_ma[new_peak]
+        self.peak_frame[new_peak] = frame_idx
+        self._total_ma += current_ma
+
+        if self.budget_amps is not None:
+            over = current_ma > self.budget_amps * 1000.0
+            self.frames_over_budget += over
+            if over.any():
+                factors = self._scale_factors(current_ma)
+                if self.mode == 'wall':
+                    pixel_factors = factors[0]
+                else:
+                    # Each tile's pixels take its strip's factor, pixels on no tile stay
+                    pixel_factors = np.ones(frame.shape[:2] + (1,))
+                    for tile, factor in zip(self.tiles, factors):
+                        region = pixel_factors[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+                        np.minimum(region, factor, out=region)
+                # Truncating keeps the scaled current at or below the budget
+                frame = (frame * pixel_factors).astype(np.uint8)
+                current_ma = self.estimate(frame)
+                self.frames_limited += 1
+
+        np.maximum(self.limited_peak_ma, current_ma, out=self.limited_peak_ma)
+        return frame
+
+    def report(self):
+        """Per-strip summary (currents in A) as a JSON-serialisable dict."""
+        strips = []
+        for strip, tile in enumerate(self.tiles):
+            entry = {'strip': strip + 1,
+                     'name': tile.name,
+                     'peak_amps': round(self.peak_ma[strip] / 1000.0, 3),
+                     'peak_frame': int(self.peak_frame[strip]),
+                     'mean_amps': round(self._total_ma[strip] / max(self.frame_count, 1) / 1000.0, 3)}
+            if self.budget_amps is not None:
+                entry['frames_over_budget'] = int(self.frames_over_budget[strip])
+                entry['limited_peak_amps'] = round(self.limited_peak_ma[strip] / 1000.0, 3)
+            strips.append(entry)
+        return {'model': {'ma_per_channel': self.ma_per_channel, 'idle_ma': self.idle_ma,
+                          'brightness': self.brightness, 'leds_per_strip': self.leds_per_strip},
+                'budget_amps': self.budget_amps,
+                'mode': self.mode,
+                'frame_count': self.frame_count,
+                'frames_limited': self.frames_limited,
+                'strips': strips}
+
+    def write_report(self, path, **extra):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(extra, **self.report()), f, indent=2)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Render exported tile .bin files as a simulated LED wall for visual QA.
+
+The tiles of one media are memory-mapped (binfile.BinReader), put back into the
+wall layout and drawn as round LED dots with the physical gaps between strips,
+the child's runtime brightness, the LEDs' linear light output encoded for a
+monitor (display gamma) and an optional diffusion glow.
+
+Rendering is vectorised and reuses everything that does not change per frame:
+- precomputed remap tables upsample the wall and insert the strip gaps in one
+  cv2.remap call (gap pixels fall outside the wall and stay black)
+- the dot mask for the whole output image is precomputed once
+- brightness and display gamma are folded into one 256-entry lookup table
+- the diffusion glow is blurred at LED resolution and upsampled bilinearly
+- frames where no tile changed (v2 repeat/hold records) reuse the last render
+
+Sources:
+    python preview.py out/F1 F1_preview.mp4          # out/F1_1.bin ... out/F1_10.bin
+    python preview.py sd_cards previews/              # every media of an SD card set
+    python preview.py sd_cards f1.mp4 --media 1
+    python preview.py out/F1 frames/ --png --frames 0-23
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from binfile import (FRAME_HOLD, FRAME_REPEAT, BinReader, find_bin_files, group_media_files,
+                     parse_frame_selection, unpack_rgb565)
+from vidpix import open_video_writer
+from wall import DEFAULT_WALL_LAYOUT, describe_wall_layout, load_wall_layout
+from wiring import decode_layout, undo_wiring
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+
+DEFAULT_SCALE = 6
+DEFAULT_DOT_SIZE = 0.75
+DEFAULT_DISPLAY_GAMMA = 2.2
+
+# Spread of the diffusion glow, in LED pitches
+GLOW_SIGMA = 0.7
+
+
+def build_tone_lut(brightness=255, display_gamma=DEFAULT_DISPLAY_GAMMA):
+    """
+    256-entry table from stored channel values to monitor values.
+
+    The child scales values by brightness / 255 and the LEDs emit light linearly in
+    the PWM value, so the linear result is encoded with 1 / display_gamma for an
+    sRGB-like monitor.
+    """
+    linear = np.arange(256) / 255.0 * (brightness / 255.0)
+    return np.clip(np.round(255.0 * linear ** (1.0 / display_gamma)), 0, 255).astype(np.uint8)
+
+
+def axis_maps(size, boundaries, scale, gap):
+    """
+    Output-to-wall coordinate maps along one axis.
+
+    Every wall pixel becomes scale output pixels and gap output pixels are inserted
+    before each boundary.
+
+    Returns:
+        (index, position): the wall pixel shown at each output pixel (-1 in the gaps)
+        and the continuous wall coordinate of its centre (gaps sit halfway between
+        the pixels they separate)
+    """
+    offsets = (np.arange(scale) + 0.5) / scale - 0.5
+    index_parts = []
+    position_parts = []
+    previous = 0
+    for boundary in sorted(set(boundaries)) + [size]:
+        cells = np.arange(previous, boundary)
+        index_parts.append(np.repeat(cells, scale))
+        position_parts.append((cells[:, None] + offsets).ravel())
+        if boundary < size:
+            index_parts.append(np.full(gap, -1))
+            position_parts.append(np.full(gap, boundary - 0.5))
+        previous = boundary
+    return np.concatenate(index_parts), np.concatenate(position_parts).astype(np.float32)
+
+
+def dot_mask(rows, cols, scale, dot_size):
+    """
+    Anti-aliased round dot per LED cell over the whole output image.
+
+    Args:
+        rows, cols: axis_maps results for the two axes
+        scale: Output pixels per LED
+        dot_size: Dot diameter as a fraction of the LED pitch
+
+    Returns:
+        (h, w, 3) uint8 coverage, 255 inside a dot, 0 between dots and in the gaps
+    """
+    (index_y, position_y), (index_x, position_x) = rows, cols
+    offset_y = np.where(index_y >= 0, position_y - index_y, scale)[:, None]
+    offset_x = np.where(index_x >= 0, position_x - index_x, scale)[None, :]
+    distance = np.sqrt(offset_y * offset_y + offset_x * offset_x) * scale
+    coverage = np.clip(dot_size * scale / 2.0 - distance + 0.5, 0.0, 1.0)
+    return np.repeat(np.round(coverage * 255).astype(np.uint8)[..., None], 3, axis=2)
+
+
+class WallPreview:
+    """
+    Renders wall canvas frames as an LED dot simulation.
+
+    Args:
+        wall_layout: WallLayout the tiles belong to
+        scale: Output pixels per LED
+        gap: Output pixels between adjacent strips
+        dot_size: Dot diameter as a fraction of the LED pitch
+        diffusion: Strength of the glow added around each dot (0 = bare dots)
+        brightness: Runtime brightness the children apply (FastLED.setBrightness)
+        display_gamma: Monitor gamma used to encode the linear LED light
+    """
+
+    def __init__(self, wall_layout, scale=DEFAULT_SCALE, gap=None, dot_size=DEFAULT_DOT_SIZE, diffusion=0.5,
+                 brightness=255, display_gamma=DEFAULT_DISPLAY_GAMMA):
+        self.wall_layout = wall_layout
+        gap = scale if gap is None else gap
+        rows = axis_maps(wall_layout.height, [tile.y for tile in wall_layout.tiles if tile.y > 0], scale, gap)
+        cols = axis_maps(wall_layout.width, [tile.x for tile in wall_layout.tiles if tile.x > 0], scale, gap)
+        self.size = (len(cols[0]), len(rows[0]))
+        self.diffusion = diffusion
+        self._mask = dot_mask(rows, cols, scale, dot_size)
+        self._tone_lut = build_tone_lut(brightness, display_gamma)
+
+        # Nearest-LED lookup for the dots, continuous coordinates for the glow
+        index_x, index_y = np.meshgrid(cols[0].astype(np.float32), rows[0].astype(np.float32))
+        self._dot_maps = cv2.convertMaps(index_x, index_y, cv2.CV_16SC2)
+        position_x, position_y = np.meshgrid(cols[1], rows[1])
+        self._glow_maps = cv2.convertMaps(position_x, position_y, cv2.CV_16SC2)
+
+    def render(self, canvas):
+        """
+        Render one (height, width, 3) BGR wall frame.
+
+        Returns:
+            (output height, output width, 3) uint8 image
+        """
+        lit = cv2.LUT(canvas, self._tone_lut)
+        upsampled = cv2.remap(lit, *self._dot_maps, cv2.INTER_NEAREST, borderMode=cv2.BORDER_CONSTANT)
+        dots = cv2.multiply(upsampled, self._mask, scale=1 / 255)
+        if not self.diffusion:
+            return dots
+        glow = cv2.GaussianBlur(lit, (0, 0), GLOW_SIGMA)
+        glow = cv2.remap(glow, *self._glow_maps, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        return cv2.addWeighted(dots, 1.0, glow, self.diffusion, 0.0)
+
+
+class TileSet:
+    """
+    Memory-mapped tiles of one media, reassembled into wall canvas frames.
+
+    Args:
+        paths: .bin path per tile, in wall layout order
+        wall_layout: WallLayout the tiles were exported with
+
+    Raises:
+        ValueError: If a tile's size does not match its layout rectangle
+    """
+
+    def __init__(self, paths, wall_layout):
+        if len(paths) != len(wall_layout.tiles):
+            raise ValueError(f"Expected {len(wall_layout.tiles)} tiles for the layout, got {len(paths)}")
+        self.wall_layout = wall_layout
+        self.readers = [BinReader(path) for path in paths]
+        for reader, tile in zip(self.readers, wall_layout.tiles):
+            if (reader.width, reader.height) != (tile.width, tile.height):
+                raise ValueError(f"{reader.path} is {reader.width}x{reader.height}, "
+                                 f"tile '{tile.name}' is {tile.width}x{tile.height}")
+        self.wirings = [decode_layout(reader.layout) if reader.layout else None for reader in self.readers]
+        self.frame_count = min(len(reader) for reader in self.readers)
+        self.fps = self.readers[0].fps
+        self._canvas = np.zeros((wall_layout.height, wall_layout.width, 3), dtype=np.uint8)
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
+
+    def changed(self, frame_idx):
+        """False if every tile shows frame_idx - 1 again (v2 repeat or hold), True otherwise."""
+        if frame_idx == 0:
+            return True
+        for reader in self.readers:
+            if reader.version == 1 or reader.record_types[frame_idx] not in (FRAME_REPEAT, FRAME_HOLD):
+                return True
+        return False
+
+    def frame(self, frame_idx):
+        """Wall canvas for one frame (row-major BGR, reused between calls)."""
+        for reader, wiring, tile in zip(self.readers, self.wirings, self.wall_layout.tiles):
+            pixels = reader[frame_idx]
+            if wiring is not None:
+                pixels = undo_wiring(pixels.reshape(-1, reader.bytes_per_pixel), tile.width, tile.height, wiring)
+            if reader.bytes_per_pixel == 2:
+                pixels = unpack_rgb565(pixels)
+            self._canvas[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width] = pixels
+        return self._canvas
+
+
+def find_media_sources(source, wall_layout, media=None):
+    """
+    Resolve a source into named tile path lists.
+
+    Args:
+        source: Export basename ({source}_{tile name}.bin) or a directory of {media}_{strip}.bin files
+        wall_layout: WallLayout giving the tile names and count
+        media: Media numbers to use from a directory (default: all)
+
+    Returns:
+        List of (name, [path per tile])
+
+    Raises:
+        ValueError: If tiles are missing
+    """
+    num_tiles = len(wall_layout.tiles)
+    if not os.path.isdir(source):
+        paths = [f"{source}_{tile.name}.bin" for tile in wall_layout.tiles]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"Missing tile file(s): {', '.join(missing)}")
+        return [(os.path.basename(source), paths)]
+
+    media_sets = group_media_files(find_bin_files([source]))
+    selected = sorted(media_sets) if media is None else media
+    sources = []
+    for number in selected:
+        strips = media_sets.get(number, {})
+        missing = sorted(set(range(1, num_tiles + 1)) - set(strips))
+        if missing:
+            raise ValueError(f"Media {number}: missing strip(s) {', '.join(map(str, missing))}")
+        sources.append((f"media_{number}", [strips[strip] for strip in range(1, num_tiles + 1)]))
+    if not sources:
+        raise ValueError(f"No {{media}}_{{strip}}.bin files found in {source}")
+    return sources
+
+
+def render_preview(tiles, renderer, output, png=False, frames=None):
+    """
+    Render a TileSet to a video file, or to PNG images in a directory.
+
+    Returns:
+        Number of frames rendered
+    """
+    frame_indices = parse_frame_selection(frames, tiles.frame_count)
+    writer = None
+    if png:
+        os.makedirs(output, exist_ok=True)
+        stem = os.path.basename(os.path.normpath(output))
+    else:
+        writer, codec = open_video_writer(output, tiles.fps or 30.0, renderer.size)
+        if writer is None:
+            raise OSError(f"Cannot open a video writer for {output}")
+
+    image = None
+    previous_idx = None
+    try:
+        for frame_idx in frame_indices:
+            if image is None or previous_idx != frame_idx - 1 or tiles.changed(frame_idx):
+                image = renderer.render(tiles.frame(frame_idx))
+            previous_idx = frame_idx
+            if writer is not None:
+                writer.write(image)
+            else:
+                cv2.imwrite(os.path.join(output, f"{stem}_{frame_idx:05d}.png"), image)
+    finally:
+        if writer is not None:
+            writer.release()
+    return len(frame_indices)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render exported tile .bin files as a simulated LED wall (video or PNG frames).",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Example:
+  python preview.py output_video preview.mp4
+  python preview.py sd_cards previews/
+  python preview.py sd_cards media1.mp4 --media 1 --led-brightness 50""")
+    parser.add_argument('source', help="Export basename (BASENAME_1.bin ...) or an SD card set directory")
+    parser.add_argument('output', help="Output video file, or a directory (one video per media, or PNGs with --png)")
+    parser.add_argument('--media', type=int, nargs='+', default=None, help="Media numbers to render from a directory")
+    parser.add_argument('--layout', default=None, metavar='JSON', help="Wall layout file the tiles were exported with")
+    parser.add_argument('--png', action='store_true', help="Write PNG frames instead of a video")
+    parser.add_argument('--frames', default=None, help="Frames to render, e.g. '0,10,20-29' (default: all)")
+    parser.add_argument('--scale', type=int, default=DEFAULT_SCALE,
+                        help=f"Output pixels per LED (default: {DEFAULT_SCALE})")
+    parser.add_argument('--gap', type=int, default=None, help="Output pixels between strips (default: --scale)")
+    parser.add_argument('--dot-size', type=float, default=DEFAULT_DOT_SIZE,
+                        help=f"LED dot diameter as a fraction of the pitch (default: {DEFAULT_DOT_SIZE:g})")
+    parser.add_argument('--diffusion', type=float, default=0.5,
+                        help="Glow around each LED, 0 for bare dots (default: 0.5)")
+    parser.add_argument('--led-brightness', type=int, default=255,
+                        help="FastLED.setBrightness() the children apply (default: 255)")
+    parser.add_argument('--display-gamma', type=float, default=DEFAULT_DISPLAY_GAMMA,
+                        help=f"Monitor gamma for the linear LED light (default: {DEFAULT_DISPLAY_GAMMA:g})")
+    args = parser.parse_args()
+
+    wall_layout = DEFAULT_WALL_LAYOUT
+    if args.layout:
+        try:
+            wall_layout = load_wall_layout(args.layout)
+        except (OSError, ValueError) as e:
+            parser.error(f"Invalid wall layout: {e}")
+
+    try:
+        sources = find_media_sources(args.source, wall_layout, args.media)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    single_video = args.output.lower().endswith(VIDEO_EXTENSIONS) and not args.png
+    if single_video and len(sources) > 1:
+        parser.error("Several media found: pass --media or an output directory")
+
+    renderer = WallPreview(wall_layout, args.scale, args.gap, args.dot_size, args.diffusion,
+                           args.led_brightness, args.display_gamma)
+    print("=== LED Wall Preview ===")
+    print(f"Wall: {describe_wall_layout(wall_layout)}, rendered at {renderer.size[0]}x{renderer.size[1]}")
+
+    failures = 0
+    for name, paths in sources:
+        output = args.output
+        if not single_video:
+            output = os.path.join(args.output, name if args.png else f"{name}.mp4")
+            os.makedirs(args.output, exist_ok=True)
+        start = time.perf_counter()
+        try:
+            tiles = TileSet(paths, wall_layout)
+            try:
+                count = render_preview(tiles, renderer, output, args.png, args.frames)
+            finally:
+                tiles.close()
+        except (OSError, ValueError, IndexError) as e:
+            failures += 1
+            print(f"  ✗ {name}: {e}")
+            continue
+        elapsed = time.perf_counter() - start
+        speed = count / tiles.fps / elapsed if tiles.fps and elapsed > 0 else 0.0
+        print(f"  ✓ {name}: {count} frames -> {output} ({elapsed:.2f} s, {speed:.1f}x real time)")
+    sys.exit(1 if failures else 0)
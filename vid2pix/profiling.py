@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight per-stage timing for the vid2pix pipeline.
+
+Pipeline code wraps each stage in `with stage('blur'):`. That is a no-op until a
+StageTimer is enabled (vidpix.py --profile, or bench.py), after which every
+stage invocation is timed with perf_counter and summarised as latency
+percentiles.
+
+Thread pools share the active timer. Process pool workers record into their own
+copy, so only stages that run in the main process are reported with --pool process.
+"""
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+_active_timer = None
+
+
+class StageTimer:
+    """Collects wall-clock samples per named stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.samples[name].append(seconds)
+
+    def summary(self):
+        """
+        Per-stage statistics in milliseconds.
+
+        Returns:
+            dict of stage name -> {count, total_ms, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}
+        """
+        result = {}
+        for name, samples in self.samples.items():
+            ms = np.asarray(samples) * 1000.0
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            result[name] = {'count': len(ms), 'total_ms': round(float(ms.sum()), 3),
+                            'mean_ms': round(float(ms.mean()), 4), 'p50_ms': round(float(p50), 4),
+                            'p90_ms': round(float(p90), 4), 'p99_ms': round(float(p99), 4),
+                            'max_ms': round(float(ms.max()), 4)}
+        return result
+
+    def format_table(self):
+        """Human-readable summary, slowest stage (by total time) first."""
+        summary = self.summary()
+        elapsed = time.perf_counter() - self.started
+        lines = [f"  {'stage':<14}{'count':>8}{'total ms':>12}{'share':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"]
+        for name, stats in sorted(summary.items(), key=lambda item: -item[1]['total_ms']):
+            share = stats['total_ms'] / (elapsed * 1000.0) * 100 if elapsed > 0 else 0.0
+            lines.append(f"  {name:<14}{stats['count']:>8}{stats['total_ms']:>12.1f}{share:>7.1f}%"
+                         f"{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+        lines.append(f"  wall clock: {elapsed * 1000.0:.1f} ms")
+        return '\n'.join(lines)
+
+    def write_json(self, path, **extra):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(extra, stages=self.summary()), f, indent=2)
+
+
+def enable_profiling(timer=None):
+    """Start recording stage timings into timer (a new StageTimer by default) and return it."""
+    global _active_timer
+    _active_timer = timer or StageTimer()
+    return _active_timer
+
+
+def disable_profiling():
+    """Stop recording and return the timer that was active, if any."""
+    global _active_timer
+    timer, _active_timer = _active_timer, None
+    return timer
+
+
+def stage(name):
+    """Context manager timing one stage invocation when profiling is enabled."""
+    if _active_timer is None:
+        return nullcontext()
+    return _active_timer.stage(name)
+
+
+def timed_iter(name, iterable):
+    """Yield from iterable, timing each next() call as stage name (e.g. decode); closing it closes iterable."""
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            if _active_timer is not None:
+                _active_timer.record(name, time.perf_counter() - start)
+            yield item
+    finally:
+        if hasattr(iterator, 'close'):
+            iterator.close()
@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+"""
+Live streaming mode: process a video file or capture device and push each strip's
+tile to the LED controllers over the network, skipping the SD card round-trip.
+
+    python stream.py F1.mp4 --udp 192.168.0.50:4048 --loop
+    python stream.py 0 --tcp 192.168.0.50:7000          # capture device 0
+    python stream.py F1.mp4 --loopback --duration 5     # local dry run
+
+Pipeline (all stages connected by bounded queues):
+
+    decode + process (worker pool)  ->  frame queue  ->  pacer  ->  strip queues  ->  sender threads
+
+- File sources apply back-pressure: processing simply waits when the pacer is ahead.
+- Capture sources never block the camera: the frame queue drops its oldest frame.
+  They are processed one frame at a time with at most one frame per worker in
+  flight, so frames reach that queue (and get dropped there) as soon as they are
+  ready instead of waiting behind batches in the worker pool.
+- The pacer releases frame N at start + N / fps (for capture sources, the Nth frame
+  it releases, since camera frame numbers run at the camera's rate). A frame that is more than one
+  period late is dropped if a newer frame is already waiting, so playback catches
+  up instead of drifting; if it is the newest there is (the source itself is
+  slower than the pacing), it is sent and the schedule is re-anchored on it.
+- Each strip has its own small queue; if a strip's transport falls behind, its
+  oldest unsent slice is dropped so one slow receiver cannot stall the others.
+
+Transports:
+- DdpUdpTransport: DDP (Distributed Display Protocol) over UDP, as understood by
+  WLED/xLights-style receivers; each strip goes to its own host/port.
+- TcpTransport: one TCP connection, messages framed as
+  'VPXS' magic, strip (uint8), frame number (uint32), payload length (uint32), payload.
+- LoopbackTransport: keeps the last payloads per strip in memory (tests / dry runs).
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from decode import iter_capture_frames
+from temporal import TemporalSmoother
+from vidpix import (apply_color_lut, build_color_lut, downscale_frame, fit_target_size, map_frames, open_input,
+                    process_frame, renormalise_frame)
+from wall import DEFAULT_WALL_LAYOUT, TileSlicer, canvas_offset, describe_wall_layout, load_wall_layout
+from wiring import CHANNEL_ORDERS, describe_layout, resolve_wiring_layout
+
+DDP_PORT = 4048
+DDP_HEADER_FORMAT = '>BBBBIH'
+DDP_VERSION_1 = 0x40
+DDP_FLAG_PUSH = 0x01
+DDP_TYPE_RGB8 = 0x0B
+DDP_DEVICE_DEFAULT = 1
+DDP_MAX_DATA = 1440
+
+TCP_MAGIC = b'VPXS'
+TCP_HEADER_FORMAT = '<4sBII'
+
+_CLOSED = object()
+
+
+class DropOldestQueue:
+    """
+    Bounded FIFO shared between threads.
+
+    put() either blocks while the queue is full (back-pressure) or discards the
+    oldest queued item to make room (live sources), counting every drop.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = max(1, maxsize)
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item, block=False):
+        with self._condition:
+            if block:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._condition.wait()
+            elif len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            if self._closed:
+                return
+            self._items.append(item)
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+    def get(self):
+        """Next item, or _CLOSED once the queue is closed and drained."""
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            if not self._items:
+                return _CLOSED
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class Transport:
+    """Sends one strip's tile payload for one frame."""
+
+    def send(self, strip, frame_number, payload):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LoopbackTransport(Transport):
+    """
+    In-process transport that records payloads instead of sending them.
+
+    Args:
+        num_strips: Number of strips
+        history: Payloads kept per strip (oldest are discarded)
+    """
+
+    def __init__(self, num_strips, history=64):
+        self.received = [deque(maxlen=history) for _ in range(num_strips)]
+        self.counts = [0] * num_strips
+        self._lock = threading.Lock()
+
+    def send(self, strip, frame_number, payload):
+        with self._lock:
+            self.received[strip].append((frame_number, bytes(payload)))
+            self.counts[strip] += 1
+
+
+class DdpUdpTransport(Transport):
+    """
+    DDP over UDP: each strip's payload is split into packets of at most 1440 data
+    bytes with the push flag on the last one.
+
+    Args:
+        targets: (host, port) per strip
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self._sequence = [0] * len(targets)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, strip, frame_number, payload):
+        # Sequence numbers cycle 1..15 (0 means "not used" in DDP)
+        self._sequence[strip] = self._sequence[strip] % 15 + 1
+        sequence = self._sequence[strip]
+        view = memoryview(payload)
+        for offset in range(0, len(view), DDP_MAX_DATA):
+            chunk = view[offset:offset + DDP_MAX_DATA]
+            flags = DDP_VERSION_1
+            if offset + DDP_MAX_DATA >= len(view):
+                flags |= DDP_FLAG_PUSH
+            header = struct.pack(DDP_HEADER_FORMAT, flags, sequence, DDP_TYPE_RGB8,
+                                 DDP_DEVICE_DEFAULT, offset, len(chunk))
+            self._socket.sendto(header + chunk, self.targets[strip])
+
+    def close(self):
+        self._socket.close()
+
+
+class TcpTransport(Transport):
+    """
+    All strips multiplexed over one TCP connection (see module docstring for framing).
+
+    Args:
+        host: Receiver host
+        port: Receiver port
+    """
+
+    def __init__(self, host, port):
+        self._socket = socket.create_connection((host, port))
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lock = threading.Lock()
+
+    def send(self, strip, frame_number, payload):
+        header = struct.pack(TCP_HEADER_FORMAT, TCP_MAGIC, strip, frame_number, len(payload))
+        with self._lock:
+            self._socket.sendall(header + payload)
+
+    def close(self):
+        self._socket.close()
+
+
+class LiveStreamer:
+    """
+    Paces processed frames at the source FPS and fans tile slices out to a transport.
+
+    Args:
+        transport: Transport instance
+        fps: Playback rate used for pacing
+        slicer: wall.TileSlicer cutting the strips (with their wiring) out of each frame
+        frame_queue_size: Processed frames buffered ahead of the pacer
+        strip_queue_size: Unsent slices buffered per strip before dropping
+    """
+
+    def __init__(self, transport, fps, slicer, frame_queue_size=4, strip_queue_size=2):
+        self.transport = transport
+        self.period = 1.0 / fps
+        self.slicer = slicer
+        num_strips = len(slicer.layout.tiles)
+        self.frame_queue = DropOldestQueue(frame_queue_size)
+        self.strip_queues = [DropOldestQueue(strip_queue_size) for _ in range(num_strips)]
+        self.sent = [0] * num_strips
+        self.dispatched = 0
+        self.dropped_late = 0
+        self._error = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+        self.frame_queue.close()
+
+    def _produce(self, frames, live):
+        try:
+            for frame_number, frame in enumerate(frames):
+                if self._stop.is_set():
+                    break
+                self.frame_queue.put((frame_number, frame), block=not live)
+        except Exception as e:  # surfaced by run()
+            self._error = e
+        finally:
+            self.frame_queue.close()
+
+    def _send_strip(self, strip):
+        strip_queue = self.strip_queues[strip]
+        while True:
+            item = strip_queue.get()
+            if item is _CLOSED:
+                return
+            frame_number, payload = item
+            try:
+                self.transport.send(strip, frame_number, payload)
+                self.sent[strip] += 1
+            except OSError as e:
+                self._error = e
+                self.stop()
+                return
+
+    def _slice(self, frame):
+        return [tile_bytes.tobytes() for tile_bytes in self.slicer.slice(frame)]
+
+    def stats(self):
+        return {'dispatched': self.dispatched, 'dropped_late': self.dropped_late,
+                'dropped_source': self.frame_queue.dropped,
+                'dropped_strip': [queue.dropped for queue in self.strip_queues],
+                'sent': list(self.sent)}
+
+    def run(self, frames, live=False, duration=None, report_interval=1.0):
+        """
+        Stream until the source ends, duration elapses or stop() is called.
+
+        Args:
+            frames: Iterable of processed frames (full wall, uint8 BGR)
+            live: True for capture sources (drop instead of blocking the source)
+            duration: Optional time limit in seconds
+            report_interval: Seconds between progress lines (0 disables them)
+
+        Returns:
+            stats() dict
+        """
+        producer = threading.Thread(target=self._produce, args=(frames, live), daemon=True)
+        senders = [threading.Thread(target=self._send_strip, args=(strip,), daemon=True)
+                   for strip in range(len(self.strip_queues))]
+        producer.start()
+        for sender in senders:
+            sender.start()
+
+        start = None
+        next_report = time.monotonic() + report_interval
+        try:
+            while not self._stop.is_set():
+                item = self.frame_queue.get()
+                if item is _CLOSED:
+                    break
+                frame_number, frame = item
+
+                # A capture source's frame numbers count camera frames, not playback slots:
+                # live frames take the next slot, whatever was dropped before them
+                slot = self.dispatched if live else frame_number
+                now = time.monotonic()
+                if start is None:
+                    # Anchor the schedule on the first frame that is ready
+                    start = now - slot * self.period
+                if duration is not None and now - start >= duration:
+                    break
+
+                due = start + slot * self.period
+                if now > due + self.period:
+                    if len(self.frame_queue):
+                        # A newer frame is waiting: skip ahead to it
+                        self.dropped_late += 1
+                        continue
+                    # The source is behind real time: show what we have and time later frames from here
+                    start = now - slot * self.period
+                    due = now
+                if due > now:
+                    time.sleep(due - now)
+
+                for strip, payload in enumerate(self._slice(frame)):
+                    self.strip_queues[strip].put((frame_number, payload))
+                self.dispatched += 1
+
+                if report_interval and time.monotonic() >= next_report:
+                    next_report += report_interval
+                    stats = self.stats()
+                    print(f"\r  Sent {stats['dispatched']} frames | late drops {stats['dropped_late']} | "
+                          f"source drops {stats['dropped_source']} | strip drops {sum(stats['dropped_strip'])}",
+                          end='', flush=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            for strip_queue in self.strip_queues:
+                strip_queue.close()
+            for sender in senders:
+                sender.join()
+            producer.join(timeout=1.0)
+
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+
+def open_stream_source(source, loop=False):
+    """
+    Open a file path or capture device index as a frame source.
+
+    Returns:
+        (frames, width, height, fps, live) or None if the source cannot be opened
+    """
+    if source.isdigit() and not os.path.exists(source):
+        cap = cv2.VideoCapture(int(source))
+        if not cap.isOpened():
+            return None
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        return iter_capture_frames(cap), width, height, cap.get(cv2.CAP_PROP_FPS), True
+
+    opened = open_input(source)
+    if opened is None:
+        return None
+    frames, width, height, fps, _, _ = opened
+
+    if loop:
+        def looped(first_pass):
+            yield from first_pass
+            while True:
+                reopened = open_input(source)
+                if reopened is None:
+                    return
+                yield from reopened[0]
+        frames = looped(frames)
+    return frames, width, height, fps, False
+
+
+def process_stream(frames, target_width, target_height, color_lut, workers=1, smoother=None, live=False):
+    """
+    Lazily run the colour/resize pipeline over a stream source (see vidpix.map_frames).
+
+    Args:
+        frames: Source frames
+        target_width, target_height: Processed frame size
+        color_lut: Colour stage from build_color_lut
+        workers: Frame processing workers
+        smoother: Optional TemporalSmoother (only the downscale then runs on the workers)
+        live: Capture source; frames go through the workers one by one for low latency
+
+    Yields:
+        Processed frames in source order
+    """
+    batching = {'batch_size': 1, 'max_pending': workers} if live else {}
+    if smoother is None:
+        return map_frames(process_frame, frames, (target_width, target_height, color_lut), workers, **batching)
+    # The temporal stage is stateful, so only the downscale runs on the worker pool
+    downscaled = map_frames(downscale_frame, frames, (target_width, target_height), workers, **batching)
+    return (apply_color_lut(renormalise_frame(*item, smoother=smoother), color_lut) for item in downscaled)
+
+
+def letterbox_frames(frames, wall_layout, width, height):
+    """Centre each width x height frame on a black canvas of the wall layout's size."""
+    offset_x, offset_y = canvas_offset(width, height, wall_layout)
+    for frame in frames:
+        # A fresh canvas per frame: frames are queued before they are sliced
+        canvas = np.zeros((wall_layout.height, wall_layout.width, 3), dtype=np.uint8)
+        canvas[offset_y:offset_y + height, offset_x:offset_x + width] = frame
+        yield canvas
+
+
+def parse_host_port(value, default_port):
+    host, _, port = value.rpartition(':')
+    if not host:
+        return value, default_port
+    return host, int(port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream a video or capture device live to the LED strips over the network.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Example:
+  python stream.py F1.mp4 --udp 192.168.0.50:4048 --loop
+  python stream.py 0 --tcp 192.168.0.50:7000
+  python stream.py F1.mp4 --loopback --duration 5""")
+    parser.add_argument('source', help="Video/image file, or a capture device index such as 0")
+    transport_group = parser.add_mutually_exclusive_group(required=True)
+    transport_group.add_argument('--udp', nargs='+', metavar='HOST[:PORT]',
+                                 help="DDP receivers: one per strip, or one host using consecutive ports per strip")
+    transport_group.add_argument('--tcp', metavar='HOST:PORT', help="Single TCP receiver for all strips")
+    transport_group.add_argument('--loopback', action='store_true', help="Do not send anywhere (dry run)")
+    parser.add_argument('--fps', type=float, default=None, help="Override the source FPS used for pacing")
+    parser.add_argument('--loop', action='store_true', help="Restart file sources at the end")
+    parser.add_argument('--duration', type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Frame processing workers")
+    parser.add_argument('--queue-size', type=int, default=4, help="Processed frames buffered ahead of playback")
+    parser.add_argument('--gamma', type=float, default=1.2, help="Gamma correction (default: 1.2)")
+    parser.add_argument('--white-balance', type=float, nargs=3, default=[1.0, 1.0, 1.0], metavar=('R', 'G', 'B'),
+                        help="Per-channel LED gain multipliers (default: 1 1 1)")
+    parser.add_argument('--brightness-cap', type=int, default=255, help="Maximum channel value (default: 255)")
+    parser.add_argument('--smooth-stats', type=float, default=None, metavar='ALPHA',
+                        help="EMA weight for temporal smoothing of the normalisation (default: off)")
+    parser.add_argument('--denoise', type=float, default=0.0, metavar='STRENGTH',
+                        help="Per-pixel temporal denoise strength, 0 <= STRENGTH < 1 (default: 0, off)")
+    parser.add_argument('--wiring', choices=['progressive', 'serpentine'], default=None,
+                        help="Send pixels in serpentine LED order")
+    parser.add_argument('--channel-order', choices=CHANNEL_ORDERS, default=None,
+                        help="Channel order on the wire (default: RGB for --udp, BGR otherwise)")
+    parser.add_argument('--wiring-config', default=None, help="JSON wiring layout file")
+    parser.add_argument('--layout', default=None, metavar='JSON',
+                        help="Wall layout file (default: 10 strips of 180x8, see wall.py)")
+    args = parser.parse_args()
+
+    wall_layout = DEFAULT_WALL_LAYOUT
+    if args.layout:
+        try:
+            wall_layout = load_wall_layout(args.layout)
+        except (OSError, ValueError) as e:
+            parser.error(f"Invalid wall layout: {e}")
+
+    smoother = None
+    if args.smooth_stats is not None or args.denoise:
+        try:
+            smoother = TemporalSmoother(args.smooth_stats or 1.0, args.denoise)
+        except ValueError as e:
+            parser.error(str(e))
+
+    channel_order = args.channel_order or ('RGB' if args.udp else None)
+    try:
+        wiring_layout = resolve_wiring_layout(args.wiring, channel_order, args.wiring_config)
+    except (OSError, ValueError) as e:
+        parser.error(f"Invalid wiring layout: {e}")
+
+    opened = open_stream_source(args.source, args.loop)
+    if opened is None:
+        print(f"Error: Cannot open source: {args.source}")
+        sys.exit(1)
+    frames, source_width, source_height, source_fps, live = opened
+
+    fps = args.fps or source_fps or 30.0
+    target_width, target_height, _ = fit_target_size(source_width, source_height, wall_layout.width,
+                                                     wall_layout.height)
+    slicer = TileSlicer(wall_layout, wiring_layout)
+    num_strips = len(wall_layout.tiles)
+
+    if args.udp:
+        if len(args.udp) == 1:
+            host, port = parse_host_port(args.udp[0], DDP_PORT)
+            targets = [(host, port + strip) for strip in range(num_strips)]
+        elif len(args.udp) == num_strips:
+            targets = [parse_host_port(target, DDP_PORT) for target in args.udp]
+        else:
+            parser.error(f"--udp takes one target or exactly {num_strips} (one per strip)")
+        transport = DdpUdpTransport(targets)
+        destination = ', '.join(f"{host}:{port}" for host, port in targets[:2]) + (' ...' if len(targets) > 2 else '')
+    elif args.tcp:
+        host, port = parse_host_port(args.tcp, 7000)
+        transport = TcpTransport(host, port)
+        destination = f"tcp://{host}:{port}"
+    else:
+        transport = LoopbackTransport(num_strips)
+        destination = "loopback"
+
+    print("=== Live LED Stream ===")
+    print(f"Source: {args.source} ({'live capture' if live else 'file'}), {source_width}x{source_height}")
+    print(f"Output: {target_width}x{target_height}, {describe_wall_layout(wall_layout)} -> {destination}")
+    print(f"Pacing: {fps:.2f} fps, wiring: {describe_layout(wiring_layout)}")
+
+    color_lut = build_color_lut(args.gamma, args.white_balance, args.brightness_cap)
+    processed = process_stream(frames, target_width, target_height, color_lut, args.workers, smoother, live)
+
+    if (target_width, target_height) != (wall_layout.width, wall_layout.height):
+        processed = letterbox_frames(processed, wall_layout, target_width, target_height)
+
+    streamer = LiveStreamer(transport, fps, slicer, frame_queue_size=args.queue_size)
+    try:
+        stats = streamer.run(processed, live=live, duration=args.duration)
+    except OSError as e:
+        print(f"\nError: Transport failed: {e}")
+        sys.exit(1)
+    finally:
+        transport.close()
+
+    print(f"\n\n=== Stream Stopped ===")
+    print(f"  Frames sent: {stats['dispatched']}")
+    print(f"  Dropped (late): {stats['dropped_late']}")
+    print(f"  Dropped (source queue): {stats['dropped_source']}")
+    print(f"  Dropped (strip queues): {sum(stats['dropped_strip'])}")
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+SYNC playback simulator: replays the children against the parent's SYNC tick and
+reports how far the wall drifts (parent_controller.ino / child_player.ino).
+
+    python syncsim.py --duration 60
+    python syncsim.py output_video_1.bin --parent-scheduler relative
+    python syncsim.py sd_cards/SD_01/1_1.bin --period-us 48000
+
+Model:
+- Parent: one SYNC tick per period. 'absolute' schedules tick k at start + k * period
+  on micros(), so timing errors never add up; 'relative' is the original millis()
+  loop, where each tick is measured from when the previous one was actually sent
+  (whole milliseconds only). Ticks go out when loop() next polls (up to
+  --parent-loop-us late) and the parent crystal error (ppm) stretches every period.
+- Children: the SYNC interrupt only latches a flag. loop() reads the next frame from
+  the SD card once the previous one has been shown, and on the flag calls
+  FastLED.show(), which blocks while the strip is clocked out (30 us per WS2812 LED
+  plus the reset time). A tick arriving while the flag is still set is lost and
+  that child falls a frame behind the others for good. SD reads take the frame's
+  transfer time on the SPI bus (20 MHz by default, the README figures) plus
+  jitter, with occasional stalls (wear levelling, FAT lookups).
+- Sizing: when the show plus the SD read take longer than the SYNC period, the
+  children cannot keep up at that period whatever the sync scheme does. That is
+  reported as a sizing warning with the shortest period that fits, and the
+  resulting lost ticks and drift are shown but not counted as sync problems.
+- Content: file frame i is meant to appear at its timestamp (table, or i * the
+  file's frame period); content drift is how late it actually appears, measured
+  from the first frame. Files loop like on the children.
+
+The same seed gives the same run, so firmware or export changes can be compared.
+"""
+import argparse
+import sys
+from bisect import bisect_right
+
+import numpy as np
+
+from binfile import BinReader
+from timing import DEFAULT_SYNC_PERIOD_US
+
+NUM_CHILDREN = 10
+LEDS_PER_STRIP = 1440
+
+# WS2812: 24 bits at 800 kHz per LED, then a >280 us low reset
+LED_SHOW_US = 30
+LED_RESET_US = 300
+
+# SPI clock of the SD card in child_player.ino (README: 20 MHz Class 10, 40 MHz UHS-I)
+SD_SPI_HZ = 20_000_000
+PARENT_SCHEDULERS = ['absolute', 'relative']
+
+
+def parent_ticks(period_us, count, scheduler='absolute', loop_us=50, ppm=0.0, rng=None):
+    """
+    SYNC send times of the parent in microseconds, the first one period after playback starts.
+
+    Args:
+        period_us: SYNC period in microseconds ('relative' uses whole milliseconds)
+        count: Number of ticks
+        scheduler: One of PARENT_SCHEDULERS
+        loop_us: Longest parent loop() iteration; each tick goes out up to this late
+        ppm: Parent clock error in parts per million (positive = slow clock, longer periods)
+        rng: numpy Generator for the loop latency
+
+    Returns:
+        float64 array of tick times
+    """
+    if scheduler not in PARENT_SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{scheduler}' (expected one of {', '.join(PARENT_SCHEDULERS)})")
+    rng = rng or np.random.default_rng(0)
+    latency = rng.uniform(0, loop_us, count)
+    if scheduler == 'absolute':
+        ticks = period_us * np.arange(1, count + 1) + latency
+    else:
+        # if (millis() - lastFrameTime >= FRAME_DELAY_MS) { sendSyncSignal(); lastFrameTime = now; }
+        period_ms = max(1, int(round(period_us / 1000)))
+        ticks = np.empty(count)
+        last_ms = 0
+        for tick in range(count):
+            ticks[tick] = (last_ms + period_ms) * 1000 + latency[tick]
+            last_ms = int(ticks[tick] // 1000)
+    return ticks * (1 + ppm * 1e-6)
+
+
+def simulate_child(ticks, show_us, read_us, read_jitter_us=0.0, stall_us=0.0, stall_rate=0.0,
+                   loop_us=20, rng=None):
+    """
+    Replay one child's loop() against the SYNC ticks.
+
+    Args:
+        ticks: Parent tick times in microseconds (sorted)
+        show_us: Duration of one blocking FastLED.show()
+        read_us: Mean SD read time of one frame
+        read_jitter_us: Standard deviation of the read time
+        stall_us: Extra time of a stalled read
+        stall_rate: Probability that a read stalls
+        loop_us: Longest child loop() iteration (delay between the flag and show())
+        rng: numpy Generator
+
+    Returns:
+        (show_ticks, show_times, lost) where show i displays the i-th frame read: the
+        index of the last tick it answers, the time show() started, and the number of
+        ticks lost because the flag was already set
+    """
+    rng = rng or np.random.default_rng(0)
+
+    def read_time():
+        duration = max(0.2 * read_us, rng.normal(read_us, read_jitter_us)) if read_jitter_us else read_us
+        if stall_rate and rng.random() < stall_rate:
+            duration += stall_us
+        return duration
+
+    show_ticks, show_times = [], []
+    lost = 0
+    seen = 0
+    # The first frame is read when the play command arrives, before the first tick
+    now = read_time()
+    while seen < len(ticks):
+        fired = bisect_right(ticks, now)
+        if fired == seen:
+            # Flag clear: idle until the next tick's interrupt is noticed
+            now = ticks[seen] + rng.uniform(0, loop_us)
+            fired = bisect_right(ticks, now)
+        lost += fired - seen - 1
+        seen = fired
+        show_ticks.append(fired - 1)
+        show_times.append(now)
+        now += show_us + read_time()
+    return np.asarray(show_ticks), np.asarray(show_times), lost
+
+
+def content_times(timestamps, frame_period_us, count):
+    """Intended presentation time of the first count frames of a looping file."""
+    if timestamps is None:
+        return np.arange(count) * float(frame_period_us)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    # One loop lasts until the last frame has been shown for a period
+    loop_duration = timestamps[-1] + (np.diff(timestamps).mean() if len(timestamps) > 1 else frame_period_us)
+    index = np.arange(count)
+    return (index // len(timestamps)) * loop_duration + timestamps[index % len(timestamps)]
+
+
+def simulate_wall(period_us, ticks_count, children=NUM_CHILDREN, scheduler='absolute', parent_loop_us=50,
+                  parent_ppm=0.0, show_us=None, leds=LEDS_PER_STRIP, read_us=None, read_jitter_us=300.0,
+                  stall_us=20000.0, stall_rate=0.005, child_loop_us=20, frame_period_us=None, timestamps=None,
+                  seed=0, sd_spi_hz=SD_SPI_HZ):
+    """
+    Simulate the parent and children for ticks_count SYNC ticks.
+
+    show_us and read_us default to the WS2812 timing of leds LEDs and the transfer of
+    leds * 3 bytes at sd_spi_hz. The content defaults to one frame per SYNC period.
+
+    Returns:
+        dict with the tick times, per-child results (show_ticks, show_times, lost,
+        frame_lag) and the wall metrics (frame_skew per tick, show_spread per frame,
+        content_drift per frame in microseconds)
+    """
+    rng = np.random.default_rng(seed)
+    show_us = show_us if show_us is not None else leds * LED_SHOW_US + LED_RESET_US
+    read_us = read_us if read_us is not None else leds * 3 * 8 / sd_spi_hz * 1e6
+    frame_period_us = frame_period_us or period_us
+
+    ticks = parent_ticks(period_us, ticks_count, scheduler, parent_loop_us, parent_ppm, rng)
+    results = []
+    for _ in range(children):
+        show_ticks, show_times, lost = simulate_child(ticks, show_us, read_us, read_jitter_us,
+                                                      stall_us, stall_rate, child_loop_us, rng)
+        # Frame on each child's LEDs just before the next tick (-1 = nothing shown yet)
+        sample_times = np.append(ticks[1:], np.inf)
+        displayed = np.searchsorted(show_times, sample_times, side='right') - 1
+        results.append({'show_ticks': show_ticks, 'show_times': show_times, 'lost': lost,
+                        'frame_lag': np.arange(ticks_count) - displayed})
+
+    displayed = np.array([np.arange(ticks_count) - child['frame_lag'] for child in results])
+    shown_by_all = min(len(child['show_times']) for child in results)
+    starts = np.array([child['show_times'][:shown_by_all] for child in results])
+    intended = content_times(timestamps, frame_period_us, shown_by_all)
+    drift = np.zeros(0)
+    if shown_by_all:
+        # A frame is on the wall once the last child has started showing it
+        latest = starts.max(axis=0)
+        drift = latest - latest[0] - intended
+    return {'ticks': ticks, 'children': results, 'show_us': show_us, 'read_us': read_us,
+            'frame_skew': displayed.max(axis=0) - displayed.min(axis=0),
+            'show_spread': starts.max(axis=0) - starts.min(axis=0),
+            'content_drift': drift}
+
+
+def print_report(result, period_us, frame_period_us, tolerance_us):
+    """
+    Print the simulation report.
+
+    Returns:
+        (problems, undersized): the number of sync problems found, and whether the
+        children are busy longer than the SYNC period (their lost ticks and drift
+        are then a sizing issue and are not counted as problems)
+    """
+    ticks = result['ticks']
+    problems = 0
+    print(f"Parent: {len(ticks)} ticks in {ticks[-1] / 1e6:.1f} s, measured period "
+          f"{np.diff(ticks).mean() / 1000:.3f} ms (nominal {period_us / 1000:.3f} ms), "
+          f"last tick {(ticks[-1] - len(ticks) * period_us) / 1000:+.2f} ms from the ideal timeline")
+    busy = result['show_us'] + result['read_us']
+    undersized = busy > period_us
+    mark = '⚠' if undersized else '✓'
+    print(f"Children: show {result['show_us'] / 1000:.2f} ms + SD read {result['read_us'] / 1000:.2f} ms "
+          f"= {busy / 1000:.2f} ms per frame, {mark} {(period_us - busy) / 1000:+.2f} ms headroom")
+    if undersized:
+        print(f"  ⚠ Sizing: the children need {busy / 1000:.2f} ms per frame, longer than the "
+              f"{period_us / 1000:.2f} ms SYNC period; use --period-us {int(np.ceil(busy))} or more, "
+              f"fewer LEDs per strip or a faster SD bus. Lost ticks below follow from this.")
+    fail = '⚠' if undersized else '✗'
+    print()
+
+    for index, child in enumerate(result['children'], 1):
+        latency = child['show_times'] - ticks[child['show_ticks']]
+        lag = child['frame_lag'][-1]
+        mark = '✓' if not child['lost'] else fail
+        problems += bool(child['lost']) and not undersized
+        print(f"  {mark} Child {index:2d}: {child['lost']} ticks missed, {lag} frames behind at the end, "
+              f"show latency p50 {np.median(latency) / 1000:.2f} ms, max {latency.max() / 1000:.2f} ms")
+
+    print()
+    skew = result['frame_skew']
+    out_of_step = np.count_nonzero(skew)
+    mark = '✓' if not out_of_step else fail
+    problems += bool(out_of_step) and not undersized
+    print(f"  {mark} Frame skew between children: up to {skew.max()} frames, "
+          f"{out_of_step} of {len(skew)} ticks out of step")
+    spread = result['show_spread']
+    if len(spread):
+        print(f"    Show start spread for the same frame: p50 {np.median(spread) / 1000:.2f} ms, "
+              f"max {spread.max() / 1000:.2f} ms")
+    drift = result['content_drift']
+    if len(drift):
+        final = drift[-1]
+        mark = '✓' if abs(final) <= tolerance_us else fail
+        problems += abs(final) > tolerance_us and not undersized
+        print(f"  {mark} Content drift: {final / 1000:+.1f} ms after {len(drift)} frames "
+              f"(worst {np.abs(drift).max() / 1000:.1f} ms; file period {frame_period_us} us, "
+              f"SYNC period {period_us} us)")
+    return problems, undersized
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate SYNC-driven playback on the children and report drift.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Example:
+  python syncsim.py --duration 60
+  python syncsim.py output_video_1.bin --parent-scheduler relative
+  python syncsim.py sd_cards/SD_01/1_1.bin --period-us 48000 --seed 3""")
+    parser.add_argument('bin_file', nargs='?', default=None,
+                        help="Tile .bin whose frame period / timestamps and strip size to use "
+                             "(default: content at the SYNC period, 180x8 strips)")
+    parser.add_argument('--period-us', type=int, default=DEFAULT_SYNC_PERIOD_US,
+                        help=f"Parent SYNC period (default: {DEFAULT_SYNC_PERIOD_US})")
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds to simulate (default: 60)")
+    parser.add_argument('--children', type=int, default=NUM_CHILDREN,
+                        help=f"Number of children (default: {NUM_CHILDREN})")
+    parser.add_argument('--parent-scheduler', choices=PARENT_SCHEDULERS, default='absolute',
+                        help="absolute: micros() schedule (current firmware, default); relative: the original "
+                             "millis() loop")
+    parser.add_argument('--parent-loop-us', type=float, default=50,
+                        help="Longest parent loop() iteration (default: 50)")
+    parser.add_argument('--parent-ppm', type=float, default=0.0, help="Parent clock error in ppm (default: 0)")
+    parser.add_argument('--show-us', type=float, default=None,
+                        help="FastLED.show() duration (default: 30 us per LED + 300 us reset)")
+    parser.add_argument('--read-us', type=float, default=None,
+                        help="Mean SD read time per frame (default: frame bytes at the --sd-mhz SPI clock)")
+    parser.add_argument('--sd-mhz', type=float, default=SD_SPI_HZ / 1e6,
+                        help=f"SD card SPI clock in MHz (default: {SD_SPI_HZ / 1e6:g}; 40 for UHS-I cards)")
+    parser.add_argument('--read-jitter-us', type=float, default=300.0,
+                        help="Standard deviation of the SD read time (default: 300)")
+    parser.add_argument('--stall-us', type=float, default=20000.0,
+                        help="Extra time of a stalled SD read (default: 20000)")
+    parser.add_argument('--stall-rate', type=float, default=0.005,
+                        help="Fraction of SD reads that stall (default: 0.005)")
+    parser.add_argument('--child-loop-us', type=float, default=20,
+                        help="Longest child loop() iteration (default: 20)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    if args.period_us <= 0 or args.duration <= 0 or args.children <= 0 or args.sd_mhz <= 0:
+        parser.error("--period-us, --duration, --children and --sd-mhz must be positive")
+
+    leds, frame_period_us, timestamps = LEDS_PER_STRIP, args.period_us, None
+    if args.bin_file:
+        try:
+            with BinReader(args.bin_file) as reader:
+                leds = reader.width * reader.height
+                frame_period_us = reader.frame_period_us
+                if reader.timestamps is not None:
+                    timestamps = np.array(reader.timestamps)
+                source = f"{args.bin_file}: {reader.frame_count} frames"
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    else:
+        source = "one frame per SYNC period"
+
+    ticks_count = max(1, int(args.duration * 1e6 / args.period_us))
+    result = simulate_wall(args.period_us, ticks_count, args.children, args.parent_scheduler, args.parent_loop_us,
+                           args.parent_ppm, args.show_us, leds, args.read_us, args.read_jitter_us, args.stall_us,
+                           args.stall_rate, args.child_loop_us, frame_period_us, timestamps, args.seed,
+                           args.sd_mhz * 1e6)
+
+    print("=== SYNC Simulation ===")
+    print(f"{args.children} children x {leds} LEDs, {args.period_us} us SYNC period "
+          f"({args.parent_scheduler} scheduling), content: {source}")
+    problems, undersized = print_report(result, args.period_us, frame_period_us, args.period_us / 2)
+    if problems:
+        print(f"\n✗ {problems} problem(s)")
+    elif undersized:
+        print("\n⚠ Sync is sound, but the children are too slow for this SYNC period (see Sizing above)")
+    else:
+        print("\n✓ Wall stays locked")
+    sys.exit(1 if problems else 0)
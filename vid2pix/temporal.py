@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Temporal smoothing for the per-frame renormalisation in vidpix.prepare_frame.
+
+prepare_frame maps each downscaled frame's mean/std back onto the source frame's
+mean/std. Those four statistics jitter from frame to frame, which shows up as
+brightness pumping across the LED wall and makes consecutive frames differ more
+than the content does (hurting v2 delta/hold compression).
+
+TemporalSmoother keeps an exponential moving average of the statistics and
+derives the correction (contrast gain and brightness offset) from the averages.
+The correction is applied around the current frame's own mean, so real scene
+brightness changes pass straight through; only the correction is smoothed. A jump
+in mean brightness larger than scene_cut resets the averages so cuts do not fade.
+
+Optionally, a per-pixel recursive denoise blends each pixel towards its previous
+output value while the change stays below denoise_threshold (noise), and lets
+larger changes (motion) through untouched.
+
+State is constant-size (four floats and one target-size frame) and must be fed
+frames in order, so this stage runs after the parallel downscale stage.
+"""
+import numpy as np
+
+DEFAULT_SCENE_CUT = 30.0
+DEFAULT_DENOISE_THRESHOLD = 12.0
+
+
+class TemporalSmoother:
+    """
+    Stateful temporal stage; create one per output stream (or call reset()).
+
+    Args:
+        stats_alpha: EMA weight of the newest frame's statistics (1.0 = no smoothing)
+        denoise: Per-pixel blend towards the previous frame for small changes (0 = off, < 1)
+        denoise_threshold: Largest per-pixel change (levels) still treated as noise
+        scene_cut: Change in mean brightness (levels) that resets the averages
+    """
+
+    def __init__(self, stats_alpha=1.0, denoise=0.0, denoise_threshold=DEFAULT_DENOISE_THRESHOLD,
+                 scene_cut=DEFAULT_SCENE_CUT):
+        if not 0.0 < stats_alpha <= 1.0:
+            raise ValueError(f"stats_alpha must be in (0, 1], got {stats_alpha}")
+        if not 0.0 <= denoise < 1.0:
+            raise ValueError(f"denoise must be in [0, 1), got {denoise}")
+        self.stats_alpha = stats_alpha
+        self.denoise = denoise
+        self.denoise_threshold = denoise_threshold
+        self.scene_cut = scene_cut
+        self.reset()
+
+    def reset(self):
+        self._stats = None
+        self._previous = None
+        self._scratch = None
+        self._mask = None
+
+    def params(self):
+        """Parameters that change the output, e.g. for cache keys."""
+        return {'stats_alpha': self.stats_alpha, 'denoise': self.denoise,
+                'denoise_threshold': self.denoise_threshold, 'scene_cut': self.scene_cut}
+
+    def correction(self, original_mean, original_std, resized_mean, resized_std):
+        """
+        Feed one frame's statistics and get the smoothed normalisation.
+
+        Returns:
+            (gain, target_mean): the frame is renormalised as
+            (resized - resized_mean) * gain + target_mean
+        """
+        current = np.array([original_mean, original_std, resized_mean, resized_std])
+        if self._stats is None or abs(resized_mean - self._stats[2]) > self.scene_cut:
+            self._stats = current
+        else:
+            self._stats += self.stats_alpha * (current - self._stats)
+
+        smoothed_original_mean, smoothed_original_std, smoothed_resized_mean, smoothed_resized_std = self._stats
+        gain = smoothed_original_std / smoothed_resized_std
+        return gain, resized_mean + (smoothed_original_mean - smoothed_resized_mean)
+
+    def denoise_frame(self, frame):
+        """
+        Recursive per-pixel denoise, in place on a float frame; returns frame.
+
+        A pixel is smoothed only if none of its channels moved by more than
+        denoise_threshold since the previous output.
+        """
+        if not self.denoise:
+            return frame
+        if self._previous is None or self._previous.shape != frame.shape:
+            self._previous = frame.copy()
+            self._scratch = np.empty_like(frame)
+            self._mask = np.empty(frame.shape[:2] + (1,), dtype=bool)
+            return frame
+
+        delta = np.subtract(self._previous, frame, out=self._scratch)
+        np.less_equal(np.abs(delta).max(axis=2, keepdims=True), self.denoise_threshold, out=self._mask)
+        delta *= self.denoise
+        delta *= self._mask
+        frame += delta
+        np.copyto(self._previous, frame)
+        return frame
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The vid2pix modules import each other as top-level modules, as when run from vid2pix/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
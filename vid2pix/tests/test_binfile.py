@@ -0,0 +1,203 @@
+import gc
+import os
+import weakref
+
+import numpy as np
+import pytest
+
+from binfile import (FRAME_DELTA, FRAME_HOLD, FRAME_RAW, FRAME_REPEAT, FRAME_RLE, BinReader, BinVideoWriterV2,
+                     decode_record, encode_delta, encode_rle, iter_bin_frames, open_bin_writer, resumable_frames,
+                     resume_sidecar_path)
+
+WIDTH, HEIGHT = 180, 8
+
+
+def make_frames(count=70, bytes_per_pixel=3, seed=0):
+    """Mostly static frames with a moving bar, sparse noise and a few exact repeats."""
+    rng = np.random.default_rng(seed)
+    frame = np.zeros((HEIGHT, WIDTH, bytes_per_pixel), dtype=np.uint8)
+    frame[:, :60] = 40
+    frames = []
+    for idx in range(count):
+        if idx % 10 not in (3, 4):
+            frame = frame.copy()
+            frame[:, (idx * 7) % WIDTH] = 255
+            ys, xs = rng.integers(0, HEIGHT, 20), rng.integers(0, WIDTH, 20)
+            frame[ys, xs] = rng.integers(0, 256, (20, bytes_per_pixel), dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def write_bin(path, frames, bin_format='v2', **kwargs):
+    bytes_per_pixel = frames[0].shape[2]
+    writer = open_bin_writer(str(path), WIDTH, HEIGHT, 30.0, bin_format, bytes_per_pixel=bytes_per_pixel, **kwargs)
+    for frame in frames:
+        writer.write(frame.tobytes())
+    writer.close()
+    return writer
+
+
+def flip_byte(path, offset):
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        value = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([value ^ 0xFF]))
+
+
+@pytest.mark.parametrize('bin_format, bytes_per_pixel, kwargs', [
+    ('v1', 3, {}),
+    ('v2', 3, {}),
+    ('v2', 2, {}),
+    ('v2', 3, {'chunk_frames': 16}),
+    ('v2', 2, {'chunk_frames': 7}),
+])
+def test_round_trip_is_exact(tmp_path, bin_format, bytes_per_pixel, kwargs):
+    frames = make_frames(bytes_per_pixel=bytes_per_pixel)
+    path = tmp_path / 'tile.bin'
+    write_bin(path, frames, bin_format, **kwargs)
+
+    decoded = list(iter_bin_frames(str(path)))
+    assert len(decoded) == len(frames)
+    for frame, frame_out in zip(frames, decoded):
+        np.testing.assert_array_equal(frame_out, frame)
+
+    with BinReader(str(path)) as reader:
+        assert len(reader) == len(frames)
+        # Random access, backwards and forwards, must match sequential decoding
+        for idx in [len(frames) - 1, 0, 35, 12, 13, 69, 3, 4]:
+            np.testing.assert_array_equal(reader[idx], frames[idx])
+        assert reader.verify()[0]
+
+
+def test_v2_uses_every_record_type(tmp_path):
+    writer = BinVideoWriterV2(str(tmp_path / 'tile.bin'), WIDTH, HEIGHT, 30.0, keyframe_interval=8)
+    for frame in make_frames():
+        writer.write(frame.tobytes())
+    writer.close()
+    assert writer.record_counts[FRAME_RLE] + writer.record_counts[FRAME_RAW] > 1
+    assert writer.record_counts[FRAME_DELTA] > 0
+    assert writer.record_counts[FRAME_REPEAT] + writer.record_counts[FRAME_HOLD] > 0
+
+
+def test_v2_and_chunked_share_the_v1_checksum(tmp_path):
+    frames = make_frames()
+    checksums = [write_bin(tmp_path / f'{name}.bin', frames, bin_format, **kwargs).checksum
+                 for name, bin_format, kwargs in [('v1', 'v1', {}), ('v2', 'v2', {}),
+                                                  ('chunked', 'v2', {'chunk_frames': 16})]]
+    assert checksums[0] == checksums[1] == checksums[2]
+
+
+def test_hold_threshold_decodes_to_the_held_frame(tmp_path):
+    rng = np.random.default_rng(1)
+    base = rng.integers(10, 240, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    jitter = [np.clip(base.astype(int) + rng.integers(-2, 3, base.shape), 0, 255).astype(np.uint8)
+              for _ in range(10)]
+    frames = [base] + jitter + [255 - base]
+    path = tmp_path / 'tile.bin'
+    writer = write_bin(path, frames, hold_threshold=2)
+    assert writer.held_frames == len(jitter)
+
+    decoded = list(iter_bin_frames(str(path)))
+    for frame_out in decoded[:1 + len(jitter)]:
+        np.testing.assert_array_equal(frame_out, base)
+    np.testing.assert_array_equal(decoded[-1], 255 - base)
+    with BinReader(str(path)) as reader:
+        assert reader.verify()[0]
+
+
+@pytest.mark.parametrize('bytes_per_pixel', [2, 3])
+@pytest.mark.parametrize('fraction', [0.0, 0.001, 0.05, 0.5, 1.0])
+def test_encoders_round_trip_long_frames(bytes_per_pixel, fraction):
+    # More pixels than a uint16 run or skip can count
+    num_pixels = 70000
+    rng = np.random.default_rng(2)
+    previous = np.zeros((num_pixels, bytes_per_pixel), dtype=np.uint8)
+    pixels = previous.copy()
+    changed = rng.random(num_pixels) < fraction
+    changed[[3, num_pixels - 1]] = fraction > 0
+    pixels[changed] = rng.integers(1, 256, (int(changed.sum()), bytes_per_pixel), dtype=np.uint8)
+
+    np.testing.assert_array_equal(
+        decode_record(FRAME_RLE, encode_rle(pixels), None, num_pixels, bytes_per_pixel), pixels)
+    np.testing.assert_array_equal(
+        decode_record(FRAME_DELTA, encode_delta(pixels, previous), previous, num_pixels, bytes_per_pixel), pixels)
+    assert encode_rle(pixels, limit=1) is None
+    if fraction:
+        assert encode_delta(pixels, previous, limit=1) is None
+
+
+@pytest.mark.parametrize('bin_format', ['v1', 'v2'])
+def test_corrupted_frame_data_fails_verification(tmp_path, bin_format):
+    path = tmp_path / 'tile.bin'
+    write_bin(path, make_frames(), bin_format)
+    with BinReader(str(path)) as reader:
+        # A byte inside the second frame's data (v2: its record payload)
+        offset = reader.header['header_size'] + WIDTH * HEIGHT * 3 + 10 if bin_format == 'v1' \
+            else int(reader.offsets[1]) + 5 + 2
+    flip_byte(path, offset)
+
+    with BinReader(str(path)) as reader:
+        ok, message = reader.verify()
+    assert not ok
+
+
+def test_corrupted_chunk_fails_its_crc(tmp_path):
+    frames = make_frames()
+    path = tmp_path / 'tile.bin'
+    write_bin(path, frames, chunk_frames=16)
+    with BinReader(str(path)) as reader:
+        offset = int(reader.offsets[40]) + 5 + 1
+    flip_byte(path, offset)
+
+    with BinReader(str(path)) as reader:
+        ok, message = reader.verify(quick=True)
+        assert not ok
+        assert 'chunk 2 (frames 32-47) fails its CRC32' in message
+        assert not reader.check_chunk(2)[0]
+        # Other chunks are still usable on their own
+        np.testing.assert_array_equal(reader.checked_frame(50), frames[50])
+        np.testing.assert_array_equal(reader.checked_frame(10), frames[10])
+        with pytest.raises(ValueError, match='CRC32'):
+            reader.checked_frame(33)
+
+
+def test_resume_needs_the_same_fingerprint(tmp_path):
+    frames = make_frames()
+    path = str(tmp_path / 'tile.bin')
+    writer = open_bin_writer(path, WIDTH, HEIGHT, 30.0, 'v2', chunk_frames=16, fingerprint='a')
+    for frame in frames[:40]:
+        writer.write(frame.tobytes())
+    writer.abort()
+
+    assert resumable_frames(path, WIDTH, HEIGHT, 30.0, chunk_frames=16, fingerprint='a') == 32
+    assert resumable_frames(path, WIDTH, HEIGHT, 30.0, chunk_frames=16, fingerprint='b') == 0
+    with pytest.raises(ValueError, match='different source or settings'):
+        open_bin_writer(path, WIDTH, HEIGHT, 30.0, 'v2', chunk_frames=16, resume_frames=32, fingerprint='b')
+
+    write_bin(path, frames[32:], chunk_frames=16, resume_frames=32, fingerprint='a')
+    decoded = list(iter_bin_frames(path))
+    assert len(decoded) == len(frames)
+    np.testing.assert_array_equal(decoded[-1], frames[-1])
+    # A complete file is not resumed
+    assert resumable_frames(path, WIDTH, HEIGHT, 30.0, chunk_frames=16, fingerprint='a') == 0
+    assert not os.path.exists(resume_sidecar_path(path))
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'chunk_frames': 16}])
+def test_close_releases_the_map(tmp_path, kwargs):
+    path = tmp_path / 'tile.bin'
+    writer = open_bin_writer(str(path), WIDTH, HEIGHT, 30.0, 'v2', **kwargs)
+    for frame in make_frames():
+        writer.write(frame.tobytes())
+    writer.close(timestamps=range(0, 70 * 1000, 1000))
+
+    reader = BinReader(str(path))
+    reader[40]
+    reader.verify()
+    mapping = weakref.ref(reader._data._mmap)
+    reader.close()
+    gc.collect()
+    assert mapping() is None
+    # The frame tables stay usable after close
+    assert len(reader.offsets) == 70 and reader.timestamps[-1] == 69000
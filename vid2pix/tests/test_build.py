@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from build import load_manifest
+
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps(manifest), encoding='utf-8')
+    return str(path)
+
+
+def test_defaults_apply_to_every_media(tmp_path):
+    jobs = load_manifest(write_manifest(tmp_path, {
+        'defaults': {'gamma': 1.4},
+        'media': [{'media': 1, 'source': 'a.mp4'}, {'media': 2, 'source': 'b.mp4', 'gamma': 2.0}],
+    }))
+    assert [job['options']['gamma'] for job in jobs] == [1.4, 2.0]
+
+
+@pytest.mark.parametrize('manifest, message', [
+    ({'defaults': {'gama': 1.4}, 'media': [{'media': 1, 'source': 'a.mp4'}]}, 'Unknown option.* in defaults: gama'),
+    ({'media': [{'media': 1, 'source': 'a.mp4', 'gama': 1.4}]}, 'Unknown option.* for media 1: gama'),
+])
+def test_unknown_options_are_rejected(tmp_path, manifest, message):
+    with pytest.raises(ValueError, match=message):
+        load_manifest(write_manifest(tmp_path, manifest))
@@ -0,0 +1,148 @@
+import os
+
+import numpy as np
+import pytest
+
+from cache import FrameCache
+from vidpix import prepare_frames
+
+WIDTH, HEIGHT = 16, 8
+
+
+def make_frames(count=5, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def make_source(tmp_path, name='clip.mp4', content=b'clip'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def record(cache, key, frames, **meta):
+    passed = list(cache.record(key, iter(frames), WIDTH, HEIGHT, 30.0, **meta))
+    assert all(frame_out is frame for frame_out, frame in zip(passed, frames))
+
+
+def set_last_used(cache, key, timestamp):
+    os.utime(os.path.join(cache.cache_dir, key), (timestamp, timestamp))
+
+
+def test_hit_and_miss(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    key = cache.make_key(make_source(tmp_path), width=WIDTH, height=HEIGHT)
+    assert cache.get(key) is None
+
+    frames = make_frames()
+    record(cache, key, frames, source='clip.mp4')
+    cached_frames, meta = cache.get(key)
+    assert cached_frames.shape == (5, HEIGHT, WIDTH, 3)
+    np.testing.assert_array_equal(cached_frames, np.stack(frames))
+    assert meta['fps'] == 30.0 and meta['frame_count'] == 5 and meta['source'] == 'clip.mp4'
+
+
+def test_key_follows_source_content_and_settings(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    source = make_source(tmp_path)
+    key = cache.make_key(source, width=WIDTH, height=HEIGHT)
+
+    # Renamed copies hit; parameter order does not matter
+    assert cache.make_key(make_source(tmp_path, 'copy.mp4'), height=HEIGHT, width=WIDTH) == key
+    assert cache.make_key(source, width=WIDTH, height=HEIGHT, temporal={'denoise': 0.5}) != key
+    assert cache.make_key(source, width=WIDTH + 1, height=HEIGHT) != key
+    assert cache.make_key(make_source(tmp_path, 'edited.mp4', b'clip!'), width=WIDTH, height=HEIGHT) != key
+
+
+def test_interrupted_record_is_not_published(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    recording = cache.record('k' * 64, iter(make_frames()), WIDTH, HEIGHT, 30.0)
+    next(recording)
+    recording.close()
+    assert cache.get('k' * 64) is None
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_entry_without_timestamps_misses_when_they_are_needed(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    source = make_source(tmp_path)
+    frames = make_frames(seed=1)
+
+    def decoded(timestamps):
+        # Like timing.record_timestamps: timestamps are collected as frames are decoded
+        for idx, frame in enumerate(frames):
+            if timestamps is not None:
+                timestamps.append(idx * 33333)
+            yield frame
+
+    def prepare(timestamps=None):
+        prepared, cached_count = prepare_frames(source, decoded(timestamps), WIDTH, HEIGHT, 30.0, cache=cache,
+                                                timestamps=timestamps)
+        return list(prepared), cached_count
+
+    first, cached_count = prepare()
+    assert cached_count is None
+    assert prepare()[1] == 5
+
+    # Timed exports need the source timestamps: the entry is recorded again with them
+    timestamps = []
+    assert prepare(timestamps)[1] is None
+    restored = []
+    again, cached_count = prepare(restored)
+    assert cached_count == 5 and restored == timestamps == list(range(0, 5 * 33333, 33333))
+    np.testing.assert_array_equal(np.stack(again), np.stack(first))
+    assert len(cache.entries()) == 1
+
+
+def test_lru_eviction(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    keys = ['a' * 64, 'b' * 64, 'c' * 64]
+    for key in keys:
+        record(cache, key, make_frames())
+    entry_size = cache.entries()[0][1]
+    for key, last_used in zip(keys, [1000, 3000, 2000]):
+        set_last_used(cache, key, last_used)
+
+    later = FrameCache(cache.cache_dir, max_bytes=2 * entry_size)
+    later.evict()
+    assert sorted(key for key, _, _ in later.entries()) == keys[1:]
+
+    # Entries used since the cache was opened (by this or another job of the run) stay
+    later.max_bytes = 0
+    later.get(keys[2])
+    later.evict()
+    assert [key for key, _, _ in later.entries()] == [keys[2]]
+    later.evict(keep=keys[2])
+    assert [key for key, _, _ in later.entries()] == [keys[2]]
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="Windows refuses to retire a mapped entry instead")
+def test_eviction_leaves_readers_their_frames(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    key = 'a' * 64
+    frames = make_frames()
+    record(cache, key, frames)
+    cached_frames, _ = cache.get(key)
+    set_last_used(cache, key, 1000)
+
+    # Another process evicts the entry while this one is still reading it
+    FrameCache(cache.cache_dir, max_bytes=0).evict()
+    assert cache.get(key) is None
+    assert os.listdir(cache.cache_dir) == []
+    np.testing.assert_array_equal(cached_frames, np.stack(frames))
+
+
+def test_replacing_an_entry(tmp_path, monkeypatch):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    key = 'a' * 64
+    record(cache, key, make_frames(seed=1))
+    record(cache, key, make_frames(seed=2), timestamps_us=[0, 1, 2, 3, 4])
+    cached_frames, meta = cache.get(key)
+    np.testing.assert_array_equal(cached_frames, np.stack(make_frames(seed=2)))
+    assert meta['timestamps_us'] == [0, 1, 2, 3, 4]
+
+    # An entry that cannot be retired (mapped on Windows, or just published by another process) is kept
+    monkeypatch.setattr(cache, '_retire', lambda key: False)
+    record(cache, key, make_frames(seed=3))
+    np.testing.assert_array_equal(cache.get(key)[0], np.stack(make_frames(seed=2)))
+    assert len(os.listdir(cache.cache_dir)) == 1
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from binfile import FRAME_RAW, RECORD_HEADER_SIZE, BinReader, open_bin_writer, unpack_rgb565
+from vidpix import pack_rgb565
+from wall import TileSlicer, make_wall_layout
+
+
+def reference_565(frames):
+    blue, green, red = (frames[..., channel].astype(np.uint16) for channel in range(3))
+    return (red >> 3) << 11 | (green >> 2) << 5 | blue >> 3
+
+
+def random_frames(shape, seed=0):
+    frames = np.random.default_rng(seed).integers(0, 256, shape + (3,), dtype=np.uint8)
+    # Full-scale (column 0) and zero (column 1) channels; shifting 255 in uint8 used to overflow
+    frames[..., 0, :] = 255
+    frames[..., 1, :] = 0
+    return frames
+
+
+def fields(packed):
+    packed = packed.astype(np.int32)
+    return packed >> 11, (packed >> 5) & 0x3F, packed & 0x1F
+
+
+def test_single_frame_matches_reference():
+    frame = random_frames((8, 180))
+    packed = pack_rgb565(frame)
+    assert packed.dtype == np.dtype('<u2') and packed.shape == (8, 180)
+    np.testing.assert_array_equal(packed, reference_565(frame))
+    assert np.all(packed[:, 0] == 0xFFFF) and np.all(packed[:, 1] == 0)
+
+
+def test_batch_packs_into_the_given_buffers():
+    frames = random_frames((5, 8, 180), seed=1)
+    out = np.empty((5, 8, 180), dtype='<u2')
+    scratch = np.empty_like(out)
+    packed = pack_rgb565(frames, out, scratch=scratch)
+    assert packed is out
+    np.testing.assert_array_equal(packed, reference_565(frames))
+
+
+@pytest.mark.parametrize('bgr, expected', [
+    ((0, 0, 255), b'\x00\xf8'),
+    ((0, 255, 0), b'\xe0\x07'),
+    ((255, 0, 0), b'\x1f\x00'),
+    ((8, 4, 8), b'\x21\x08'),
+])
+def test_pixel_byte_order(bgr, expected):
+    assert pack_rgb565(np.array([[bgr]], dtype=np.uint8)).tobytes() == expected
+
+
+def test_bin_stores_little_endian_565(tmp_path):
+    # Same path as export_tiles: pack the canvas, view it as bytes, slice the tiles, write them
+    layout = make_wall_layout(8, 4, [('1', 0, 0, 8, 2), ('2', 0, 2, 8, 2)])
+    frame = random_frames((4, 8), seed=2)
+    packed = pack_rgb565(frame).view(np.uint8).reshape(4, 8, 2)
+    tile_bytes = TileSlicer(layout, bytes_per_pixel=2).slice(packed)[1]
+
+    path = str(tmp_path / 'tile.bin')
+    writer = open_bin_writer(path, 8, 2, 30.0, 'v2', bytes_per_pixel=2)
+    writer.write(tile_bytes.tobytes())
+    writer.close()
+
+    expected = b''.join(int(value).to_bytes(2, 'little') for value in reference_565(frame[2:]).ravel())
+    with BinReader(path) as reader:
+        assert reader.record_types[0] == FRAME_RAW
+        offset = int(reader.offsets[0]) + RECORD_HEADER_SIZE
+        assert bytes(reader._data[offset:offset + len(expected)]) == expected
+        assert reader[0].tobytes() == expected
+        # The player-side expansion gets the truncated colours back
+        shifts = np.array([3, 2, 3], dtype=np.uint8)
+        np.testing.assert_array_equal(unpack_rgb565(reader[0]), (frame[2:] >> shifts) << shifts)
+
+
+def test_dither_moves_each_channel_by_at_most_one_step():
+    gradient = np.repeat(np.arange(180, dtype=np.uint8)[None, :, None], 3, axis=2)
+    frames = np.stack([np.repeat(gradient, 8, axis=0), random_frames((8, 180), seed=3)])
+    dithered = pack_rgb565(frames, dither=True)
+    plain = reference_565(frames)
+
+    assert dithered.dtype == np.dtype('<u2')
+    assert int(dithered.min()) >= 0 and int(dithered.max()) <= 0xFFFF
+    for dithered_field, plain_field in zip(fields(dithered), fields(plain)):
+        step = dithered_field - plain_field
+        assert step.min() >= 0 and step.max() <= 1
+    # Full-scale channels saturate instead of wrapping into the next field
+    assert np.all(dithered[1][:, 0] == 0xFFFF)
+    # The gradient actually gets dithered
+    assert np.any(dithered[0] != plain[0])
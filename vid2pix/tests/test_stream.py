@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+
+from stream import LiveStreamer, LoopbackTransport, process_stream
+from vidpix import build_color_lut
+from wall import TileSlicer, make_wall_layout
+
+LAYOUT = make_wall_layout(16, 4, [('1', 0, 0, 16, 2), ('2', 0, 2, 16, 2)])
+
+
+def make_frames(count):
+    return [np.full((LAYOUT.height, LAYOUT.width, 3), idx, dtype=np.uint8) for idx in range(count)]
+
+
+def paced(frames, interval):
+    for frame in frames:
+        time.sleep(interval)
+        yield frame
+
+
+def stream(frames, fps, **kwargs):
+    transport = LoopbackTransport(len(LAYOUT.tiles))
+    streamer = LiveStreamer(transport, fps, TileSlicer(LAYOUT), **kwargs)
+    started = time.monotonic()
+    stats = streamer.run(frames, report_interval=0)
+    return transport, stats, time.monotonic() - started
+
+
+def test_frames_are_paced_at_the_fps():
+    # 40 ms periods leave room for scheduler hiccups on a loaded machine
+    frames = make_frames(10)
+    transport, stats, elapsed = stream(frames, 25)
+    assert stats['dispatched'] == 10 and stats['dropped_late'] == 0
+    assert elapsed >= 9 / 25
+    assert transport.counts == [10, 10]
+    assert [number for number, _ in transport.received[1]] == list(range(10))
+
+
+def test_slow_source_keeps_playing():
+    # A 50 fps producer paced at 100 fps is always late, but every frame is the newest there is
+    frames = make_frames(30)
+    transport, stats, _ = stream(paced(frames, 0.02), 100)
+    assert stats['dispatched'] == 30
+    assert stats['dropped_late'] == 0
+    assert transport.counts == [30, 30]
+    last_number, last_payload = transport.received[0][-1]
+    assert last_number == 29
+    assert last_payload == frames[29][:2].tobytes()
+
+
+def test_stalled_pacer_skips_to_the_newest_frame():
+    # A burst of frames queued behind a stall is late; only what is still on time (or newest) is sent
+    frames = make_frames(8)
+
+    def stalled():
+        yield frames[0]
+        time.sleep(0.2)
+        yield from frames[1:]
+
+    transport, stats, _ = stream(stalled(), 100, frame_queue_size=8)
+    assert stats['dispatched'] + stats['dropped_late'] == 8
+    assert transport.received[0][-1][0] == 7
+
+
+class TimedTransport(LoopbackTransport):
+    """Loopback transport that also records when each frame's first strip went out."""
+
+    def __init__(self, num_strips):
+        super().__init__(num_strips)
+        self.sent_at = {}
+
+    def send(self, strip, frame_number, payload):
+        super().send(strip, frame_number, payload)
+        self.sent_at.setdefault(frame_number, time.monotonic())
+
+
+def camera(count, interval, captured):
+    # Capture device stand-in: frame idx is ready at captured[idx]
+    for idx in range(count):
+        time.sleep(interval)
+        captured.append(time.monotonic())
+        yield np.full((LAYOUT.height, LAYOUT.width, 3), idx, dtype=np.uint8)
+
+
+def test_live_source_is_not_held_back_by_batching():
+    # With 8 workers, batches of 8 frames and 16 batches in flight held ~128 frames before the first one
+    captured = []
+    processed = process_stream(camera(200, 0.005, captured), LAYOUT.width, LAYOUT.height, build_color_lut(),
+                               workers=8, live=True)
+    next(processed)
+    assert len(captured) <= 3
+    assert time.monotonic() - captured[0] < 0.3
+    processed.close()
+
+
+def test_live_source_drops_stale_frames_for_a_slow_consumer():
+    # A 100 fps camera shown at 20 fps: frames are dropped at the queue and what is sent stays fresh
+    captured = []
+    processed = process_stream(camera(60, 0.01, captured), LAYOUT.width, LAYOUT.height, build_color_lut(),
+                               workers=8, live=True)
+    transport = TimedTransport(len(LAYOUT.tiles))
+    streamer = LiveStreamer(transport, 20, TileSlicer(LAYOUT), frame_queue_size=2)
+    stats = streamer.run(processed, live=True, report_interval=0)
+
+    assert stats['dropped_source'] > 0
+    assert stats['dispatched'] + stats['dropped_source'] + stats['dropped_late'] == 60
+    assert max(transport.sent_at[number] - captured[number] for number in transport.sent_at) < 0.3
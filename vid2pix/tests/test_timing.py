@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from binfile import BinReader, open_bin_writer
+from timing import DEFAULT_SYNC_PERIOD_US, resample_frames
+
+
+def source(timestamps):
+    """(timestamp_us, frame) pairs whose 1x1 frame holds its source index."""
+    return [(timestamp, np.full((1, 1, 3), idx, dtype=np.uint8)) for idx, timestamp in enumerate(timestamps)]
+
+
+def indices(resampled):
+    return [int(frame[0, 0, 0]) for _, frame in resampled]
+
+
+def test_nearest_30_fps_onto_the_sync_period():
+    # One second at 30 fps onto 44 ms ticks (~22.7 fps): 23 ticks, mostly 4 source frames per 3 ticks
+    timestamps = [round(idx * 1e6 / 30) for idx in range(30)]
+    resampled = list(resample_frames(source(timestamps), DEFAULT_SYNC_PERIOD_US, 'nearest'))
+
+    ticks = [k * DEFAULT_SYNC_PERIOD_US for k in range(23)]
+    assert [timestamp for timestamp, _ in resampled] == ticks
+    assert indices(resampled)[:11] == [0, 1, 3, 4, 5, 7, 8, 9, 11, 12, 13]
+    # Closest source frame to each tick (ties to the earlier one); the last one is held to the end
+    nearest = [min(range(30), key=lambda idx: (abs(timestamps[idx] - tick), idx)) for tick in ticks]
+    assert indices(resampled) == nearest
+    assert nearest[-1] == 29
+
+
+def test_blend_weights():
+    frames = [(0, np.zeros((1, 1, 3), dtype=np.uint8)), (100000, np.full((1, 1, 3), 200, dtype=np.uint8))]
+    resampled = list(resample_frames(frames, 25000, 'blend'))
+
+    assert [int(frame[0, 0, 0]) for _, frame in resampled] == [0, 50, 100, 150, 200, 200, 200, 200]
+    # Ticks on a source frame are that frame, not a blend
+    assert resampled[0][1] is frames[0][1] and resampled[4][1] is frames[1][1]
+
+
+def test_last_frame_is_held_for_one_source_frame():
+    frames = source([0, 40000, 80000])
+    resampled = list(resample_frames(frames, 20000, 'nearest'))
+
+    # The clip keeps its 120 ms length: the last frame covers 80-120 ms
+    assert [timestamp for timestamp, _ in resampled] == [0, 20000, 40000, 60000, 80000, 100000]
+    assert indices(resampled) == [0, 0, 1, 1, 2, 2]
+    assert resampled[-1][1] is resampled[-2][1] is frames[-1][1]
+
+
+def test_single_frame_and_stalled_timestamps():
+    assert indices(resample_frames(source([5000]), DEFAULT_SYNC_PERIOD_US)) == [0]
+    # A frame whose timestamp does not advance is dropped; a tick half way between two frames
+    # shows the earlier one
+    assert indices(resample_frames(source([0, 0, 50000]), 25000)) == [0, 0, 2, 2]
+
+
+def test_unknown_mode_and_bad_period():
+    with pytest.raises(ValueError, match='Unknown resample mode'):
+        list(resample_frames(source([0]), 44000, 'cubic'))
+    with pytest.raises(ValueError, match='positive'):
+        list(resample_frames(source([0]), 0))
+
+
+@pytest.mark.parametrize('chunk_frames', [0, 4])
+def test_timestamp_table_round_trip(tmp_path, chunk_frames):
+    path = str(tmp_path / 'tile.bin')
+    timestamps = [0, 44000, 88000, 88000, 176000, 220000, 264000]
+    writer = open_bin_writer(path, 4, 2, 1e6 / DEFAULT_SYNC_PERIOD_US, 'v2', frame_period_us=DEFAULT_SYNC_PERIOD_US,
+                             chunk_frames=chunk_frames)
+    for idx in range(len(timestamps)):
+        writer.write(bytes([idx]) * 24)
+    writer.close(timestamps=timestamps)
+
+    with BinReader(path) as reader:
+        assert reader.frame_period_us == DEFAULT_SYNC_PERIOD_US
+        assert reader.timestamps.tolist() == timestamps
+        assert reader[3].tobytes() == bytes([3]) * 24
+        assert reader.verify()[0]
+
+
+def test_timestamp_table_is_validated(tmp_path):
+    writer = open_bin_writer(str(tmp_path / 'tile.bin'), 4, 2, 30.0, 'v2')
+    writer.write(bytes(24))
+    writer.write(bytes(24))
+    with pytest.raises(ValueError, match='1 timestamps for 2 frames'):
+        writer.close(timestamps=[0])
+    with pytest.raises(ValueError, match='non-decreasing'):
+        writer.close(timestamps=[10, 0])
+    writer.close(timestamps=[0, 10])
@@ -0,0 +1,78 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from binfile import BinReader
+from vidpix import export_tiles, fit_target_size
+from wall import DEFAULT_WALL_LAYOUT, TileSlicer, canvas_offset, load_wall_layout, make_wall_layout
+from wiring import build_wiring_map, make_layout
+
+
+def write_layout(tmp_path, config):
+    path = tmp_path / 'layout.json'
+    path.write_text(json.dumps(config), encoding='utf-8')
+    return str(path)
+
+
+def test_16_9_source_is_letterboxed_onto_the_default_wall(tmp_path):
+    # 320x180 keeps its aspect at 142x80, centred on the 180x80 canvas: every strip is still 180x8
+    assert fit_target_size(320, 180, DEFAULT_WALL_LAYOUT.width, DEFAULT_WALL_LAYOUT.height) == (142, 80, False)
+    assert canvas_offset(142, 80, DEFAULT_WALL_LAYOUT) == (19, 0)
+
+    source = str(tmp_path / 'source.png')
+    cv2.imwrite(source, np.full((180, 320, 3), 200, dtype=np.uint8))
+    result = export_tiles(source, str(tmp_path / 'out'), write_videos=False)
+
+    assert (result['width'], result['height']) == (180, 80)
+    assert len(result['bin_paths']) == 10
+    for path in result['bin_paths']:
+        with BinReader(path) as reader:
+            assert (reader.width, reader.height) == (180, 8)
+            frame = np.array(reader[0])
+        assert not frame[:, :19].any() and not frame[:, 161:].any()
+        assert frame[:, 19:161].all()
+
+
+@pytest.mark.parametrize('config, message', [
+    ({'width': 180, 'height': 80, 'tiles': [{'x': 0, 'y': 0, 'width': 100, 'height': 80},
+                                            {'x': 90, 'y': 0, 'width': 90, 'height': 80}]}, "overlaps tile '1'"),
+    ({'width': 180, 'height': 80, 'tiles': [{'x': 90, 'y': 0, 'width': 91, 'height': 80}]}, 'does not fit'),
+    ({'width': 180, 'height': 80, 'tiles': [{'x': 0, 'y': -8, 'width': 180, 'height': 8}]}, 'does not fit'),
+    ({'width': 180, 'height': 80, 'rows': 7}, 'Cannot split 80 row pixels into 7 equal bands'),
+    ({'width': 180, 'height': 80, 'rows': 2, 'names': ['top', 'top']}, 'unique'),
+])
+def test_invalid_layouts_are_rejected(tmp_path, config, message):
+    with pytest.raises(ValueError, match=message):
+        load_wall_layout(write_layout(tmp_path, config))
+
+
+def test_band_and_tile_layouts(tmp_path):
+    assert load_wall_layout(write_layout(tmp_path, {'width': 180, 'height': 80, 'rows': 10})) == DEFAULT_WALL_LAYOUT
+    layout = load_wall_layout(write_layout(tmp_path, {'width': 180, 'height': 80, 'columns': 2,
+                                                      'names': ['left', 'right']}))
+    assert [(tile.name, tile.x, tile.width, tile.height) for tile in layout.tiles] == [('left', 0, 90, 80),
+                                                                                      ('right', 90, 90, 80)]
+
+
+MIXED_LAYOUT = make_wall_layout(24, 12, [('a', 0, 0, 24, 4), ('b', 2, 4, 10, 6), ('c', 12, 5, 12, 7)])
+
+
+@pytest.mark.parametrize('bytes_per_pixel', [3, 2])
+def test_gather_matches_naive_slicing(bytes_per_pixel):
+    frame = np.random.default_rng(0).integers(0, 256, (12, 24, bytes_per_pixel), dtype=np.uint8)
+    tiles = TileSlicer(MIXED_LAYOUT, bytes_per_pixel=bytes_per_pixel).slice(frame)
+    for tile, tile_bytes in zip(MIXED_LAYOUT.tiles, tiles):
+        expected = frame[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+        np.testing.assert_array_equal(tile_bytes, expected.ravel())
+
+
+def test_gather_folds_in_the_wiring():
+    wiring = make_layout(serpentine=True, channel_order='GRB', flip_x=True)
+    frame = np.random.default_rng(1).integers(0, 256, (12, 24, 3), dtype=np.uint8)
+    tiles = TileSlicer(MIXED_LAYOUT, wiring).slice(frame)
+    for tile, tile_bytes in zip(MIXED_LAYOUT.tiles, tiles):
+        pixel_index, channel_index = build_wiring_map(tile.width, tile.height, wiring)
+        region = frame[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width].reshape(-1, 3)
+        np.testing.assert_array_equal(tile_bytes, region[pixel_index][:, channel_index].ravel())
@@ -0,0 +1,46 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from wiring import CHANNEL_ORDERS, build_wiring_map, decode_layout, encode_layout, make_layout, undo_wiring
+
+ALL_LAYOUTS = [make_layout(serpentine, channel_order, flip_x, flip_y) for serpentine, flip_x, flip_y, channel_order
+               in itertools.product([False, True], [False, True], [False, True], CHANNEL_ORDERS)]
+
+
+def apply_wiring(frame, layout):
+    """The gather wall.TileSlicer performs: (height, width, 3) BGR tile to LED-ordered bytes."""
+    height, width, _ = frame.shape
+    pixel_index, channel_index = build_wiring_map(width, height, layout)
+    return frame.reshape(-1, 3)[pixel_index][:, channel_index]
+
+
+@pytest.mark.parametrize('layout', ALL_LAYOUTS, ids=lambda layout: f'{encode_layout(layout):#04x}')
+@pytest.mark.parametrize('width, height', [(5, 3), (4, 4), (1, 6), (7, 1)])
+def test_undo_wiring_round_trip(layout, width, height):
+    assert decode_layout(encode_layout(layout)) == layout
+    frame = np.random.default_rng(width * height).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    led_pixels = apply_wiring(frame, layout)
+    assert sorted(led_pixels.ravel()) == sorted(frame.ravel())
+    np.testing.assert_array_equal(undo_wiring(led_pixels, width, height, layout), frame)
+
+
+@pytest.mark.parametrize('layout', ALL_LAYOUTS, ids=lambda layout: f'{encode_layout(layout):#04x}')
+def test_undo_wiring_round_trip_rgb565(layout):
+    # RGB565 pixels are moved as whole 2-byte pixels; the channel order does not apply
+    frame = np.random.default_rng(2).integers(0, 256, (3, 5, 2), dtype=np.uint8)
+    pixel_index, _ = build_wiring_map(5, 3, layout)
+    np.testing.assert_array_equal(undo_wiring(frame.reshape(-1, 2)[pixel_index], 5, 3, layout), frame)
+
+
+def test_grb_serpentine_led_order():
+    # 3x2 tile, pixel i holds B, G, R = 10i, 10i + 1, 10i + 2
+    frame = (np.arange(6)[:, None] * 10 + np.arange(3)).astype(np.uint8).reshape(2, 3, 3)
+    layout = make_layout(serpentine=True, channel_order='GRB')
+
+    # The second row runs right to left, and every LED gets its G, R, B bytes
+    assert encode_layout(layout) == 0x21
+    assert apply_wiring(frame, layout).ravel().tolist() == [1, 2, 0, 11, 12, 10, 21, 22, 20,
+                                                            51, 52, 50, 41, 42, 40, 31, 32, 30]
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import vidpix
+from writers import TileWriterPool
+
+
+class RecordingWriter:
+    def __init__(self, fail_at=None):
+        self.frames = []
+        self.fail_at = fail_at
+
+    def write(self, frame):
+        if len(self.frames) == self.fail_at:
+            raise OSError("disk full")
+        self.frames.append(frame)
+
+
+def threads_left(before, timeout=2.0):
+    """Threads started since before that are still running after timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        left = [thread for thread in threading.enumerate() if thread not in before and thread.is_alive()]
+        if not left or time.monotonic() > deadline:
+            return left
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_every_sink_gets_its_frames_in_order(threads):
+    sinks = [(RecordingWriter(), RecordingWriter()) for _ in range(5)]
+    pool = TileWriterPool(sinks, threads, queue_size=2)
+    for frame_idx in range(40):
+        pool.write([(frame_idx, sink) for sink in range(5)], [(frame_idx, sink, 'bin') for sink in range(5)])
+    pool.close()
+
+    for sink, (video_out, bin_out) in enumerate(sinks):
+        assert video_out.frames == [(frame_idx, sink) for frame_idx in range(40)]
+        assert bin_out.frames == [(frame_idx, sink, 'bin') for frame_idx in range(40)]
+
+
+def test_writer_thread_error_is_raised_and_threads_stop():
+    before = set(threading.enumerate())
+    sinks = [(None, RecordingWriter()) for _ in range(3)] + [(None, RecordingWriter(fail_at=5))]
+    pool = TileWriterPool(sinks, 4, queue_size=2)
+    with pytest.raises(OSError, match='disk full'):
+        for frame_idx in range(200):
+            pool.write([None] * 4, [frame_idx] * 4)
+        pool.close()
+    pool.abort()
+    assert threads_left(before) == []
+
+
+def write_clip(path, frames=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 24, (64, 36))
+    for frame_idx in range(frames):
+        writer.write(np.full((36, 64, 3), frame_idx * 8, dtype=np.uint8))
+    writer.release()
+
+
+@pytest.mark.parametrize('bin_format', ['v1', 'v2'])
+def test_failed_export_raises_and_cleans_up(tmp_path, monkeypatch, bin_format):
+    source = str(tmp_path / 'clip.avi')
+    write_clip(source)
+    open_bin_writer = vidpix.open_bin_writer
+
+    def failing_open_bin_writer(path, *args, **kwargs):
+        # The fourth strip's .bin writer fails part-way, on its writer thread
+        writer = open_bin_writer(path, *args, **kwargs)
+        if path.endswith('_4.bin'):
+            write = writer.write
+            written = []
+
+            def write_until_full(frame_bytes):
+                if len(written) == 10:
+                    raise OSError("disk full")
+                written.append(None)
+                write(frame_bytes)
+            writer.write = write_until_full
+        return writer
+
+    monkeypatch.setattr(vidpix, 'open_bin_writer', failing_open_bin_writer)
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    before = set(threading.enumerate())
+    with pytest.raises(OSError, match='disk full'):
+        vidpix.export_tiles(source, str(output_dir / 'clip'), bin_format=bin_format, writer_threads=4,
+                            decode_threads=1)
+
+    assert threads_left(before) == []
+    assert os.listdir(output_dir) == []
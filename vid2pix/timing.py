@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Frame timing: resampling sources onto the wall's exact SYNC period.
+
+The children show one frame per SYNC pulse from the parent, so the wall plays at
+the SYNC rate whatever rate the file was exported at. A 24 fps clip exported as
+is runs 6% slow on a 44 ms tick, and variable-frame-rate sources (phone footage,
+screen recordings) are flattened to their nominal rate. Resampling the source
+onto the tick period at export time makes frame k belong to tick k exactly.
+
+Timestamps are integer microseconds from the first source frame. Frames come in
+as (timestamp_us, frame) pairs from decode.open_video(..., timestamps=True).
+
+Resample modes:
+- nearest: each tick shows the source frame closest to it in time; frames are
+  dropped or repeated as needed (repeats cost nothing in v2 hold records)
+- blend: each tick is a linear mix of the two source frames around it (smoother
+  pans when the source rate is close to the tick rate, softer on cuts)
+"""
+import cv2
+
+# parent_controller.ino: FRAME_PERIOD_US
+DEFAULT_SYNC_PERIOD_US = 44000
+
+RESAMPLE_MODES = ['nearest', 'blend']
+
+
+def period_from_fps(fps):
+    """Frame period in whole microseconds for a frame rate (0 if the rate is unknown)."""
+    return int(round(1e6 / fps)) if fps and fps > 0 else 0
+
+
+def record_timestamps(timed_frames, timestamps):
+    """
+    Strip the timestamps from (timestamp_us, frame) pairs, appending them to a list.
+
+    The list grows as frames are consumed, so by the time frame i has been
+    produced further down the pipeline timestamps[i] is available.
+
+    Yields:
+        The frames alone
+    """
+    for timestamp, frame in timed_frames:
+        timestamps.append(timestamp)
+        yield frame
+
+
+def attach_timestamps(frames, timestamps):
+    """Pair frames with the timestamps collected by record_timestamps (or a complete list)."""
+    for index, frame in enumerate(frames):
+        yield timestamps[index], frame
+
+
+def resample_frames(timed_frames, period_us, mode='nearest'):
+    """
+    Resample (timestamp_us, frame) pairs onto an exact frame period.
+
+    Output frame k stands for time k * period_us after the first source frame. The
+    last source frame is held for the mean source frame duration, so a clip keeps
+    its length. Source frames whose timestamp does not advance are dropped.
+
+    Args:
+        timed_frames: (timestamp_us, frame) pairs in presentation order
+        period_us: Output frame period in microseconds
+        mode: One of RESAMPLE_MODES
+
+    Yields:
+        (timestamp_us, frame) pairs with timestamp_us = k * period_us; repeated
+        frames are the same array object
+    """
+    if mode not in RESAMPLE_MODES:
+        raise ValueError(f"Unknown resample mode '{mode}' (expected one of {', '.join(RESAMPLE_MODES)})")
+    if period_us <= 0:
+        raise ValueError(f"Frame period must be positive, got {period_us} us")
+
+    timed_frames = iter(timed_frames)
+    first = next(timed_frames, None)
+    if first is None:
+        return
+    start = first[0]
+    previous_time, previous_frame = 0, first[1]
+    source_count = 1
+    output_time = 0
+
+    for timestamp, frame in timed_frames:
+        current_time = timestamp - start
+        if current_time <= previous_time:
+            continue
+        # Every tick before this source frame falls between it and the previous one
+        while output_time < current_time:
+            weight = (output_time - previous_time) / (current_time - previous_time)
+            if mode == 'blend' and weight > 0:
+                yield output_time, cv2.addWeighted(previous_frame, 1.0 - weight, frame, weight, 0)
+            elif mode == 'nearest' and weight > 0.5:
+                yield output_time, frame
+            else:
+                yield output_time, previous_frame
+            output_time += period_us
+        previous_time, previous_frame = current_time, frame
+        source_count += 1
+
+    duration = previous_time / (source_count - 1) if source_count > 1 else period_us
+    while output_time < previous_time + duration:
+        yield output_time, previous_frame
+        output_time += period_us
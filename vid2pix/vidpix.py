@@ -1,12 +1,483 @@
 # -*- coding: utf-8 -*-
+import argparse
 import cv2
-import numpy as np
-import struct
 import hashlib
+import json
+import numpy as np
 import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from binfile import open_bin_writer, resumable_frames
+from cache import FrameCache, hash_file
+from decode import DECODE_BACKENDS, ffmpeg_available, open_video
+from power import DEFAULT_IDLE_MA, DEFAULT_MA_PER_CHANNEL, LIMIT_MODES, PowerLimiter
+from profiling import StageTimer, enable_profiling, stage, timed_iter
+from temporal import DEFAULT_DENOISE_THRESHOLD, TemporalSmoother
+from timing import (DEFAULT_SYNC_PERIOD_US, RESAMPLE_MODES, attach_timestamps, period_from_fps, record_timestamps,
+                    resample_frames)
+from wall import DEFAULT_WALL_LAYOUT, TileSlicer, canvas_offset, describe_wall_layout, load_wall_layout
+from writers import TileWriterPool
+from wiring import CHANNEL_ORDERS, NATIVE_LAYOUT, describe_layout, encode_layout, resolve_wiring_layout
+
+VIDEO_CODECS = ['X264', "XVID", 'MJPG', 'mp4v']
+
+# LED wall canvas (10 strips of 180x8 unless a layout file says otherwise, see wall.py)
+TARGET_WIDTH = DEFAULT_WALL_LAYOUT.width
+TARGET_HEIGHT = DEFAULT_WALL_LAYOUT.height
+
+
+# Codec that last opened per container extension, tried first by open_video_writer
+_video_codecs = {}
+
+
+def open_video_writer(output_path, fps, size):
+    """
+    Open a cv2.VideoWriter, trying codecs in order of preference.
+    
+    The codec that worked is remembered per file extension for the rest of the run,
+    so later writers open on the first attempt instead of re-probing every codec.
+    
+    Returns:
+        (writer, codec) on success, (None, None) if no codec could be opened
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    cached = _video_codecs.get(extension)
+    codecs = VIDEO_CODECS if cached is None else [cached] + [codec for codec in VIDEO_CODECS if codec != cached]
+    for codec in codecs:
+        fourcc = cv2.VideoWriter_fourcc(*codec)
+        out = cv2.VideoWriter(output_path, fourcc, fps, size)
+        if out.isOpened():
+            _video_codecs[extension] = codec
+            return out, codec
+        out.release()
+    return None, None
+
+
+def open_input(input_path, decode_backend='opencv', decode_threads=0, target_size=(TARGET_WIDTH, TARGET_HEIGHT),
+               timestamps=False):
+    """
+    Open a video or still image as a lazy frame source.
+    
+    Videos are decoded by the chosen backend on a background thread (see decode.py);
+    target_size is the canvas the frames end up on. With timestamps, frames come as
+    (timestamp_us, frame) pairs (an image is a single frame at 0).
+    
+    Returns:
+        (frames, width, height, fps, total_frames, is_video) where frames is an
+        iterator over decoded frames, or None if the input cannot be loaded.
+        width/height are the source size; the ffmpeg backend may yield smaller frames.
+    """
+    video = open_video(input_path, decode_backend, target_size, decode_threads, timestamps=timestamps)
+    
+    if video is not None:
+        frames, width, height, fps, total_frames = video
+        return frames, width, height, fps, total_frames, True
+    
+    # Try to load as image
+    image = cv2.imread(input_path)
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    return iter([(0, image) if timestamps else image]), width, height, 30.0, 1, False
+
+def fit_target_size(original_width, original_height, target_width=TARGET_WIDTH, target_height=TARGET_HEIGHT):
+    """
+    Target resolution for a source: the full target if the aspect ratio matches
+    (within 1%), otherwise the largest size that fits while keeping the source aspect.
+    
+    Returns:
+        (width, height, aspect_matches)
+    """
+    if original_width == target_width and original_height == target_height:
+        return target_width, target_height, True
+    
+    aspect_ratio = original_width / original_height
+    target_aspect = target_width / target_height
+    if abs(aspect_ratio - target_aspect) < 0.01:
+        return target_width, target_height, True
+    
+    scale = min(target_width / original_width, target_height / original_height)
+    return int(original_width * scale), int(original_height * scale), False
+
+
+def compute_kernel_size(source_width, source_height, target_width, target_height):
+    """
+    Gaussian kernel size for anti-aliasing before downsampling.
+    
+    Set appropriate kernel size according to Nyquist-Shannon sampling theorem:
+    proportional to the downsampling ratio, odd, and capped at 15.
+    """
+    scale_x = source_width / target_width
+    scale_y = source_height / target_height
+    kernel_size = max(3, int(max(scale_x, scale_y) * 1.5))
+    if kernel_size % 2 == 0:  # Make it odd
+        kernel_size += 1
+    return min(kernel_size, 15)  # Maximum size limit
+
+
+SHARPEN_KERNEL = np.array([[-0.2, -0.2, -0.2],
+                           [-0.2,  2.6, -0.2], 
+                           [-0.2, -0.2, -0.2]])
+
+
+def build_color_lut(gamma=1.2, white_balance=(1.0, 1.0, 1.0), brightness_cap=255):
+    """
+    Build the output colour stage as a single 256-entry lookup table.
+    
+    Gamma correction, per-channel LED white balance, the brightness cap, clipping
+    and uint8 quantisation are all folded into one table, so applying them costs
+    one cv2.LUT call on uint8 data instead of several float64 full-frame passes.
+    
+    Args:
+        gamma: Gamma correction (values > 1.0 make image brighter, default: 1.2)
+        white_balance: (R, G, B) gain multipliers for LED colour correction
+        brightness_cap: Maximum output value for any channel (0-255)
+    
+    Returns:
+        uint8 array of shape (256, 1, 3) in BGR channel order, for cv2.LUT
+    """
+    levels = np.arange(256, dtype=np.float64) / 255.0
+    curve = np.power(levels, 1.0 / gamma) * 255.0
+    
+    red_gain, green_gain, blue_gain = white_balance
+    lut = np.empty((256, 1, 3), dtype=np.uint8)
+    for channel, gain in enumerate((blue_gain, green_gain, red_gain)):
+        lut[:, 0, channel] = np.clip(curve * gain, 0, brightness_cap).astype(np.uint8)
+    return lut
+
+
+DEFAULT_COLOR_LUT = build_color_lut()
+
+
+def downscale_frame(frame, target_width, target_height):
+    """
+    Measure and anti-alias downscale a BGR frame (the parallel half of prepare_frame).
+    
+    Returns:
+        (resized_frame, original_mean, original_std)
+    """
+    # Calculate original brightness and contrast
+    with stage('stats'):
+        original_mean = np.mean(frame)
+        original_std = np.std(frame)
+    
+    # Resize to target resolution
+    if frame.shape[1] != target_width or frame.shape[0] != target_height:
+        kernel_size = compute_kernel_size(frame.shape[1], frame.shape[0], target_width, target_height)
+        
+        # Apply Gaussian blur before resizing
+        with stage('blur'):
+            blurred_frame = cv2.GaussianBlur(frame, (kernel_size, kernel_size), 0)
+        with stage('resize'):
+            resized_frame = cv2.resize(blurred_frame, (target_width, target_height), 
+                                       interpolation=cv2.INTER_AREA)
+    else:
+        resized_frame = frame.copy()
+    
+    return resized_frame, original_mean, original_std
+
+
+def renormalise_frame(resized_frame, original_mean, original_std, smoother=None):
+    """
+    Restore the source brightness/contrast, sharpen and quantise a downscaled frame.
+    
+    Args:
+        resized_frame: uint8 frame from downscale_frame
+        original_mean: Source frame mean
+        original_std: Source frame standard deviation
+        smoother: Optional TemporalSmoother; frames must then be passed in order
+    
+    Returns:
+        uint8 BGR frame, ready for apply_color_lut
+    """
+    # Enhanced brightness and contrast compensation
+    with stage('normalise'):
+        resized_mean = np.mean(resized_frame)
+        resized_std = np.std(resized_frame)
+        
+        if resized_mean > 0 and resized_std > 0:
+            gain, target_mean = original_std / resized_std, original_mean
+            if smoother is not None:
+                gain, target_mean = smoother.correction(original_mean, original_std, resized_mean, resized_std)
+            # Normalize to match original statistics
+            brightness_compensated = resized_frame - resized_mean
+            brightness_compensated *= gain
+            brightness_compensated += target_mean
+        else:
+            # Fallback: simple brightness scaling
+            brightness_factor = original_mean / max(resized_mean, 1)
+            brightness_compensated = resized_frame * min(brightness_factor, 3.0)  # Cap at 3x
+        np.clip(brightness_compensated, 0, 255, out=brightness_compensated)
+    
+    if smoother is not None:
+        with stage('denoise'):
+            smoother.denoise_frame(brightness_compensated)
+    
+    # Apply adaptive sharpening (reduced intensity)
+    with stage('sharpen'):
+        sharpened = cv2.filter2D(brightness_compensated, -1, SHARPEN_KERNEL)
+    
+    # Quantise once; gamma/white balance/brightness cap follow via the LUT
+    with stage('quantise'):
+        np.clip(sharpened, 0, 255, out=sharpened)
+        return sharpened.astype(np.uint8)
+
+
+def prepare_frame(frame, target_width, target_height):
+    """
+    Blur, resize, renormalise and sharpen a single BGR frame (everything before the colour LUT).
+    
+    Args:
+        frame: Input BGR frame (uint8)
+        target_width: Target width
+        target_height: Target height
+    
+    Returns:
+        uint8 BGR frame of size target_width x target_height, ready for apply_color_lut
+    """
+    return renormalise_frame(*downscale_frame(frame, target_width, target_height))
+
+
+def apply_color_lut(frame, color_lut=None):
+    """Apply a build_color_lut table to a prepared uint8 frame (default: gamma 1.2)."""
+    with stage('color_lut'):
+        return cv2.LUT(frame, DEFAULT_COLOR_LUT if color_lut is None else color_lut)
+
+
+# 4x4 Bayer matrix for ordered dithering before RGB565 truncation
+BAYER_4X4 = np.array([[0, 8, 2, 10],
+                      [12, 4, 14, 6],
+                      [3, 11, 1, 9],
+                      [15, 7, 13, 5]], dtype=np.uint16)
+
+
+@lru_cache(maxsize=8)
+def _dither_offsets(height, width):
+    """Per-pixel ordered-dither offsets for the 5-bit and 6-bit channels, tiled to the frame size."""
+    pattern = np.tile(BAYER_4X4, ((height + 3) // 4, (width + 3) // 4))[:height, :width]
+    # Threshold at the centre of each of the 16 sub-steps: (m + 0.5) / 16 of the quantisation step
+    return (2 * pattern + 1) * 8 // 32, (2 * pattern + 1) * 4 // 32
+
 
-def create_binary_video_for_arduino(input_path, output_bin_path, target_width=180, target_height=100, color_depth=24):
+def pack_rgb565(frames, out=None, dither=False, scratch=None):
+    """
+    Convert 24-bit BGR frames to 16-bit RGB565.
+    
+    Works on a single frame (height, width, 3) or a batch (count, height, width, 3).
+    Every step writes into out/scratch, so callers that pass preallocated buffers
+    pack without allocating anything per frame.
+    
+    Args:
+        frames: uint8 BGR array with channels last
+        out: Optional uint16 array of shape frames.shape[:-1] to write into
+        dither: Apply 4x4 ordered dithering before truncation (hides banding in gradients)
+        scratch: Optional uint16 work buffer, same shape as out
+    
+    Returns:
+        Little-endian uint16 array of shape frames.shape[:-1]; tobytes() is the .bin pixel data
+    """
+    with stage('rgb565'):
+        shape = frames.shape[:-1]
+        if out is None:
+            out = np.empty(shape, dtype='<u2')
+        if scratch is None:
+            scratch = np.empty(shape, dtype='<u2')
+        blue, green, red = frames[..., 0], frames[..., 1], frames[..., 2]
+        
+        if dither:
+            offsets_5, offsets_6 = _dither_offsets(*shape[-2:])
+            np.add(red, offsets_5, out=out, dtype=np.uint16)
+            np.minimum(out, 255, out=out)
+            np.right_shift(out, 3, out=out)
+            np.left_shift(out, 11, out=out)
+            np.add(green, offsets_6, out=scratch, dtype=np.uint16)
+            np.minimum(scratch, 255, out=scratch)
+            np.right_shift(scratch, 2, out=scratch)
+            np.left_shift(scratch, 5, out=scratch)
+            np.bitwise_or(out, scratch, out=out)
+            np.add(blue, offsets_5, out=scratch, dtype=np.uint16)
+            np.minimum(scratch, 255, out=scratch)
+            np.right_shift(scratch, 3, out=scratch)
+            np.bitwise_or(out, scratch, out=out)
+            return out
+        
+        # Shift in uint16: shifting the uint8 channels directly would overflow before the cast
+        np.copyto(out, red)
+        np.right_shift(out, 3, out=out)
+        np.left_shift(out, 11, out=out)
+        np.copyto(scratch, green)
+        np.right_shift(scratch, 2, out=scratch)
+        np.left_shift(scratch, 5, out=scratch)
+        np.bitwise_or(out, scratch, out=out)
+        np.copyto(scratch, blue)
+        np.right_shift(scratch, 3, out=scratch)
+        np.bitwise_or(out, scratch, out=out)
+        return out
+
+
+def process_frame(frame, target_width, target_height, color_lut=None):
+    """
+    Blur, resize, renormalise, sharpen and colour-correct a single BGR frame.
+    
+    Args:
+        frame: Input BGR frame (uint8)
+        target_width: Target width
+        target_height: Target height
+        color_lut: Colour stage from build_color_lut (default: gamma 1.2, no white balance)
+    
+    Returns:
+        Processed uint8 BGR frame of size target_width x target_height
+    """
+    return apply_color_lut(prepare_frame(frame, target_width, target_height), color_lut)
+
+
+def _process_batch(func, batch, args):
+    return [func(frame, *args) for frame in batch]
+
+
+def _iter_batches(frames, batch_size):
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def map_frames(func, frames, args=(), workers=1, pool='thread', batch_size=8, max_pending=None):
+    """
+    Lazily apply func(frame, *args) over a frame stream, optionally on several cores.
+    
+    With workers > 1, frames are grouped into batches and submitted to a thread
+    pool (OpenCV and NumPy release the GIL) or a process pool. Results are yielded
+    in source order as soon as the oldest batch is done, and at most max_pending
+    batches are in flight so memory stays bounded regardless of clip length.
+    Live sources want batch_size=1 and a small max_pending, so frames are not held
+    back waiting for a batch or the pipeline to fill.
+    
+    Args:
+        func: Module-level per-frame function (must be picklable for the process pool)
+        frames: Iterable of BGR frames
+        args: Extra positional arguments passed to func after the frame
+        workers: Number of worker threads/processes (1 = process inline)
+        pool: 'thread' or 'process'
+        batch_size: Frames per submitted batch
+        max_pending: Batches in flight before the oldest is waited for (default: 2 * workers)
+    
+    Yields:
+        func results in source order
+    """
+    if workers <= 1:
+        for frame in frames:
+            yield func(frame, *args)
+        return
+    
+    executor_cls = ProcessPoolExecutor if pool == 'process' else ThreadPoolExecutor
+    max_pending = max(1, max_pending or workers * 2)
+    
+    with executor_cls(max_workers=workers) as executor:
+        pending = deque()
+        for batch in _iter_batches(frames, batch_size):
+            pending.append(executor.submit(_process_batch, func, batch, args))
+            # Reassemble in order: always drain the oldest batch first, waiting only when the pool is full
+            while pending and (len(pending) >= max_pending or pending[0].done()):
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def process_frames(frames, target_width, target_height, workers=1, pool='thread', batch_size=8,
+                   color_lut=None):
+    """
+    Lazily run process_frame over a frame stream (see map_frames for workers/pool).
+    
+    Args:
+        frames: Iterable of BGR frames
+        target_width: Target width
+        target_height: Target height
+        workers: Number of worker threads/processes (1 = process inline)
+        pool: 'thread' or 'process'
+        batch_size: Frames per submitted batch
+        color_lut: Colour stage from build_color_lut (default: gamma 1.2)
+    
+    Yields:
+        Processed uint8 BGR frames in source order
+    """
+    return map_frames(process_frame, frames, (target_width, target_height, color_lut),
+                      workers, pool, batch_size)
+
+
+def _prepare_stream(frames, target_width, target_height, workers, pool, smoother):
+    if smoother is None:
+        return map_frames(prepare_frame, frames, (target_width, target_height), workers, pool)
+    # The stateful temporal stage needs frames in order: only the downscale runs on the pool,
+    # the cheap target-size renormalisation runs here
+    smoother.reset()
+    downscaled = map_frames(downscale_frame, frames, (target_width, target_height), workers, pool)
+    return (renormalise_frame(*item, smoother=smoother) for item in downscaled)
+
+
+def prepare_frames(input_path, frames, target_width, target_height, fps, workers=1, pool='thread', cache=None,
+                   decode_backend='opencv', smoother=None, timestamps=None):
+    """
+    Stream prepared (pre-colour-LUT) frames, served from a FrameCache when possible.
+    
+    On a cache hit the source is not decoded or filtered at all: frames come
+    straight from the memory-mapped entry. On a miss they are prepared with
+    map_frames and recorded into the cache as they stream past.
+    
+    Args:
+        input_path: Source file path (its content is part of the cache key)
+        frames: Lazy source frame iterator (closed unused on a cache hit)
+        target_width: Target width
+        target_height: Target height
+        fps: Source FPS, stored with new cache entries
+        workers: Number of worker threads/processes
+        pool: 'thread' or 'process'
+        cache: FrameCache, or None to disable caching
+        decode_backend: Backend that decoded frames (part of the cache key unless the default)
+        smoother: Optional TemporalSmoother (reset first; its parameters are part of the cache key)
+        timestamps: List being filled with the source timestamps (timing.record_timestamps);
+            stored with new cache entries and restored from them on a hit. Entries
+            recorded without timestamps count as a miss.
+    
+    Returns:
+        (prepared_frames, cached_frame_count) where cached_frame_count is None on a miss
+    """
+    if cache is None:
+        return _prepare_stream(frames, target_width, target_height, workers, pool, smoother), None
+    
+    # The default backend is left out of the key so existing entries stay valid
+    params = {'width': target_width, 'height': target_height}
+    if decode_backend != 'opencv':
+        params['decode'] = decode_backend
+    if smoother is not None:
+        params['temporal'] = smoother.params()
+    key = cache.make_key(input_path, **params)
+    entry = cache.get(key)
+    if entry is not None and (timestamps is None or 'timestamps_us' in entry[1]):
+        if hasattr(frames, 'close'):
+            frames.close()
+        cached_frames, meta = entry
+        if timestamps is not None:
+            timestamps[:] = meta['timestamps_us']
+        return iter(cached_frames), len(cached_frames)
+    
+    meta = {'source': os.path.basename(input_path)}
+    if timestamps is not None:
+        # Complete by the time the entry's metadata is written, after the last frame
+        meta['timestamps_us'] = timestamps
+    prepared = _prepare_stream(frames, target_width, target_height, workers, pool, smoother)
+    return cache.record(key, prepared, target_width, target_height, fps, **meta), None
+
+
+def create_binary_video_for_arduino(input_path, output_bin_path, target_width=180, target_height=100, color_depth=24, workers=1,
+                                    bin_format='v1', cache=None, decode_backend='opencv'):
     """
     Create binary video file optimized for Arduino/ESP32 with NeoPixel LED matrices.
     
@@ -30,122 +501,69 @@ def create_binary_video_for_arduino(input_path, output_bin_path, target_width=18
         target_width: Target width (default: 180)
         target_height: Target height (default: 100)
         color_depth: Color depth (24 for full RGB, 16 for 565 format)
+        workers: Number of frame processing workers (see process_frames)
+        bin_format: 'v1' (raw frames) or 'v2' (delta/RLE compressed, see binfile.py)
+        cache: Optional FrameCache; re-exports of the same source and size skip decode and filtering
+        decode_backend: Decode backend, see decode.py (default: opencv)
     """
     
-    cap = cv2.VideoCapture(input_path)
+    video = open_video(input_path, decode_backend, (target_width, target_height))
     
-    if not cap.isOpened():
+    if video is None:
         print(f"Error: Cannot open video file: {input_path}")
         return False
     
     # Get video information
-    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames, original_width, original_height, fps, total_frames = video
     
     print(f"\n=== Creating Arduino-Compatible Binary File ===")
     print(f"Output: {output_bin_path}")
     print(f"Original: {original_width}x{original_height} -> Target: {target_width}x{target_height}")
     print(f"FPS: {fps}, Total frames: {total_frames}")
     print(f"Color depth: {color_depth}-bit")
+    print(f"Container: {bin_format}")
     
-    # Calculate parameters for processing
-    scale_x = original_width / target_width
-    scale_y = original_height / target_height
-    kernel_size = max(3, int(max(scale_x, scale_y) * 1.5))
-    if kernel_size % 2 == 0:
-        kernel_size += 1
-    kernel_size = min(kernel_size, 15)
-    
-    # Prepare binary file data
-    frame_data = bytearray()
+    # Frames are streamed straight to disk
+    writer = open_bin_writer(output_bin_path, target_width, target_height, fps, bin_format, color_depth // 8)
     frame_count = 0
     
-    print("\nProcessing frames...")
+    prepared, cached_frame_count = prepare_frames(input_path, frames, target_width, target_height, fps, workers,
+                                                  cache=cache, decode_backend=decode_backend)
+    if cached_frame_count is not None:
+        total_frames = cached_frame_count
+        print("\nReading processed frames from cache...")
+    else:
+        print("\nProcessing frames...")
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Calculate original brightness and contrast
-        original_mean = np.mean(frame)
-        original_std = np.std(frame)
-        
-        # Apply Gaussian blur and resize
-        blurred_frame = cv2.GaussianBlur(frame, (kernel_size, kernel_size), 0)
-        resized_frame = cv2.resize(blurred_frame, (target_width, target_height), 
-                                   interpolation=cv2.INTER_AREA)
-        
-        # Enhanced brightness and contrast compensation
-        resized_mean = np.mean(resized_frame)
-        resized_std = np.std(resized_frame)
-        
-        if resized_mean > 0 and resized_std > 0:
-            # Normalize to match original statistics
-            normalized_frame = (resized_frame - resized_mean) / resized_std
-            brightness_compensated = normalized_frame * original_std + original_mean
-            brightness_compensated = np.clip(brightness_compensated, 0, 255)
-        else:
-            # Fallback: simple brightness scaling
-            brightness_factor = original_mean / max(resized_mean, 1)
-            brightness_compensated = resized_frame * min(brightness_factor, 3.0)
-            brightness_compensated = np.clip(brightness_compensated, 0, 255)
-        
-        # Apply adaptive sharpening (reduced intensity)
-        kernel_sharpen = np.array([[-0.2, -0.2, -0.2],
-                                   [-0.2,  2.6, -0.2], 
-                                   [-0.2, -0.2, -0.2]])
-        final_frame = cv2.filter2D(brightness_compensated, -1, kernel_sharpen)
-        
-        # Add gamma correction for additional brightness boost
-        gamma = 1.2
-        gamma_corrected = np.power(final_frame / 255.0, 1.0 / gamma) * 255.0
-        final_frame = np.clip(gamma_corrected, 0, 255).astype(np.uint8)
+    packed = np.empty((target_height, target_width), dtype='<u2')
+    scratch = np.empty_like(packed)
+    for prepared_frame in prepared:
+        final_frame = apply_color_lut(prepared_frame)
         
         # Convert to target color depth if needed
         if color_depth == 16:
             # Convert 24-bit BGR to 16-bit RGB565
-            frame_16bit = cv2.cvtColor(final_frame, cv2.COLOR_BGR2RGB)
-            frame_565 = ((frame_16bit[:,:,0] >> 3) << 11) | ((frame_16bit[:,:,1] >> 2) << 5) | (frame_16bit[:,:,2] >> 3)
-            frame_bytes = frame_565.astype(np.uint16).tobytes()
+            frame_bytes = pack_rgb565(final_frame, packed, scratch=scratch).tobytes()
         else:
             # Keep 24-bit BGR format
             frame_bytes = final_frame.tobytes()
         
-        # Add frame data to binary array
-        frame_data.extend(frame_bytes)
+        # Append frame data to binary file
+        with stage('bin_write'):
+            writer.write(frame_bytes)
         frame_count += 1
         
         if frame_count % 30 == 0 or frame_count == total_frames:
             progress = (frame_count / total_frames) * 100
             print(f"\rProgress: {frame_count}/{total_frames} ({progress:.1f}%)", end='', flush=True)
     
-    cap.release()
-    
     print("\n")
     
-    # Calculate checksum
-    checksum = hashlib.sha256(frame_data).digest()
-    
-    # Write binary file
-    with open(output_bin_path, 'wb') as f:
-        # Header (16 bytes) - little-endian format compatible with Arduino
-        f.write(struct.pack('<I', target_width))      # 4 bytes: width (uint32_t)
-        f.write(struct.pack('<I', target_height))     # 4 bytes: height (uint32_t)
-        f.write(struct.pack('<f', fps))               # 4 bytes: fps (float)
-        f.write(struct.pack('<I', frame_count))       # 4 bytes: frame count (uint32_t)
-        
-        # Frame data
-        f.write(frame_data)
-        
-        # Trailer (32 bytes): SHA-256 checksum for integrity verification
-        f.write(checksum)
+    checksum = writer.close()
     
     # Calculate file statistics
     bytes_per_frame = target_width * target_height * (color_depth // 8)
-    file_size = len(frame_data) + 48
+    file_size = writer.file_size
     
     print(f"✓ Binary file created successfully!")
     print(f"  File: {output_bin_path}")
@@ -157,7 +575,8 @@ def create_binary_video_for_arduino(input_path, output_bin_path, target_width=18
     
     return True
 
-def resize_video_with_gaussian(input_path, output_path, target_width=180, target_height=100):
+def resize_video_with_gaussian(input_path, output_path, target_width=180, target_height=100, workers=1,
+                               decode_backend='opencv'):
     """
     Resize video with Gaussian filtering to minimize quality loss.
     
@@ -166,20 +585,19 @@ def resize_video_with_gaussian(input_path, output_path, target_width=180, target
         output_path: Output video file path
         target_width: Target width (default: 180)
         target_height: Target height (default: 100)
+        workers: Number of frame processing workers (see process_frames)
+        decode_backend: Decode backend, see decode.py (default: opencv)
     """
     
-    # Create video capture object
-    cap = cv2.VideoCapture(input_path)
+    # Open the source; frames are decoded on a background thread
+    video = open_video(input_path, decode_backend, (target_width, target_height))
     
-    if not cap.isOpened():
+    if video is None:
         print(f"Error: Cannot open video file: {input_path}")
         return
     
     # Get original video information
-    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames, original_width, original_height, fps, total_frames = video
     
     print(f"Original resolution: {original_width}x{original_height}")
     print(f"Target resolution: {target_width}x{target_height}")
@@ -192,80 +610,25 @@ def resize_video_with_gaussian(input_path, output_path, target_width=180, target
     print(f"Downsampling ratio: x={scale_x:.2f}, y={scale_y:.2f}")
     
     # Calculate Gaussian kernel size based on scale ratio
-    # Set appropriate kernel size according to Nyquist-Shannon sampling theorem
-    kernel_size = max(3, int(max(scale_x, scale_y) * 1.5))
-    if kernel_size % 2 == 0:  # Make it odd
-        kernel_size += 1
-    kernel_size = min(kernel_size, 15)  # Maximum size limit
+    kernel_size = compute_kernel_size(original_width, original_height, target_width, target_height)
     
     print(f"Gaussian kernel size: {kernel_size}x{kernel_size}")
     
     # Setup video writer with better codec compatibility
-    # Try different codecs in order of preference
-    codecs_to_try = ['X264', "XVID", 'MJPG', 'mp4v']
-    out = None
-    
-    for codec in codecs_to_try:
-        fourcc = cv2.VideoWriter_fourcc(*codec)
-        out = cv2.VideoWriter(output_path, fourcc, fps, (target_width, target_height))
-        if out.isOpened():
-            print(f"Using codec: {codec}")
-            break
-        else:
-            out.release()
+    out, codec = open_video_writer(output_path, fps, (target_width, target_height))
+    if out is not None:
+        print(f"Using codec: {codec}")
     
     if out is None or not out.isOpened():
         print(f"Error: Cannot create output video file with any codec: {output_path}")
-        cap.release()
+        frames.close()
         return
     
     frame_count = 0
     
     print("\nProcessing...")
     
-    while True:
-        ret, frame = cap.read()
-        
-        if not ret:
-            break
-        
-        # Calculate original brightness and contrast
-        original_mean = np.mean(frame)
-        original_std = np.std(frame)
-        
-        # Apply Gaussian blur
-        blurred_frame = cv2.GaussianBlur(frame, (kernel_size, kernel_size), 0)
-        
-        # Resize frame
-        resized_frame = cv2.resize(blurred_frame, (target_width, target_height), 
-                                   interpolation=cv2.INTER_AREA)
-        
-        # Enhanced brightness and contrast compensation
-        resized_mean = np.mean(resized_frame)
-        resized_std = np.std(resized_frame)
-        
-        if resized_mean > 0 and resized_std > 0:
-            # Normalize to match original statistics
-            normalized_frame = (resized_frame - resized_mean) / resized_std
-            brightness_compensated = normalized_frame * original_std + original_mean
-            brightness_compensated = np.clip(brightness_compensated, 0, 255)
-        else:
-            # Fallback: simple brightness scaling
-            brightness_factor = original_mean / max(resized_mean, 1)
-            brightness_compensated = resized_frame * min(brightness_factor, 3.0)  # Cap at 3x
-            brightness_compensated = np.clip(brightness_compensated, 0, 255)
-        
-        # Apply adaptive sharpening (reduced intensity)
-        kernel_sharpen = np.array([[-0.2, -0.2, -0.2],
-                                   [-0.2,  2.6, -0.2], 
-                                   [-0.2, -0.2, -0.2]])
-        final_frame = cv2.filter2D(brightness_compensated, -1, kernel_sharpen)
-        
-        # Add gamma correction for additional brightness boost
-        gamma = 1.2  # Values > 1.0 make image brighter
-        gamma_corrected = np.power(final_frame / 255.0, 1.0 / gamma) * 255.0
-        final_frame = np.clip(gamma_corrected, 0, 255).astype(np.uint8)
-        
+    for final_frame in process_frames(frames, target_width, target_height, workers):
         out.write(final_frame)
         
         frame_count += 1
@@ -278,242 +641,557 @@ def resize_video_with_gaussian(input_path, output_path, target_width=180, target
     print(f"Output file: {output_path}")
     
     # Release resources
-    cap.release()
     out.release()
     cv2.destroyAllWindows()
     
     # Verify output file was created and has size > 0
-    import os
     if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
         print(f"Success! Output file size: {os.path.getsize(output_path)} bytes")
     else:
         print("Warning: Output file may not have been created properly")
 
 
-if __name__ == "__main__":
-    # Parse command line arguments
-    if len(sys.argv) < 3:
-        print("Usage: python vidpix.py <input_file> <output_basename>")
-        print("\nExample:")
-        print("  python vidpix.py F1.mp4 output_video")
-        print("  python vidpix.py image.jpg output_image")
-        print("\nOutput files:")
-        print("  - output_video.mp4 (full resolution)")
-        print("  - output_video_1.mp4 to output_video_10.mp4 (180x8 tiles)")
-        print("  - output_video_1.bin to output_video_10.bin (binary files)")
-        sys.exit(1)
+def print_power_summary(limiter):
+    """Print the per-strip current report of a PowerLimiter."""
+    report = limiter.report()
+    budget = report['budget_amps']
+    limiting = f", budget {budget:g} A per strip, {report['mode']} limiting" if budget is not None else ""
+    print(f"\n  Power (estimated{limiting}):")
+    for entry in report['strips']:
+        line = f"    Strip {entry['strip']:2d}: peak {entry['peak_amps']:6.2f} A, mean {entry['mean_amps']:6.2f} A"
+        if budget is not None:
+            mark = '✗' if entry['frames_over_budget'] else '✓'
+            line = f"{line}, {mark} {entry['frames_over_budget']} frames over budget"
+        print(line)
+    if budget is not None:
+        print(f"    {report['frames_limited']} of {report['frame_count']} frames scaled down to fit")
+
+
+def discard_outputs(videos, bin_writers):
+    """
+    Close the outputs of a failed export and delete the unfinished files.
+
+    Args:
+        videos: (video writer or None, path) pairs
+        bin_writers: .bin writers; chunked ones keep their complete chunks for --resume
+    """
+    for video_out, path in videos:
+        if video_out is not None:
+            video_out.release()
+            if os.path.exists(path):
+                os.remove(path)
+    for bin_writer in bin_writers:
+        bin_writer.abort()
+
+
+def resume_fingerprints(input_file, wall_layout, hold_thresholds, **settings):
+    """
+    Fingerprint of each tile's frames, guarding resumed chunked exports (see binfile.py).
+
+    Covers the source file's content, the settings that change the pixels (passed as
+    JSON-serialisable keyword arguments) and each tile's rectangle and hold threshold;
+    geometry and timing in the .bin header are checked separately.
+    """
+    description = {'source': hash_file(input_file), 'canvas': [wall_layout.width, wall_layout.height], **settings}
+    fingerprints = []
+    for tile, hold_threshold in zip(wall_layout.tiles, hold_thresholds):
+        tile_description = dict(description, tile=tile._asdict(), hold_threshold=int(hold_threshold))
+        fingerprints.append(hashlib.sha256(json.dumps(tile_description, sort_keys=True).encode('utf-8')).hexdigest())
+    return fingerprints
+
+
+def export_tiles(input_file, output_basename, workers=1, pool='thread', color_lut=None, bin_format='v1',
+                 wiring_layout=NATIVE_LAYOUT, cache=None, tile_bin_paths=None, write_videos=True, hold_threshold=0,
+                 color_depth=24, dither=False, decode_backend='opencv', decode_threads=0, smoother=None, power=None,
+                 wall_layout=DEFAULT_WALL_LAYOUT, writer_threads=1, frame_period_us=None, resample='nearest',
+                 timestamp_table=False, chunk_frames=0, resume=False):
+    """
+    Convert a video or image into the full-size video plus one video and .bin file per wall tile
+    (by default 10 tiles of 180x8).
     
-    input_file = sys.argv[1]
-    output_basename = sys.argv[2]
+    Frames are decoded, processed and fanned out to every output one at a time,
+    so memory use does not grow with clip length.
     
-    # Validate input file exists
-    if not os.path.exists(input_file):
-        print(f"Error: Input file not found: {input_file}")
-        sys.exit(1)
+    Args:
+        input_file: Input video or image file
+        output_basename: Basename for the generated .mp4/.bin files
+        workers: Number of frame processing workers (see map_frames)
+        pool: 'thread' or 'process'
+        color_lut: Colour stage from build_color_lut (default: gamma 1.2)
+        bin_format: Tile .bin container, 'v1' or 'v2'
+        wiring_layout: WiringLayout baked into the tile .bin files (needs v2 unless native)
+        cache: Optional FrameCache for the processed frames
+        tile_bin_paths: Explicit .bin path per tile (default: {output_basename}_{tile name}.bin)
+        write_videos: Also write the full and per-tile .mp4 files
+        hold_threshold: Per-channel difference up to which a tile frame is held instead of
+            stored (v2 only); a single value or one per tile, each tile is deduplicated on its own
+        color_depth: Tile .bin pixel format, 24 (BGR888) or 16 (RGB565, recorded in the v2 header)
+        dither: Ordered dithering when packing RGB565
+        decode_backend: Video decode backend, one of decode.DECODE_BACKENDS
+        decode_threads: Decoder threads (0 = automatic)
+        smoother: Optional TemporalSmoother for flicker reduction (see temporal.py)
+        power: Optional PowerLimiter options (budget_amps, mode, ma_per_channel, idle_ma,
+            brightness); frames are measured and, with a budget, scaled to fit (see power.py)
+        wall_layout: WallLayout giving the canvas size and each tile's rectangle (see wall.py)
+        writer_threads: Threads encoding the videos and writing the tile .bin files concurrently
+            (1 = write inline, see writers.py)
+        frame_period_us: Resample onto this exact frame period, normally the parent's SYNC
+            period (None = keep the source frames; see timing.py)
+        resample: Resample mode, one of timing.RESAMPLE_MODES
+        timestamp_table: Store every frame's presentation time in the tile .bin files (v2 only)
+        chunk_frames: Write the tile .bin files in CRC-checked chunks of this many frames
+            (v2 only, 0 = not chunked; see binfile.py)
+        resume: Keep the intact chunks of an interrupted export of the same source and settings
+            (checked through resume_fingerprints) and only write the frames after them (needs
+            chunk_frames); anything else is written from the start. Frames before that point
+            are still decoded and processed, so use a cache to make that cheap.
     
-    print("=== Video/Image Processing with Tiling ===")
-    print(f"Input: {input_file}")
-    print(f"Output basename: {output_basename}")
+    Returns:
+        dict with frame_count, fps, frame_period_us, canvas width and height, the written
+        tile .bin paths and (with power) the PowerLimiter, or None if the input could not be loaded
+    """
+    if timestamp_table and bin_format != 'v2':
+        raise ValueError("Timestamp tables need the v2 .bin format")
+    if resume and not chunk_frames:
+        raise ValueError("Only chunked exports can be resumed")
     
-    # Load input (video or image)
-    print("\n[1/4] Loading input file...")
+    # Open input (video or image); frames are decoded lazily
+    print("\n[1/4] Opening input file...")
     
-    cap = cv2.VideoCapture(input_file)
+    resampling = frame_period_us is not None
+    timed = resampling or timestamp_table
+    source = open_input(input_file, decode_backend, decode_threads, (wall_layout.width, wall_layout.height), timed)
+    if source is None:
+        print(f"Error: Cannot load input file as video or image: {input_file}")
+        return None
     
-    if cap.isOpened():
-        # It's a video file
-        is_video = True
-        original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
+    frames, original_width, original_height, fps, total_frames, is_video = source
+    
+    if is_video:
         print(f"  Video detected: {original_width}x{original_height}, {fps}fps, {total_frames} frames")
-        
-        # Read all frames
-        frames = []
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frames.append(frame)
-        cap.release()
     else:
-        # Try to load as image
-        frames = [cv2.imread(input_file)]
-        if frames[0] is None:
-            print(f"Error: Cannot load input file as video or image: {input_file}")
-            sys.exit(1)
-        
-        is_video = False
-        original_height, original_width = frames[0].shape[:2]
-        fps = 30.0
-        total_frames = 1
-        
         print(f"  Image detected: {original_width}x{original_height}")
     
+    # Source timestamps are collected as frames are decoded (or restored from the cache)
+    source_timestamps = None
+    if timed:
+        source_timestamps = []
+        frames = record_timestamps(frames, source_timestamps)
+    
+    if resampling:
+        if total_frames and fps > 0:
+            total_frames = max(1, int(round(total_frames * 1e6 / (fps * frame_period_us))))
+        print(f"  Resampling {fps:g} fps to a {frame_period_us} us frame period ({resample})")
+        fps = 1e6 / frame_period_us
+    else:
+        frame_period_us = period_from_fps(fps)
+    
     # Determine target resolution
     print("\n[2/4] Determining target resolution...")
     
     # Check if input is already at target resolution or needs scaling
-    target_width = 180
-    target_height = 100
+    target_width, target_height, aspect_matches = fit_target_size(original_width, original_height,
+                                                                  wall_layout.width, wall_layout.height)
     
     # Handle different input sizes
     if original_width != target_width or original_height != target_height:
-        # Calculate aspect ratio
-        aspect_ratio = original_width / original_height
-        target_aspect = target_width / target_height
-        
-        if abs(aspect_ratio - target_aspect) < 0.01:
-            # Aspect ratio matches, just scale
+        if aspect_matches:
             print(f"  Input aspect ratio matches target, scaling to {target_width}x{target_height}")
         else:
-            # Scale to maintain aspect ratio
-            scale = min(target_width / original_width, target_height / original_height)
-            target_width = int(original_width * scale)
-            target_height = int(original_height * scale)
             print(f"  Input aspect ratio differs, scaling to {target_width}x{target_height}")
     
     print(f"  Target resolution: {target_width}x{target_height}")
     
-    # Process all frames
-    print(f"\n[3/4] Processing frames...")
+    # Frames that do not fill the canvas are centred on a black one, so every tile keeps its size
+    letterbox = None
+    canvas_width, canvas_height = wall_layout.width, wall_layout.height
+    if (target_width, target_height) != (canvas_width, canvas_height):
+        offset_x, offset_y = canvas_offset(target_width, target_height, wall_layout)
+        letterbox = (slice(offset_y, offset_y + target_height), slice(offset_x, offset_x + target_width))
+        print(f"  Letterboxed onto the {canvas_width}x{canvas_height} canvas at ({offset_x}, {offset_y})")
     
-    processed_frames = []
+    # Open every output up front so frames can be fanned out as they are produced
+    print(f"\n[3/4] Opening output files...")
     
-    for frame_idx, frame in enumerate(frames):
-        # Calculate original brightness and contrast
-        original_mean = np.mean(frame)
-        original_std = np.std(frame)
-        
-        # Resize to target resolution
-        if frame.shape[1] != target_width or frame.shape[0] != target_height:
-            scale_x = frame.shape[1] / target_width
-            scale_y = frame.shape[0] / target_height
-            kernel_size = max(3, int(max(scale_x, scale_y) * 1.5))
-            if kernel_size % 2 == 0:
-                kernel_size += 1
-            kernel_size = min(kernel_size, 15)
-            
-            # Apply Gaussian blur before resizing
-            blurred_frame = cv2.GaussianBlur(frame, (kernel_size, kernel_size), 0)
-            resized_frame = cv2.resize(blurred_frame, (target_width, target_height), 
-                                      interpolation=cv2.INTER_AREA)
-        else:
-            resized_frame = frame.copy()
-        
-        # Enhanced brightness and contrast compensation
-        resized_mean = np.mean(resized_frame)
-        resized_std = np.std(resized_frame)
-        
-        if resized_mean > 0 and resized_std > 0:
-            normalized_frame = (resized_frame - resized_mean) / resized_std
-            brightness_compensated = normalized_frame * original_std + original_mean
-            brightness_compensated = np.clip(brightness_compensated, 0, 255)
+    full_output_video = f"{output_basename}.mp4"
+    full_out = None
+    if write_videos:
+        full_out, codec = open_video_writer(full_output_video, fps, (canvas_width, canvas_height))
+        if full_out is not None:
+            print(f"  Full video: {full_output_video} (codec: {codec})")
         else:
-            brightness_factor = original_mean / max(resized_mean, 1)
-            brightness_compensated = resized_frame * min(brightness_factor, 3.0)
-            brightness_compensated = np.clip(brightness_compensated, 0, 255)
-        
-        # Apply adaptive sharpening
-        kernel_sharpen = np.array([[-0.2, -0.2, -0.2],
-                                   [-0.2,  2.6, -0.2], 
-                                   [-0.2, -0.2, -0.2]])
-        final_frame = cv2.filter2D(brightness_compensated, -1, kernel_sharpen)
-        
-        # Add gamma correction
-        gamma = 1.2
-        gamma_corrected = np.power(final_frame / 255.0, 1.0 / gamma) * 255.0
-        final_frame = np.clip(gamma_corrected, 0, 255).astype(np.uint8)
-        
-        processed_frames.append(final_frame)
+            print(f"  ✗ Failed to create video file: {full_output_video}")
+    
+    # One video and .bin per tile of the wall layout
+    hold_thresholds = list(np.broadcast_to(hold_threshold, len(wall_layout.tiles)))
+    if tile_bin_paths is None:
+        tile_bin_paths = [f"{output_basename}_{tile.name}.bin" for tile in wall_layout.tiles]
+    
+    # Chunked files remember what their frames were made from, so a resume never mixes content
+    fingerprints = [None] * len(wall_layout.tiles)
+    if chunk_frames:
+        fingerprints = resume_fingerprints(
+            input_file, wall_layout, hold_thresholds, wiring=wiring_layout._asdict(), color_depth=color_depth,
+            dither=bool(dither) and color_depth == 16, decode=decode_backend, resample=resample,
+            color_lut=hashlib.sha256((DEFAULT_COLOR_LUT if color_lut is None else color_lut).tobytes()).hexdigest(),
+            temporal=smoother.params() if smoother is not None else None, power=power)
+    
+    # Every tile resumes after the same frame: the fewest intact chunks of any tile
+    resume_frames = 0
+    if resume:
+        resume_frames = min(resumable_frames(path, tile.width, tile.height, fps, color_depth // 8,
+                                             layout=encode_layout(wiring_layout), frame_period_us=frame_period_us,
+                                             chunk_frames=chunk_frames, fingerprint=fingerprint)
+                            for tile, path, fingerprint in zip(wall_layout.tiles, tile_bin_paths, fingerprints))
+        print(f"  Resuming tile .bin files after frame {resume_frames}" if resume_frames
+              else "  Nothing to resume, writing tile .bin files from the start")
+    
+    tiles = []
+    for tile_idx, tile in enumerate(wall_layout.tiles):
+        tile_video_name = f"{output_basename}_{tile.name}.mp4"
         
-        if (frame_idx + 1) % max(1, len(frames) // 10) == 0 or frame_idx == len(frames) - 1:
-            print(f"  Progress: {frame_idx + 1}/{len(frames)}")
+        tile_out = None
+        if write_videos:
+            tile_out, _ = open_video_writer(tile_video_name, fps, (tile.width, tile.height))
+        tile_bin = open_bin_writer(tile_bin_paths[tile_idx], tile.width, tile.height, fps, bin_format,
+                                   bytes_per_pixel=color_depth // 8, layout=encode_layout(wiring_layout),
+                                   hold_threshold=int(hold_thresholds[tile_idx]), frame_period_us=frame_period_us,
+                                   chunk_frames=chunk_frames, resume_frames=resume_frames,
+                                   fingerprint=fingerprints[tile_idx])
+        tiles.append((tile, tile_video_name, tile_out, tile_bin))
     
-    # Save full resolution video
-    print(f"\n[4/4] Generating output files...")
+    # .bin bytes are cut in physical LED order; the tile videos stay row-major for viewing
+    slicer = TileSlicer(wall_layout, wiring_layout, color_depth // 8)
     
-    full_output_video = f"{output_basename}.mp4"
-    print(f"\n  Creating full video: {full_output_video}")
+    print(f"  {describe_wall_layout(wall_layout)}")
     
-    codecs_to_try = ['X264', "XVID", 'MJPG', 'mp4v']
-    out = None
+    limiter = None
+    if power is not None:
+        limiter = PowerLimiter(wall_layout, **power)
     
-    for codec in codecs_to_try:
-        fourcc = cv2.VideoWriter_fourcc(*codec)
-        out = cv2.VideoWriter(full_output_video, fourcc, fps, (target_width, target_height))
-        if out.isOpened():
-            print(f"    Using codec: {codec}")
-            break
-        else:
-            out.release()
+    # Decode -> process -> fan out, one frame at a time (decode_wait: time spent waiting on the
+    # decoder; decoding itself is timed as 'decode' on the prefetch thread)
+    prepared, cached_frame_count = prepare_frames(input_file, timed_iter('decode_wait', frames), target_width,
+                                                  target_height, fps, workers, pool, cache, decode_backend, smoother,
+                                                  source_timestamps)
+    if cached_frame_count is not None:
+        print(f"\n[4/4] Reading {cached_frame_count} processed frames from cache...")
+        if not timed:
+            total_frames = cached_frame_count
+    else:
+        print(f"\n[4/4] Processing frames...")
     
-    if out and out.isOpened():
-        for frame in processed_frames:
-            out.write(frame)
-        out.release()
+    # Resampling runs on the prepared frames, so cache entries hold the source frames
+    output_timestamps = None
+    if timed:
+        timed_frames = attach_timestamps(prepared, source_timestamps)
+        if resampling:
+            timed_frames = resample_frames(timed_frames, frame_period_us, resample)
+        output_timestamps = []
+        prepared = record_timestamps(timed_frames, output_timestamps)
+    
+    # 16-bit tiles are sliced from one RGB565 frame packed into reused buffers
+    packed = scratch = None
+    if color_depth == 16:
+        packed = np.empty((canvas_height, canvas_width), dtype='<u2')
+        scratch = np.empty_like(packed)
+    
+    # Sink 0 is the full video, then one (video, .bin) sink per tile
+    sinks = [(full_out, None)] + [(tile_out, tile_bin) for _, _, tile_out, tile_bin in tiles]
+    
+    frame_count = 0
+    writer_pool = TileWriterPool(sinks, writer_threads)
+    completed = False
+    try:
+        for prepared_frame in prepared:
+            final_frame = apply_color_lut(prepared_frame, color_lut)
+            if letterbox is not None:
+                # A fresh canvas per frame: the writer threads still read the previous ones
+                canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
+                canvas[letterbox] = final_frame
+                final_frame = canvas
+            if limiter is not None:
+                with stage('power'):
+                    final_frame = limiter.process(final_frame)
+            
+            bin_frame = final_frame
+            if packed is not None:
+                bin_frame = pack_rgb565(final_frame, packed, dither, scratch).view(np.uint8).reshape(
+                    canvas_height, canvas_width, 2)
+            
+            tile_bytes = [None] * len(tiles)
+            if frame_count >= resume_frames:
+                with stage('slice'):
+                    tile_bytes = slicer.slice(bin_frame)
+            
+            video_frames = [None] * len(writer_pool.sinks)
+            if write_videos:
+                video_frames = [final_frame] + [final_frame[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+                                                for tile, _, _, _ in tiles]
+            writer_pool.write(video_frames, [None] + tile_bytes)
+            
+            frame_count += 1
+            if frame_count % 30 == 0 or frame_count == total_frames:
+                progress = (frame_count / max(total_frames, 1)) * 100
+                print(f"\r  Progress: {frame_count}/{total_frames} ({progress:.1f}%)", end='', flush=True)
+        writer_pool.close()
+        completed = True
+    finally:
+        if not completed:
+            # Stop the decoder and writer threads and leave no half-written outputs behind
+            writer_pool.abort()
+            if hasattr(prepared, 'close'):
+                prepared.close()
+            discard_outputs([(full_out, full_output_video)] + [(tile_out, name) for _, name, tile_out, _ in tiles],
+                            [tile_bin for _, _, _, tile_bin in tiles])
+    
+    print(f"\n  Processed {frame_count} frames")
+    
+    # Timestamp table relative to the first frame (resampled output already starts at 0)
+    table = {}
+    if timestamp_table:
+        table['timestamps'] = [timestamp - output_timestamps[0] for timestamp in output_timestamps]
+    
+    if full_out is not None:
+        full_out.release()
         print(f"    ✓ {full_output_video} created")
-    else:
-        print(f"    ✗ Failed to create video file")
     
-    # Create 10 tiles (8 lines each = 180x8 resolution)
-    tile_height = 8
-    num_tiles = 10
+    for tile, tile_video_name, tile_out, tile_bin in tiles:
+        if tile_out is not None:
+            tile_out.release()
+            print(f"    ✓ {tile_video_name} ({tile.width}x{tile.height})")
+        tile_bin.close(**table)
+        held = f", {tile_bin.held_frames} frames held" if getattr(tile_bin, 'held_frames', 0) else ""
+        print(f"    ✓ {tile_bin.path} ({tile_bin.file_size:,} bytes{held})")
     
-    print(f"\n  Creating {num_tiles} tiled videos ({target_width}x{tile_height} each):")
+    if limiter is not None:
+        print_power_summary(limiter)
     
-    for tile_idx in range(num_tiles):
-        start_y = tile_idx * tile_height
-        end_y = min(start_y + tile_height, target_height)
-        
-        tile_width = target_width
-        tile_actual_height = end_y - start_y
-        
-        # Create tiled video
-        tile_video_name = f"{output_basename}_{tile_idx + 1}.mp4"
-        
-        out = None
-        for codec in codecs_to_try:
-            fourcc = cv2.VideoWriter_fourcc(*codec)
-            out = cv2.VideoWriter(tile_video_name, fourcc, fps, (tile_width, tile_actual_height))
-            if out.isOpened():
-                break
-            else:
-                out.release()
-        
-        if out and out.isOpened():
-            for frame in processed_frames:
-                tile_frame = frame[start_y:end_y, :]
-                out.write(tile_frame)
-            out.release()
-            print(f"    ✓ {tile_video_name} ({tile_width}x{tile_actual_height})")
-        
-        # Create tiled binary file
-        tile_bin_name = f"{output_basename}_{tile_idx + 1}.bin"
-        
-        frame_data = bytearray()
-        for frame in processed_frames:
-            tile_frame = frame[start_y:end_y, :]
-            frame_data.extend(tile_frame.tobytes())
-        
-        checksum = hashlib.sha256(frame_data).digest()
-        
-        with open(tile_bin_name, 'wb') as f:
-            f.write(struct.pack('<I', tile_width))           # width
-            f.write(struct.pack('<I', tile_actual_height))   # height
-            f.write(struct.pack('<f', fps))                  # fps
-            f.write(struct.pack('<I', len(processed_frames)))# frame count
-            f.write(frame_data)
-            f.write(checksum)
-        
-        file_size = len(frame_data) + 48
-        print(f"    ✓ {tile_bin_name} ({file_size:,} bytes)")
+    return {'frame_count': frame_count, 'fps': fps, 'frame_period_us': frame_period_us,
+            'width': canvas_width, 'height': canvas_height,
+            'bin_paths': [tile[3].path for tile in tiles], 'power': limiter}
+
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(
+        description="Convert a video or image into 180x8 LED tiles for the child players.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Example:
+  python vidpix.py F1.mp4 output_video
+  python vidpix.py image.jpg output_image --workers 8
+  python vidpix.py F1.mp4 output_video --layout columns20.json
+
+Output files:
+  - output_video.mp4 (full 180x80 canvas)
+  - output_video_1.mp4 to output_video_10.mp4 (180x8 tiles)
+  - output_video_1.bin to output_video_10.bin (binary files)
+  With --layout, one .mp4/.bin per tile, named after the tile.""")
+    parser.add_argument('input_file', help="Input video or image file")
+    parser.add_argument('output_basename', help="Basename for the generated .mp4/.bin files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Frame processing workers (default: number of CPU cores, 1 = single-threaded)")
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                        help="Worker pool type used when --workers > 1 (default: thread)")
+    parser.add_argument('--writer-threads', type=int, default=os.cpu_count() or 1,
+                        help="Threads writing the tile videos and .bin files concurrently (default: number of "
+                             "CPU cores, 1 = write inline)")
+    parser.add_argument('--decode', choices=DECODE_BACKENDS, default='opencv',
+                        help="Video decode backend: opencv (default), opencv-hw (hardware decode where available) "
+                             "or ffmpeg (subprocess that downscales large sources while decoding)")
+    parser.add_argument('--decode-threads', type=int, default=0,
+                        help="Decoder threads (default: 0, chosen by FFmpeg)")
+    parser.add_argument('--gamma', type=float, default=1.2,
+                        help="Gamma correction, values > 1.0 make image brighter (default: 1.2)")
+    parser.add_argument('--white-balance', type=float, nargs=3, default=[1.0, 1.0, 1.0],
+                        metavar=('R', 'G', 'B'), help="Per-channel LED gain multipliers (default: 1 1 1)")
+    parser.add_argument('--brightness-cap', type=int, default=255,
+                        help="Maximum output value for any channel, 0-255 (default: 255)")
+    parser.add_argument('--smooth-stats', type=float, default=None, metavar='ALPHA',
+                        help="Temporal smoothing of the brightness/contrast normalisation: EMA weight of the newest "
+                             "frame, e.g. 0.1 (default: off, every frame uses its own statistics)")
+    parser.add_argument('--denoise', type=float, default=0.0, metavar='STRENGTH',
+                        help="Per-pixel temporal denoise strength, 0 <= STRENGTH < 1 (default: 0, off)")
+    parser.add_argument('--denoise-threshold', type=float, default=DEFAULT_DENOISE_THRESHOLD, metavar='LEVELS',
+                        help=f"Largest per-pixel change treated as noise (default: {DEFAULT_DENOISE_THRESHOLD:g})")
+    parser.add_argument('--power-budget', type=float, default=None, metavar='AMPS',
+                        help="Scale frames down so no strip's estimated current exceeds this (default: no limit)")
+    parser.add_argument('--power-limit-mode', choices=LIMIT_MODES, default='wall',
+                        help="wall: scale the whole frame evenly (default); strip: scale only strips over budget")
+    parser.add_argument('--power-report', default=None, metavar='JSON',
+                        help="Write the per-strip current report (peak, mean, frames over budget) here")
+    parser.add_argument('--ma-per-channel', type=float, default=DEFAULT_MA_PER_CHANNEL,
+                        help=f"LED current per colour channel at full value in mA (default: {DEFAULT_MA_PER_CHANNEL:g})")
+    parser.add_argument('--idle-ma', type=float, default=DEFAULT_IDLE_MA,
+                        help=f"Quiescent current per LED in mA (default: {DEFAULT_IDLE_MA:g})")
+    parser.add_argument('--led-brightness', type=int, default=255,
+                        help="FastLED.setBrightness() the children apply on top, for the estimate (default: 255)")
+    parser.add_argument('--bin-format', choices=['v1', 'v2'], default='v1',
+                        help="Tile .bin container: v1 raw frames (default) or v2 delta/RLE compressed")
+    parser.add_argument('--color-depth', type=int, choices=[24, 16], default=24,
+                        help="Tile .bin pixel format: 24-bit BGR (default) or 16-bit RGB565 (needs --bin-format v2)")
+    parser.add_argument('--dither', action='store_true',
+                        help="Ordered dithering when packing --color-depth 16, hides banding in gradients")
+    parser.add_argument('--hold-threshold', type=int, nargs='+', default=[0], metavar='LEVELS',
+                        help="v2: hold a tile's frame while no channel changes by more than this many levels; "
+                             "one value or one per tile (default: 0, exact repeats only)")
+    parser.add_argument('--frame-period-us', type=int, default=None, metavar='US',
+                        help="Resample onto this exact frame period so frame k plays on SYNC tick k "
+                             "(default: keep the source frames)")
+    parser.add_argument('--sync', action='store_true',
+                        help=f"Shorthand for --frame-period-us {DEFAULT_SYNC_PERIOD_US} (the parent's SYNC period)")
+    parser.add_argument('--resample', choices=RESAMPLE_MODES, default='nearest',
+                        help="With a frame period: nearest drops/repeats frames (default), blend mixes "
+                             "neighbouring frames")
+    parser.add_argument('--timestamps', action='store_true',
+                        help="v2: store every frame's presentation time (keeps variable-frame-rate timing when "
+                             "not resampling)")
+    parser.add_argument('--chunk-frames', type=int, default=0, metavar='N',
+                        help="v2: write the tile .bin files in CRC32-checked chunks of N frames, so players can "
+                             "check just the chunk they seek into and interrupted exports can resume (default: 0, "
+                             "not chunked)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Keep the intact chunks of an interrupted --chunk-frames export and write only the "
+                             "rest; files made from another input or other options are written from the start")
+    parser.add_argument('--layout', default=None, metavar='JSON',
+                        help="Wall layout file: canvas size and the rectangle of each tile (default: 10 strips "
+                             "of 180x8 on 180x80, see wall.py)")
+    parser.add_argument('--wiring', choices=['progressive', 'serpentine'], default=None,
+                        help="Bake LED wiring order into the tile .bin files (default: row-major, as processed)")
+    parser.add_argument('--channel-order', choices=CHANNEL_ORDERS, default=None,
+                        help="Bake LED channel order into the tile .bin files, e.g. GRB (default: BGR)")
+    parser.add_argument('--wiring-config', default=None,
+                        help="JSON wiring layout file (serpentine, flip_x, flip_y, channel_order)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Cache processed frames here so re-exports skip decode and filtering")
+    parser.add_argument('--cache-max-size', type=float, default=10240,
+                        help="Cache size limit in MB before least-recently-used entries are evicted (default: 10240)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time each pipeline stage and print a summary at the end")
+    parser.add_argument('--profile-json', default=None,
+                        help="Also write the per-stage timing summary to this JSON file")
+    args = parser.parse_args()
+    
+    wall_layout = DEFAULT_WALL_LAYOUT
+    if args.layout:
+        try:
+            wall_layout = load_wall_layout(args.layout)
+        except (OSError, ValueError) as e:
+            parser.error(f"Invalid wall layout: {e}")
+    
+    # Resolve the physical LED layout baked into the tile .bin files
+    try:
+        wiring_layout = resolve_wiring_layout(args.wiring, args.channel_order, args.wiring_config)
+    except (OSError, ValueError) as e:
+        parser.error(f"Invalid wiring layout: {e}")
+    if wiring_layout != NATIVE_LAYOUT and args.bin_format != 'v2':
+        parser.error("--wiring/--channel-order/--wiring-config need --bin-format v2 so the layout is recorded in the header")
+    if args.decode == 'ffmpeg' and not ffmpeg_available():
+        parser.error("--decode ffmpeg needs the ffmpeg executable on PATH")
+    if args.color_depth == 16 and args.bin_format != 'v2':
+        parser.error("--color-depth 16 needs --bin-format v2 so the pixel format is recorded in the header")
+    if args.color_depth == 16 and wiring_layout.channel_order != 'BGR':
+        parser.error("--channel-order does not apply to --color-depth 16 (RGB565 has a fixed channel layout)")
+    if len(args.hold_threshold) not in (1, len(wall_layout.tiles)):
+        parser.error(f"--hold-threshold takes one value or {len(wall_layout.tiles)} (one per tile)")
+    if any(args.hold_threshold) and args.bin_format != 'v2':
+        parser.error("--hold-threshold needs --bin-format v2 (v1 stores every frame in full)")
+    if args.timestamps and args.bin_format != 'v2':
+        parser.error("--timestamps needs --bin-format v2")
+    if args.chunk_frames < 0:
+        parser.error("--chunk-frames must not be negative")
+    if args.chunk_frames and args.bin_format != 'v2':
+        parser.error("--chunk-frames needs --bin-format v2")
+    if args.resume and not args.chunk_frames:
+        parser.error("--resume needs --chunk-frames (only chunked .bin files can be resumed)")
+    frame_period_us = args.frame_period_us
+    if args.sync:
+        if frame_period_us is not None:
+            parser.error("--sync and --frame-period-us are mutually exclusive")
+        frame_period_us = DEFAULT_SYNC_PERIOD_US
+    if frame_period_us is not None and frame_period_us <= 0:
+        parser.error("--frame-period-us must be positive")
+    
+    power = None
+    if args.power_budget is not None or args.power_report:
+        power = {'budget_amps': args.power_budget, 'mode': args.power_limit_mode,
+                 'ma_per_channel': args.ma_per_channel, 'idle_ma': args.idle_ma, 'brightness': args.led_brightness}
+    
+    smoother = None
+    if args.smooth_stats is not None or args.denoise:
+        try:
+            smoother = TemporalSmoother(args.smooth_stats or 1.0, args.denoise, args.denoise_threshold)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    input_file = args.input_file
+    output_basename = args.output_basename
+    
+    # Validate input file exists
+    if not os.path.exists(input_file):
+        print(f"Error: Input file not found: {input_file}")
+        sys.exit(1)
+    
+    print("=== Video/Image Processing with Tiling ===")
+    print(f"Input: {input_file}")
+    print(f"Output basename: {output_basename}")
+    print(f"Workers: {args.workers} ({args.pool}), writer threads: {args.writer_threads}, decode: {args.decode}")
+    print(f"Wall: {describe_wall_layout(wall_layout)}")
+    print(f"Tile .bin: {args.bin_format}, {args.color_depth}-bit{' dithered' if args.dither else ''}, "
+          f"wiring: {describe_layout(wiring_layout)}")
+    print(f"Colour: gamma {args.gamma}, white balance {args.white_balance}, cap {args.brightness_cap}")
+    if smoother is not None:
+        print(f"Temporal: stats EMA {smoother.stats_alpha:g}, denoise {smoother.denoise:g}")
+    if frame_period_us is not None:
+        print(f"Timing: {frame_period_us} us frame period ({1e6 / frame_period_us:.3f} fps), {args.resample}")
+    
+    cache = None
+    if args.cache_dir:
+        cache = FrameCache(args.cache_dir, int(args.cache_max_size * 1024 ** 2))
+    
+    timer = None
+    if args.profile or args.profile_json:
+        timer = enable_profiling(StageTimer())
+    
+    result = export_tiles(input_file, output_basename,
+                          workers=args.workers,
+                          pool=args.pool,
+                          color_lut=build_color_lut(args.gamma, args.white_balance, args.brightness_cap),
+                          bin_format=args.bin_format,
+                          wiring_layout=wiring_layout,
+                          cache=cache,
+                          hold_threshold=args.hold_threshold,
+                          color_depth=args.color_depth,
+                          dither=args.dither,
+                          decode_backend=args.decode,
+                          decode_threads=args.decode_threads,
+                          smoother=smoother,
+                          power=power,
+                          wall_layout=wall_layout,
+                          writer_threads=args.writer_threads,
+                          frame_period_us=frame_period_us,
+                          resample=args.resample,
+                          timestamp_table=args.timestamps,
+                          chunk_frames=args.chunk_frames,
+                          resume=args.resume)
+    if result is None:
+        sys.exit(1)
+    
+    if args.power_report:
+        result['power'].write_report(args.power_report, input=input_file)
+        print(f"\nPower report written to {args.power_report}")
+    
+    if timer is not None:
+        print(f"\n=== Stage Timings ({result['frame_count']} frames) ===")
+        print(timer.format_table())
+        if args.pool == 'process' and args.workers > 1:
+            print("  (processing stages ran in worker processes and are not included)")
+        if args.profile_json:
+            timer.write_json(args.profile_json, input=input_file, frame_count=result['frame_count'])
     
     print(f"\n=== Processing Complete ===")
     print(f"Output files created:")
-    print(f"  - {full_output_video} (full video)")
-    for i in range(1, num_tiles + 1):
-        print(f"  - {output_basename}_{i}.mp4 (video tile)")
-        print(f"  - {output_basename}_{i}.bin (binary tile)")
+    print(f"  - {output_basename}.mp4 (full video)")
+    for tile in wall_layout.tiles:
+        print(f"  - {output_basename}_{tile.name}.mp4 (video tile)")
+        print(f"  - {output_basename}_{tile.name}.bin (binary tile)")
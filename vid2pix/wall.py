@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+LED wall layouts: which rectangle of the processed frame each strip shows.
+
+The default layout is the wall as built (README.md): 10 children, each driving a
+180x8 strip, stacked top to bottom into a 180x80 canvas. Frames are processed at
+the canvas size (letterboxed if the source aspect differs), and every tile is cut
+from that canvas, so a tile always has exactly the size its strip expects.
+
+Layout file (JSON), either explicit rectangles:
+    {
+      "width": 180, "height": 80,
+      "tiles": [
+        {"name": "left", "x": 0, "y": 0, "width": 90, "height": 80},
+        {"name": "right", "x": 90, "y": 0, "width": 90, "height": 80}
+      ]
+    }
+or equal bands across the canvas:
+    {"width": 180, "height": 80, "columns": 20}
+    {"width": 180, "height": 80, "rows": 10, "names": ["1", "2", ...]}
+
+Tile names default to 1..N and become the output file suffix ({basename}_{name}.bin).
+Tiles must lie on the canvas and may not overlap (every LED shows its own pixels);
+parts of the canvas may stay unused.
+"""
+import json
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from wiring import NATIVE_LAYOUT, build_wiring_map
+
+Tile = namedtuple('Tile', ['name', 'x', 'y', 'width', 'height'])
+WallLayout = namedtuple('WallLayout', ['width', 'height', 'tiles'])
+
+TILE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def make_wall_layout(width, height, tiles):
+    """
+    Create a validated WallLayout.
+
+    Args:
+        width: Canvas width in pixels
+        height: Canvas height in pixels
+        tiles: Tiles (or (name, x, y, width, height) tuples), in strip order
+
+    Raises:
+        ValueError: If a tile is empty, leaves the canvas, overlaps another one or reuses a name
+    """
+    width, height = int(width), int(height)
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Canvas size must be positive, got {width}x{height}")
+    if not tiles:
+        raise ValueError("A layout needs at least one tile")
+
+    checked = []
+    for tile in tiles:
+        tile = Tile(str(tile[0]), *(int(value) for value in tile[1:]))
+        if not TILE_NAME_PATTERN.match(tile.name):
+            raise ValueError(f"Tile name '{tile.name}' may only contain letters, digits, '_' and '-'")
+        if tile.width <= 0 or tile.height <= 0:
+            raise ValueError(f"Tile '{tile.name}' is empty ({tile.width}x{tile.height})")
+        if tile.x < 0 or tile.y < 0 or tile.x + tile.width > width or tile.y + tile.height > height:
+            raise ValueError(f"Tile '{tile.name}' ({tile.width}x{tile.height} at {tile.x},{tile.y}) "
+                             f"does not fit the {width}x{height} canvas")
+        for other in checked:
+            if (tile.x < other.x + other.width and other.x < tile.x + tile.width
+                    and tile.y < other.y + other.height and other.y < tile.y + tile.height):
+                raise ValueError(f"Tile '{tile.name}' overlaps tile '{other.name}'")
+        checked.append(tile)
+
+    names = [tile.name for tile in checked]
+    if len(set(names)) != len(names):
+        raise ValueError("Tile names must be unique")
+    return WallLayout(width, height, tuple(checked))
+
+
+def band_layout(width, height, count, direction='rows', names=None):
+    """
+    Split the canvas into count equal row or column bands.
+
+    Raises:
+        ValueError: If the canvas does not divide evenly into count bands
+    """
+    if direction not in ('rows', 'columns'):
+        raise ValueError(f"Unknown band direction '{direction}' (expected rows or columns)")
+    extent = height if direction == 'rows' else width
+    if count <= 0 or extent % count:
+        raise ValueError(f"Cannot split {extent} {direction[:-1]} pixels into {count} equal bands")
+    names = names or [str(index + 1) for index in range(count)]
+    if len(names) != count:
+        raise ValueError(f"Expected {count} tile names, got {len(names)}")
+
+    size = extent // count
+    if direction == 'rows':
+        tiles = [(name, 0, index * size, width, size) for index, name in enumerate(names)]
+    else:
+        tiles = [(name, index * size, 0, size, height) for index, name in enumerate(names)]
+    return make_wall_layout(width, height, tiles)
+
+
+# 10 strips (one per child) of 180x8 LEDs
+DEFAULT_WALL_LAYOUT = band_layout(180, 80, 10)
+
+
+def load_wall_layout(path):
+    """
+    Load a WallLayout from a JSON layout file.
+
+    Raises:
+        OSError, ValueError: If the file cannot be read or does not describe a valid layout
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if 'width' not in config or 'height' not in config:
+        raise ValueError("Layout needs the canvas 'width' and 'height'")
+
+    for direction in ('rows', 'columns'):
+        if direction in config:
+            return band_layout(config['width'], config['height'], int(config[direction]), direction,
+                               config.get('names'))
+    if 'tiles' not in config:
+        raise ValueError("Layout needs 'tiles', 'rows' or 'columns'")
+
+    tiles = []
+    for index, tile in enumerate(config['tiles']):
+        missing = {'x', 'y', 'width', 'height'} - set(tile)
+        if missing:
+            raise ValueError(f"Tile {index + 1} is missing {', '.join(sorted(missing))}")
+        tiles.append((tile.get('name', str(index + 1)), tile['x'], tile['y'], tile['width'], tile['height']))
+    return make_wall_layout(config['width'], config['height'], tiles)
+
+
+def describe_wall_layout(layout):
+    """Human-readable summary, e.g. '10 tiles of 180x8 on a 180x80 canvas'."""
+    sizes = {(tile.width, tile.height) for tile in layout.tiles}
+    if len(sizes) == 1:
+        tile_width, tile_height = sizes.pop()
+        tiles = f"{len(layout.tiles)} tiles of {tile_width}x{tile_height}"
+    else:
+        tiles = f"{len(layout.tiles)} tiles of mixed sizes"
+    return f"{tiles} on a {layout.width}x{layout.height} canvas"
+
+
+def canvas_offset(frame_width, frame_height, layout):
+    """Top-left position that centres a frame of the given size on the layout canvas."""
+    return (layout.width - frame_width) // 2, (layout.height - frame_height) // 2
+
+
+class TileSlicer:
+    """
+    Cuts every tile out of a canvas frame in a single vectorised gather.
+
+    One byte-level index covering all tiles is precomputed, with the wiring
+    layout folded in, so a frame costs one np.take regardless of the number of
+    tiles. Each tile's bytes come out contiguous and in physical LED order.
+
+    Args:
+        layout: WallLayout
+        wiring_layout: WiringLayout baked into the tile bytes
+        bytes_per_pixel: 3 for BGR frames, 2 for packed RGB565 (channel order does not apply)
+    """
+
+    def __init__(self, layout, wiring_layout=NATIVE_LAYOUT, bytes_per_pixel=3):
+        self.layout = layout
+        self.bytes_per_pixel = bytes_per_pixel
+
+        canvas = np.arange(layout.width * layout.height).reshape(layout.height, layout.width)
+        indices = []
+        offsets = [0]
+        for tile in layout.tiles:
+            pixel_index, channel_index = build_wiring_map(tile.width, tile.height, wiring_layout)
+            if bytes_per_pixel != 3:
+                channel_index = np.arange(bytes_per_pixel)
+            tile_pixels = canvas[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width].ravel()[pixel_index]
+            indices.append((tile_pixels[:, None] * bytes_per_pixel + channel_index).ravel())
+            offsets.append(offsets[-1] + indices[-1].size)
+        self._index = np.concatenate(indices).astype(np.intp)
+        self._bounds = list(zip(offsets[:-1], offsets[1:]))
+
+    def slice(self, frame):
+        """
+        Tile bytes for one frame.
+
+        Args:
+            frame: (height, width, bytes_per_pixel) uint8 canvas frame
+
+        Returns:
+            List of 1-D uint8 arrays, one per tile, in layout order (views of one fresh buffer)
+        """
+        gathered = np.take(frame.reshape(-1), self._index)
+        return [gathered[start:end] for start, end in self._bounds]
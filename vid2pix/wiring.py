@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Physical LED wiring layouts for the tile exporter.
+
+child_player.ino currently remaps every frame on the device: odd rows are reversed
+(serpentine/zigzag wiring) and BGR bytes are reordered for FastLED's GRB strip.
+A WiringLayout lets the exporter bake that mapping into the .bin file instead, so
+the bytes are already in physical LED order and channel order and the child can
+copy a frame straight into its LED buffer.
+
+The layout is recorded in the v2 header's layout byte:
+- bit 0: serpentine (every second row reversed)
+- bit 1: flip_x (first row starts at the right edge)
+- bit 2: flip_y (first row is the bottom row)
+- bits 4-6: channel order index into CHANNEL_ORDERS
+
+The channel order is the byte order on disk. To memcpy a frame into FastLED's
+CRGB array (which is stored R, G, B and reordered by the driver) use RGB; to feed
+the WS2812 data line directly (RMT/DMA, or FastLED configured with RGB order) use
+the strip's own order, GRB.
+
+Layout config file (JSON), all keys optional:
+    {"serpentine": true, "flip_x": false, "flip_y": false, "channel_order": "GRB"}
+"""
+import json
+from collections import namedtuple
+
+import numpy as np
+
+CHANNEL_ORDERS = ['BGR', 'RGB', 'GRB', 'BRG', 'RBG', 'GBR']
+
+LAYOUT_SERPENTINE = 0x01
+LAYOUT_FLIP_X = 0x02
+LAYOUT_FLIP_Y = 0x04
+LAYOUT_CHANNEL_SHIFT = 4
+LAYOUT_CHANNEL_MASK = 0x70
+
+WiringLayout = namedtuple('WiringLayout', ['serpentine', 'flip_x', 'flip_y', 'channel_order'])
+
+# Processed frames are BGR row-major: no remapping
+NATIVE_LAYOUT = WiringLayout(serpentine=False, flip_x=False, flip_y=False, channel_order='BGR')
+
+
+def load_wiring_config(path):
+    """
+    Load a WiringLayout from a JSON layout config file.
+
+    Raises:
+        ValueError: If the channel order is not one of CHANNEL_ORDERS
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return make_layout(config.get('serpentine', False), config.get('channel_order', 'BGR'),
+                       config.get('flip_x', False), config.get('flip_y', False))
+
+
+def make_layout(serpentine=False, channel_order='BGR', flip_x=False, flip_y=False):
+    """Create a validated WiringLayout."""
+    channel_order = channel_order.upper()
+    if channel_order not in CHANNEL_ORDERS:
+        raise ValueError(f"Unknown channel order '{channel_order}' (expected one of {', '.join(CHANNEL_ORDERS)})")
+    return WiringLayout(bool(serpentine), bool(flip_x), bool(flip_y), channel_order)
+
+
+def resolve_wiring_layout(wiring=None, channel_order=None, config_path=None):
+    """
+    Combine an optional layout config file with explicit overrides.
+
+    Args:
+        wiring: 'serpentine', 'progressive' or None to keep the config/native value
+        channel_order: Channel order override, or None to keep the config/native value
+        config_path: Optional JSON layout config file
+
+    Raises:
+        OSError, ValueError: If the config file cannot be read or is invalid
+    """
+    layout = load_wiring_config(config_path) if config_path else NATIVE_LAYOUT
+    return make_layout(serpentine=(wiring == 'serpentine') if wiring else layout.serpentine,
+                       channel_order=channel_order or layout.channel_order,
+                       flip_x=layout.flip_x, flip_y=layout.flip_y)
+
+
+def encode_layout(layout):
+    """Pack a WiringLayout into the v2 header layout byte."""
+    code = CHANNEL_ORDERS.index(layout.channel_order) << LAYOUT_CHANNEL_SHIFT
+    if layout.serpentine:
+        code |= LAYOUT_SERPENTINE
+    if layout.flip_x:
+        code |= LAYOUT_FLIP_X
+    if layout.flip_y:
+        code |= LAYOUT_FLIP_Y
+    return code
+
+
+def decode_layout(code):
+    """Unpack a v2 header layout byte into a WiringLayout."""
+    return WiringLayout(serpentine=bool(code & LAYOUT_SERPENTINE),
+                        flip_x=bool(code & LAYOUT_FLIP_X),
+                        flip_y=bool(code & LAYOUT_FLIP_Y),
+                        channel_order=CHANNEL_ORDERS[(code & LAYOUT_CHANNEL_MASK) >> LAYOUT_CHANNEL_SHIFT])
+
+
+def describe_layout(layout):
+    """Human-readable summary, e.g. 'serpentine, GRB'."""
+    parts = ['serpentine' if layout.serpentine else 'progressive']
+    if layout.flip_x:
+        parts.append('flip-x')
+    if layout.flip_y:
+        parts.append('flip-y')
+    parts.append(layout.channel_order)
+    return ', '.join(parts)
+
+
+def build_wiring_map(width, height, layout):
+    """
+    Precompute the gather indices that reorder a tile into physical LED order
+    (wall.TileSlicer folds them into its per-frame gather).
+
+    Args:
+        width: Tile width in pixels
+        height: Tile height in pixels
+        layout: WiringLayout
+
+    Returns:
+        (pixel_index, channel_index): pixel_index[i] is the source pixel shown on
+        LED i; channel_index maps output channel bytes to source BGR channels
+    """
+    grid = np.arange(width * height).reshape(height, width)
+    if layout.flip_y:
+        grid = grid[::-1]
+    if layout.flip_x:
+        grid = grid[:, ::-1]
+    if layout.serpentine:
+        grid = grid.copy()
+        grid[1::2] = grid[1::2, ::-1]
+
+    channel_index = np.array(['BGR'.index(channel) for channel in layout.channel_order])
+    return grid.ravel(), channel_index
+
+
+def undo_wiring(led_pixels, width, height, layout):
+    """
+    Inverse of the build_wiring_map gather: turn LED-ordered pixels back into a BGR tile.
+
+    Args:
+        led_pixels: (height * width, channels) uint8 array in LED order
+        width: Tile width in pixels
+        height: Tile height in pixels
+        layout: WiringLayout the pixels were written with
+
+    Returns:
+        (height, width, channels) uint8 tile in row-major BGR order
+    """
+    pixel_index, channel_index = build_wiring_map(width, height, layout)
+    channels = led_pixels.shape[-1]
+    tile = np.empty_like(led_pixels)
+    if channels == 3:
+        tile[pixel_index[:, None], channel_index] = led_pixels
+    else:
+        tile[pixel_index] = led_pixels
+    return tile.reshape(height, width, channels)
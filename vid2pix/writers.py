@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent output writers for vidpix.export_tiles.
+
+Each processed frame is sliced once in the main thread (wall.TileSlicer) and the
+pieces are handed to writer threads that encode the videos and append the tile
+.bin records. Every output belongs to exactly one thread, so each file still
+receives its frames in order while different outputs are written concurrently
+(OpenCV video encoding, the v2 record encoders' numpy work and file I/O release
+the GIL). Queues are bounded, so a slow writer throttles the producer instead of
+buffering the whole video.
+"""
+import queue
+import threading
+
+from profiling import stage
+
+WRITER_QUEUE_FRAMES = 8
+
+_STOP = object()
+
+
+class TileWriterPool:
+    """
+    Fans frames out to (video writer, .bin writer) sinks on writer threads.
+
+    Args:
+        sinks: List of (video_writer or None, bin_writer or None)
+        threads: Writer threads; sinks are spread round-robin (1 = write inline)
+        queue_size: Frames buffered per thread before write() blocks
+
+    Frames passed to write() are used after it returns, so they must not be
+    modified afterwards (pass fresh arrays or views of fresh arrays).
+    """
+
+    def __init__(self, sinks, threads=1, queue_size=WRITER_QUEUE_FRAMES):
+        self.sinks = sinks
+        self.threads = max(1, min(threads, len(sinks)))
+        self._error = None
+        self._stop = threading.Event()
+        self._queues = []
+        self._workers = []
+        if self.threads == 1:
+            return
+        for first in range(self.threads):
+            worker_queue = queue.Queue(maxsize=max(1, queue_size))
+            worker = threading.Thread(target=self._run, args=(range(first, len(sinks), self.threads), worker_queue),
+                                      name=f'vid2pix-writer-{first}', daemon=True)
+            worker.start()
+            self._queues.append(worker_queue)
+            self._workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write(self, sink_indices, video_frames, bin_frames):
+        for index in sink_indices:
+            video_out, bin_out = self.sinks[index]
+            if video_out is not None:
+                with stage('video_write'):
+                    video_out.write(video_frames[index])
+            if bin_out is not None and bin_frames[index] is not None:
+                with stage('bin_write'):
+                    bin_out.write(bin_frames[index])
+
+    def _run(self, sink_indices, worker_queue):
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = worker_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _STOP:
+                    return
+                self._write(sink_indices, *item)
+        except Exception as e:  # surfaced by write()/close()
+            self._error = e
+            self._stop.set()
+
+    def _put(self, worker_queue, item):
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                worker_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def write(self, video_frames, bin_frames):
+        """
+        Queue one frame for every sink.
+
+        Args:
+            video_frames: Frame per sink for its video writer (ignored where there is none)
+            bin_frames: Bytes per sink for its .bin writer (ignored where there is none;
+                None skips the .bin files for this frame)
+
+        Raises:
+            Exception: The first error raised by a writer thread
+        """
+        if not self._workers:
+            self._write(range(len(self.sinks)), video_frames, bin_frames)
+            return
+        for worker_queue in self._queues:
+            self._put(worker_queue, (video_frames, bin_frames))
+
+    def close(self):
+        """Wait until every queued frame is written; re-raises the first writer error."""
+        try:
+            for worker_queue in self._queues:
+                self._put(worker_queue, _STOP)
+            for worker in self._workers:
+                worker.join()
+        finally:
+            self.abort()
+        if self._error is not None:
+            raise self._error
+
+    def abort(self):
+        """Stop the writer threads without waiting for queued frames."""
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._queues = []